@@ -0,0 +1,246 @@
+# batch_transcribe.py
+"""Transcribe (and summarize) a batch of recordings without the Streamlit UI.
+
+Example:
+    python batch_transcribe.py "recordings/2025-06/*.m4a" --folder Project_X
+
+Decoding, silence compression and encoding run in a process pool; Gemini and
+summary requests run in a bounded thread pool. Transcripts and summaries are
+written to transcripts/<folder> with the same exporters the app uses. Progress
+is recorded in transcripts/<folder>/batch_manifest.json, so re-running the
+same command skips finished recordings and resumes unfinished ones from their
+saved chunks.
+"""
+# Standard libraries
+import argparse
+import glob
+import hashlib
+import json
+import os
+import shutil
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor, as_completed
+from datetime import datetime
+
+# Local application imports
+from config import TRANSCRIPTION_MAX_CONCURRENCY
+from src.audio_processor import (
+    TRANSCRIPTION_FAILED_PLACEHOLDER,
+    TranscriptionProgress,
+    build_transcription_prompt,
+    load_chunk_resume,
+    merge_chunk_transcripts,
+    prepare_chunk_upload,
+    transcribe_prepared_chunk,
+)
+from src.audio_source import DEFAULT_UPLOAD_PROFILE, UPLOAD_ENCODING_PROFILES, can_stream_copy, probe_audio
+from src.chunk_planner import DEFAULT_OVERLAP_MS, plan_chunks
+from src.gemini_context_cache import delete_session_caches
+from src.gemini_files import delete_session_files
+from src.text_processor import export_summary_to_docx, export_transcription_to_docx, summarize_transcription
+
+AUDIO_EXTENSIONS = (".mp3", ".m4a", ".wav")
+MANIFEST_FILE = "batch_manifest.json"
+
+_manifest_lock = threading.Lock()
+
+
+def collect_audio_files(inputs):
+    """Expand directories and glob patterns into a sorted list of audio files."""
+    files = set()
+    for pattern in inputs:
+        if os.path.isdir(pattern):
+            candidates = [os.path.join(pattern, name) for name in os.listdir(pattern)]
+        else:
+            candidates = glob.glob(pattern, recursive=True)
+        files.update(
+            os.path.abspath(path) for path in candidates
+            if os.path.isfile(path) and path.lower().endswith(AUDIO_EXTENSIONS)
+        )
+    return sorted(files)
+
+
+def file_fingerprint(audio_path):
+    """Identify a recording by path, size and modification time (cheap, no hashing of the audio)."""
+    stat = os.stat(audio_path)
+    return f"{audio_path}|{stat.st_size}|{int(stat.st_mtime)}"
+
+
+def load_manifest(manifest_path):
+    if not os.path.exists(manifest_path):
+        return {}
+    with open(manifest_path, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+
+def update_manifest(manifest_path, manifest, fingerprint, entry):
+    """Record one recording's state and rewrite the manifest atomically."""
+    with _manifest_lock:
+        manifest[fingerprint] = entry
+        temp_path = f"{manifest_path}.tmp"
+        with open(temp_path, "w", encoding="utf-8") as f:
+            json.dump(manifest, f, ensure_ascii=False, indent=2)
+        os.replace(temp_path, manifest_path)
+
+
+def plan_recording(audio_path, overlap_ms):
+    """Probe a recording and plan its chunks (runs in the process pool)."""
+    audio_info = probe_audio(audio_path)
+    return audio_info, plan_chunks(audio_path, audio_info, overlap_ms=overlap_ms)
+
+
+def process_recording(audio_path, args, cpu_pool, api_pool, output_folder):
+    """Transcribe, summarize and export one recording. Returns its manifest entry.
+
+    If any chunk ran out of retries, the recording is marked "partial": its
+    transcript is exported with the failure markers, but it is not summarized
+    and its chunk files and uploads are kept so the next run retries only
+    the failed chunks.
+    """
+    started_at = time.monotonic()
+    base_name = os.path.splitext(os.path.basename(audio_path))[0]
+    session_id = "batch_" + hashlib.sha256(file_fingerprint(audio_path).encode("utf-8")).hexdigest()[:16]
+    log_dir = os.path.join("transcription_logs", session_id)
+    temp_dir = os.path.join("transcription_temp", session_id)
+    for directory in [log_dir, temp_dir]:
+        os.makedirs(directory, exist_ok=True)
+
+    overlap_ms = DEFAULT_OVERLAP_MS if args.overlap else 0
+    audio_info, chunks = cpu_pool.submit(plan_recording, audio_path, overlap_ms).result()
+    upload_profile = args.upload_profile
+    if upload_profile == "source" and not can_stream_copy(audio_info):
+        upload_profile = "speech_mp3"
+    full_prompt = build_transcription_prompt(args.instructions)
+    max_silence_ms = 2000 if args.compress_silence else None
+    progress = TranscriptionProgress(len(chunks))
+    print(f"{base_name}: {audio_info['duration_ms'] / 60000:.1f} min in {len(chunks)} chunks")
+
+    # Chunks saved by an earlier run are reused; the rest are prepared in the
+    # process pool and handed to the API pool as soon as each one is encoded.
+    chunk_results = [load_chunk_resume(temp_dir, session_id, chunk_idx) for chunk_idx in range(len(chunks))]
+    prepare_futures = {
+        cpu_pool.submit(prepare_chunk_upload, audio_path, audio_info, chunk_idx, start_ms, end_ms, max_silence_ms, upload_profile): chunk_idx
+        for chunk_idx, (start_ms, end_ms) in enumerate(chunks)
+        if chunk_results[chunk_idx] is None
+    }
+    transcribe_futures = {}
+    for future in as_completed(prepare_futures):
+        chunk_idx = prepare_futures[future]
+        start_ms, end_ms = chunks[chunk_idx]
+        transcribe_futures[api_pool.submit(
+            transcribe_prepared_chunk, future.result(), chunk_idx, start_ms, end_ms, session_id, args.model, full_prompt,
+            log_dir, temp_dir, progress=progress
+        )] = chunk_idx
+    for future in as_completed(transcribe_futures):
+        chunk_results[transcribe_futures[future]], _ = future.result()
+
+    failed_chunks = [
+        chunk_idx for chunk_idx, result in enumerate(chunk_results)
+        if result and result.text(0) == TRANSCRIPTION_FAILED_PLACEHOLDER
+    ]
+    transcript = merge_chunk_transcripts(chunk_results, chunks, overlap_ms)
+    transcript_path = export_transcription_to_docx(transcript, output_folder=output_folder, file_name=f"{base_name}_transcript.docx")
+
+    summary_path = None
+    if not args.no_summary and not failed_chunks:
+        # Summarized in this recording's thread so it does not queue behind other recordings' chunks in the API pool
+        summary, _ = summarize_transcription(transcript, args.summary_model or args.model)
+        summary_path = export_summary_to_docx(summary, output_folder=output_folder, file_name=f"{base_name}_summary.docx")
+
+    if not failed_chunks:
+        # The manifest now records this recording, so its chunk files, remote uploads and context caches can go
+        delete_session_files(session_id)
+        delete_session_caches(session_id)
+        shutil.rmtree(temp_dir, ignore_errors=True)
+    return {
+        "status": "partial" if failed_chunks else "done",
+        "failed_chunks": failed_chunks,
+        "audio_path": audio_path,
+        "transcript_path": transcript_path,
+        "summary_path": summary_path,
+        "duration_ms": audio_info["duration_ms"],
+        "chunks": len(chunks),
+        "segments": len(transcript),
+        "bytes_uploaded": progress.bytes_uploaded,
+        "tokens_used": progress.tokens_used,
+        "elapsed_seconds": round(time.monotonic() - started_at, 1),
+        "completed_at": datetime.now().isoformat()
+    }
+
+
+def print_report(results, failures, skipped, wall_seconds):
+    """Print totals and throughput for the run."""
+    audio_seconds = sum(entry["duration_ms"] for entry in results) / 1000
+    chunks = sum(entry["chunks"] for entry in results)
+    print("\n=== Batch transcription report ===")
+    print(f"Recordings: {len(results)} done, {len(failures)} failed, {skipped} skipped (already done)")
+    print(f"Audio processed: {audio_seconds / 3600:.2f} h in {wall_seconds / 60:.1f} min wall time")
+    if wall_seconds > 0 and results:
+        print(f"Throughput: {audio_seconds / wall_seconds:.1f}x real time, {chunks / (wall_seconds / 60):.1f} chunks/min")
+    print(f"Uploaded: {sum(entry['bytes_uploaded'] for entry in results) / (1024 * 1024):.1f} MB, "
+          f"tokens used: {sum(entry['tokens_used'] for entry in results):,}")
+    for audio_path, error in failures:
+        print(f"FAILED {audio_path}: {error}")
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Transcribe and summarize a batch of meeting recordings.")
+    parser.add_argument("inputs", nargs="+", help="Directories or glob patterns of mp3/m4a/wav files")
+    parser.add_argument("--folder", required=True, help="Output folder under transcripts/")
+    parser.add_argument("--model", default="gemini-2.0-flash", help="Transcription model")
+    parser.add_argument("--summary-model", default=None, help="Summary model (defaults to --model)")
+    parser.add_argument("--no-summary", action="store_true", help="Only transcribe")
+    parser.add_argument("--instructions", default="", help="Additional transcription instructions")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 2, help="Processes for decoding and encoding")
+    parser.add_argument("--api-concurrency", type=int, default=TRANSCRIPTION_MAX_CONCURRENCY, help="Concurrent API requests")
+    parser.add_argument("--upload-profile", default=DEFAULT_UPLOAD_PROFILE, choices=list(UPLOAD_ENCODING_PROFILES.keys()))
+    parser.add_argument("--compress-silence", action="store_true", help="Shorten pauses longer than 2 seconds and skip silent chunks before upload")
+    parser.add_argument("--overlap", action="store_true", help="Overlap neighbouring chunks and stitch the duplicates")
+    return parser.parse_args()
+
+
+def main():
+    args = parse_args()
+    output_folder = os.path.join("transcripts", args.folder)
+    os.makedirs(output_folder, exist_ok=True)
+    manifest_path = os.path.join(output_folder, MANIFEST_FILE)
+    manifest = load_manifest(manifest_path)
+
+    audio_files = collect_audio_files(args.inputs)
+    pending = [path for path in audio_files if manifest.get(file_fingerprint(path), {}).get("status") != "done"]
+    skipped = len(audio_files) - len(pending)
+    print(f"Found {len(audio_files)} recordings; {len(pending)} to process, {skipped} already done")
+
+    results, failures = [], []
+    started_at = time.monotonic()
+    with ProcessPoolExecutor(max_workers=max(1, args.workers)) as cpu_pool, \
+            ThreadPoolExecutor(max_workers=max(1, args.api_concurrency)) as api_pool, \
+            ThreadPoolExecutor(max_workers=max(1, min(len(pending), args.workers))) as recording_pool:
+        futures = {
+            recording_pool.submit(process_recording, audio_path, args, cpu_pool, api_pool, output_folder): audio_path
+            for audio_path in pending
+        }
+        for future in as_completed(futures):
+            audio_path = futures[future]
+            fingerprint = file_fingerprint(audio_path)
+            try:
+                entry = future.result()
+                if entry["failed_chunks"]:
+                    error = f"{len(entry['failed_chunks'])} chunk(s) failed after retries; run again to retry them"
+                    failures.append((audio_path, error))
+                    print(f"Partially transcribed {os.path.basename(audio_path)}: {error}")
+                else:
+                    results.append(entry)
+                    print(f"Finished {os.path.basename(audio_path)} in {entry['elapsed_seconds']:.0f}s -> {entry['transcript_path']}")
+            except Exception as e:
+                failures.append((audio_path, str(e)))
+                entry = {"status": "failed", "audio_path": audio_path, "error": str(e), "completed_at": datetime.now().isoformat()}
+                print(f"Failed {os.path.basename(audio_path)}: {e}")
+            update_manifest(manifest_path, manifest, fingerprint, entry)
+
+    print_report(results, failures, skipped, time.monotonic() - started_at)
+
+
+if __name__ == "__main__":
+    main()
@@ -10,6 +10,76 @@ OPENAI_API_KEY = os.getenv("OPENAI_API_KEY")
 GEMINI_API_KEY = os.getenv("GEMINI_API_KEY")
 XAI_API_KEY = os.getenv("XAI_API_KEY")
 
+# Maximum number of audio chunks transcribed in parallel per request
+TRANSCRIPTION_MAX_CONCURRENCY = int(os.getenv("TRANSCRIPTION_MAX_CONCURRENCY", "4"))
+
+# Number of background worker threads running transcription/summary jobs
+JOB_WORKERS = int(os.getenv("JOB_WORKERS", "2"))
+
+# Maximum tokens a single transcription/summary job may use (0 = unlimited)
+JOB_TOKEN_BUDGET = int(os.getenv("JOB_TOKEN_BUDGET", "2000000"))
+
+# Encoding profile for uploaded chunks: speech_mp3, speech_opus or original
+UPLOAD_ENCODING_PROFILE = os.getenv("UPLOAD_ENCODING_PROFILE", "speech_mp3")
+
+# Shared, content-addressed cache of chunk transcriptions (size-bounded LRU)
+TRANSCRIPTION_CACHE_DIR = os.getenv("TRANSCRIPTION_CACHE_DIR", "transcription_cache")
+TRANSCRIPTION_CACHE_MAX_BYTES = int(os.getenv("TRANSCRIPTION_CACHE_MAX_BYTES", str(200 * 1024 * 1024)))
+
+# Map-reduce summarization: transcripts over the threshold are split into
+# sections of about SUMMARY_SECTION_TOKENS tokens, summarized this many at a time
+SUMMARY_MAP_REDUCE_THRESHOLD_TOKENS = int(os.getenv("SUMMARY_MAP_REDUCE_THRESHOLD_TOKENS", "100000"))
+SUMMARY_SECTION_TOKENS = int(os.getenv("SUMMARY_SECTION_TOKENS", "12000"))
+SUMMARY_MAP_CONCURRENCY = int(os.getenv("SUMMARY_MAP_CONCURRENCY", "4"))
+
+# Retry policy for LLM calls: attempts per call, and the time (seconds) after
+# which no further retry is started; each attempt is bounded by its own timeout
+LLM_RETRY_MAX_ATTEMPTS = int(os.getenv("LLM_RETRY_MAX_ATTEMPTS", "4"))
+LLM_CALL_DEADLINE_SECONDS = float(os.getenv("LLM_CALL_DEADLINE_SECONDS", "600"))
+
+# Shared LLM clients (src/llm_clients.py): HTTP connection pool size per client
+# and request/connect timeouts in seconds
+LLM_POOL_MAX_CONNECTIONS = int(os.getenv("LLM_POOL_MAX_CONNECTIONS", "20"))
+LLM_POOL_MAX_KEEPALIVE = int(os.getenv("LLM_POOL_MAX_KEEPALIVE", "10"))
+LLM_REQUEST_TIMEOUT_SECONDS = float(os.getenv("LLM_REQUEST_TIMEOUT_SECONDS", "600"))
+LLM_CONNECT_TIMEOUT_SECONDS = float(os.getenv("LLM_CONNECT_TIMEOUT_SECONDS", "10"))
+
+# Persistent cache of summary and table responses: SQLite file, entry lifetime
+# in seconds and total size budget in bytes (least recently used entries go first)
+LLM_RESPONSE_CACHE_DB = os.getenv("LLM_RESPONSE_CACHE_DB", "llm_response_cache.db")
+LLM_RESPONSE_CACHE_TTL_SECONDS = float(os.getenv("LLM_RESPONSE_CACHE_TTL_SECONDS", str(7 * 24 * 3600)))
+LLM_RESPONSE_CACHE_MAX_BYTES = int(os.getenv("LLM_RESPONSE_CACHE_MAX_BYTES", str(50 * 1024 * 1024)))
+
+# Gemini context caching of repeated transcripts and retried audio chunks:
+# handle lifetime in seconds, and the smallest transcript (tokens) worth caching
+GEMINI_CONTEXT_CACHE_TTL_SECONDS = int(os.getenv("GEMINI_CONTEXT_CACHE_TTL_SECONDS", "3600"))
+GEMINI_CONTEXT_CACHE_MIN_TOKENS = int(os.getenv("GEMINI_CONTEXT_CACHE_MIN_TOKENS", "4096"))
+
+# Transcript compaction before summarization (merged same-speaker turns, filler
+# turns dropped, speaker aliases) and the interval between its timestamp anchors
+TRANSCRIPT_COMPACTION_ENABLED = os.getenv("TRANSCRIPT_COMPACTION_ENABLED", "true").lower() in ("1", "true", "yes")
+TRANSCRIPT_COMPACTION_ANCHOR_SECONDS = int(os.getenv("TRANSCRIPT_COMPACTION_ANCHOR_SECONDS", "60"))
+
+# Summary calls: timeout per attempt (seconds), and optional hedging: when the
+# model has not answered by its SUMMARY_HEDGE_PERCENTILE latency, the same
+# request is also sent to SUMMARY_FALLBACK_MODEL and the first answer wins
+SUMMARY_CALL_TIMEOUT_SECONDS = float(os.getenv("SUMMARY_CALL_TIMEOUT_SECONDS", "300"))
+# Streamed summaries: longest gap between two pieces before the stream is abandoned
+SUMMARY_STREAM_IDLE_TIMEOUT_SECONDS = float(os.getenv("SUMMARY_STREAM_IDLE_TIMEOUT_SECONDS", "60"))
+SUMMARY_HEDGING_ENABLED = os.getenv("SUMMARY_HEDGING_ENABLED", "false").lower() in ("1", "true", "yes")
+SUMMARY_HEDGE_PERCENTILE = float(os.getenv("SUMMARY_HEDGE_PERCENTILE", "90"))
+SUMMARY_FALLBACK_MODEL = os.getenv("SUMMARY_FALLBACK_MODEL", "gpt-4.1")
+
+# Process-wide rate limits per provider and API key, shared by every session
+# (0 = unlimited): requests and tokens per minute, and requests in flight at once
+GEMINI_REQUESTS_PER_MINUTE = int(os.getenv("GEMINI_REQUESTS_PER_MINUTE", "1000"))
+GEMINI_TOKENS_PER_MINUTE = int(os.getenv("GEMINI_TOKENS_PER_MINUTE", "4000000"))
+OPENAI_REQUESTS_PER_MINUTE = int(os.getenv("OPENAI_REQUESTS_PER_MINUTE", "500"))
+OPENAI_TOKENS_PER_MINUTE = int(os.getenv("OPENAI_TOKENS_PER_MINUTE", "450000"))
+XAI_REQUESTS_PER_MINUTE = int(os.getenv("XAI_REQUESTS_PER_MINUTE", "480"))
+XAI_TOKENS_PER_MINUTE = int(os.getenv("XAI_TOKENS_PER_MINUTE", "0"))
+LLM_MAX_CONCURRENT_REQUESTS = int(os.getenv("LLM_MAX_CONCURRENT_REQUESTS", "16"))
+
 # Path to store the encryption key (optional, if you want to persist it in a separate file)
 ENCRYPTION_KEY_FILE = "encryption_key.txt"
 
@@ -58,6 +58,12 @@ for i, tab_name in enumerate(tab_names):
                 placeholder="E.g., 'Generate 1 table each for item in level 2'",
                 key=f"prompt_{tab_name}"
             )
+            bypass_cache = st.checkbox(
+                "Bypass cache",
+                value=False,
+                key=f"bypass_cache_{tab_name}",
+                help="Always call the model, even if this diagram was already processed with the same prompts."
+            )
             
             if st.button(f"Generate Tables ({tab_name})", key=f"generate_{tab_name}"):
                 update_activity_timestamp()  # Update timestamp on user interaction
@@ -73,7 +79,8 @@ for i, tab_name in enumerate(tab_names):
                             st.session_state.system_prompts[tab_name], 
                             base64_image, 
                             mime_type, 
-                            user_prompt
+                            user_prompt,
+                            bypass_cache=bypass_cache
                         )
                         st.session_state[f"messages_{tab_name}"] = messages
                         st.session_state[f"current_tables_{tab_name}"] = split_tables(generated_tables)
@@ -1,5 +1,6 @@
 # pages/2_Meeting_Transcription.py
 # Standard libraries
+import hashlib
 import os
 import shutil
 import tempfile
@@ -8,6 +9,7 @@ import tempfile
 import streamlit as st
 
 # Local application imports
+from config import JOB_TOKEN_BUDGET, TRANSCRIPTION_MAX_CONCURRENCY
 from src.utils import (
     initialize_session,
     update_activity_timestamp,
@@ -15,16 +17,21 @@ from src.utils import (
     clear_session,
 )
 from src.prompts import TRANSCRIPTION_DEFAULT_SYSTEM_PROMPT
-from src.audio_processor import (
-    transcribe_audio_with_diarization,
-    delete_uploaded_file,
-    parse_timestamp_to_seconds,
-)
+from src.audio_source import DEFAULT_UPLOAD_PROFILE, UPLOAD_ENCODING_PROFILES
+from src.chunk_planner import DEFAULT_OVERLAP_MS
+from src.gemini_context_cache import delete_session_caches
+from src.gemini_files import delete_session_files
+from src.job_handlers import submit_summary_job, submit_transcription_job
+from src.job_queue import ACTIVE_STATES, JOB_FAILED, JOB_SUCCEEDED, get_job, get_latest_job
+from src.preflight import estimate_summary, estimate_transcription
+from src.rate_limiter import rate_limit_stats
 from src.text_processor import (
-    summarize_transcription,
     export_summary_to_docx,
     export_transcription_to_docx,
+    format_transcription_text,
+    prepare_summary_input,
 )
+from src.transcript import Transcript
 
 # Initialize session and check for expiry
 initialize_session()
@@ -80,10 +87,118 @@ AVAILABLE_MODELS = [
 ]
 
 # Session state initialization for other keys
-for key in ["transcription_json", "audio_bytes", "uploaded_audio", "summary", "selected_time", "transcription_done", "exported_transcript_path", "exported_summary_path"]:
+for key in ["transcript", "audio_bytes", "uploaded_audio", "summary", "selected_time", "transcription_done", "exported_transcript_path", "exported_summary_path",
+            "transcription_job_id", "summary_job_id", "preflight_estimate", "preflight_settings", "selected_model"]:
     if key not in st.session_state:
         st.session_state[key] = None if key != "selected_time" else 0
 
+# Reattach to background jobs after a browser reload: restore the stored audio
+# and pick up the most recent transcription/summary jobs of this session
+if not st.session_state.transcription_job_id:
+    latest_transcription_job = get_latest_job(st.session_state.session_id, "transcription")
+    if latest_transcription_job:
+        st.session_state.transcription_job_id = latest_transcription_job["job_id"]
+        st.session_state.selected_model = st.session_state.selected_model or latest_transcription_job["params"]["model"]
+        stored_audio_path = latest_transcription_job["params"]["audio_path"]
+        if not st.session_state.uploaded_audio and os.path.exists(stored_audio_path):
+            with open(stored_audio_path, "rb") as f:
+                st.session_state.audio_bytes = f.read()
+            st.session_state.uploaded_audio = latest_transcription_job["params"]["audio_name"]
+        latest_summary_job = get_latest_job(st.session_state.session_id, "summary")
+        if latest_summary_job:
+            st.session_state.summary_job_id = latest_summary_job["job_id"]
+
+# Copy results of finished jobs into the session state
+transcription_job = get_job(st.session_state.transcription_job_id) if st.session_state.transcription_job_id else None
+if transcription_job and transcription_job["status"] == JOB_SUCCEEDED and not st.session_state.transcription_done:
+    st.session_state.transcript = Transcript.load(transcription_job["result"]["transcription"])
+    st.session_state.transcription_done = True
+summary_job = get_job(st.session_state.summary_job_id) if st.session_state.summary_job_id else None
+if summary_job and summary_job["status"] == JOB_SUCCEEDED and not st.session_state.summary:
+    st.session_state.summary = summary_job["result"]["summary"]
+
+
+def format_duration(seconds):
+    """Format a number of seconds as e.g. '3m 05s'."""
+    seconds = int(seconds)
+    return f"{seconds // 60}m {seconds % 60:02d}s"
+
+
+def format_cost(cost_usd):
+    """Format an estimated cost, which is None for models without pricing."""
+    return "unknown cost" if cost_usd is None else f"~${cost_usd:.2f}"
+
+
+@st.cache_data(show_spinner=False)
+def cached_transcription_estimate(audio_hash, _audio_bytes, file_ext, model, additional_instructions, overlap_ms):
+    """Pre-flight transcription estimate, computed once per audio file (by `audio_hash`) and settings."""
+    with tempfile.TemporaryDirectory() as estimate_dir:
+        estimate_path = os.path.join(estimate_dir, f"source{file_ext}")
+        with open(estimate_path, "wb") as f:
+            f.write(_audio_bytes)
+        return estimate_transcription(estimate_path, model, additional_instructions, overlap_ms=overlap_ms)
+
+
+@st.cache_data(show_spinner=False)
+def cached_summary_estimate(transcript_hash, _transcript, model):
+    """Summary input estimate and compaction stats, computed once per transcript (by `transcript_hash`) and model."""
+    _, summary_text, compaction = prepare_summary_input(_transcript, model=model)
+    return estimate_summary(summary_text, model), compaction
+
+
+@st.fragment(run_every=2)
+def render_job_status(job_id, label):
+    """Poll a background job while it is active and rerun the page once it finishes."""
+    job = get_job(job_id)
+    if job is None:
+        return
+    if job["status"] not in ACTIVE_STATES:
+        st.rerun()
+    progress = job["progress"] or {}
+    total_chunks = progress.get("total_chunks")
+    if total_chunks:
+        completed = progress.get("completed_chunks", 0)
+        details = [f"{completed}/{total_chunks} chunks"]
+        if progress.get("event") == "chunk_attempt" and progress.get("attempt"):
+            details.append(f"retrying chunk {progress['chunk'] + 1} (attempt {progress['attempt'] + 1})")
+        details.append(f"{progress.get('bytes_uploaded', 0) / (1024 * 1024):.1f} MB uploaded")
+        details.append(f"{progress.get('tokens_used', 0):,} tokens")
+        if progress.get("eta_seconds") is not None:
+            details.append(f"about {format_duration(progress['eta_seconds'])} left")
+        st.progress(completed / total_chunks, text=f"{label}: " + " · ".join(details))
+    elif progress.get("partial_summary"):
+        st.info(f"{label} is {job['status']} ({progress['input_tokens']:,} input tokens, {job['tokens_used']:,} tokens so far).", icon="⏳")
+        with st.container(height=500):
+            st.markdown(progress["partial_summary"])
+    elif progress.get("input_tokens"):
+        st.info(f"{label} is {job['status']} ({progress['input_tokens']:,} input tokens).", icon="⏳")
+    else:
+        st.info(f"{label} is {job['status']}.", icon="⏳")
+    # API keys are shared by every session; show when calls are waiting for the shared rate limit
+    for stats in rate_limit_stats():
+        if stats["queue_depth"]:
+            st.caption(
+                f"{stats['limiter']} API: {stats['queue_depth']} call(s) from {stats['waiting_sessions']} session(s) waiting for the "
+                f"shared rate limit, {stats['in_flight']} in flight (average wait {stats['average_wait_seconds']:.1f}s)."
+            )
+    st.caption("You can reload or close this page; the job keeps running on the server.")
+
+
+@st.fragment(run_every=2)
+def render_partial_transcription(job_id):
+    """Show the segments of chunks that have already finished while transcription runs."""
+    job = get_job(job_id)
+    if job is None or job["status"] not in ACTIVE_STATES:
+        return
+    finished_segments = (job["progress"] or {}).get("finished_segments", {})
+    if not finished_segments:
+        st.info("Transcribed segments will appear here as chunks finish.", icon="ℹ️")
+        return
+    with st.container(height=500):
+        for chunk_key in sorted(finished_segments, key=int):
+            for segment in Transcript.load(finished_segments[chunk_key]):
+                st.markdown(f"`{segment['timestamp']}` **{segment['speaker']}**: {segment['text']}")
+
 # Determine the current step for highlighting
 current_step = 1
 if st.session_state.uploaded_audio:
@@ -110,7 +225,9 @@ if uploaded_file and not st.session_state.uploaded_audio:
     audio_bytes = uploaded_file.getvalue()
     st.session_state.update({
         "audio_bytes": audio_bytes,
-        "uploaded_audio": uploaded_file  # Store the uploaded file object
+        "uploaded_audio": uploaded_file.name,  # Store the uploaded file name
+        "preflight_estimate": None,
+        "preflight_settings": None
     })
 
 # Highlight Step 1 if active
@@ -126,10 +243,67 @@ with st.container(border=True) as step2_container:
     st.subheader("Step 2: Transcription Settings")
     if st.session_state.uploaded_audio:
         full_prompt = TRANSCRIPTION_DEFAULT_SYSTEM_PROMPT
-        selected_model = st.selectbox("Select LLM Model", AVAILABLE_MODELS, index=0)
+        selected_model = st.selectbox(
+            "Select LLM Model", AVAILABLE_MODELS,
+            index=AVAILABLE_MODELS.index(st.session_state.selected_model) if st.session_state.selected_model in AVAILABLE_MODELS else 0
+        )
+        st.session_state.selected_model = selected_model
         additional_instructions = st.text_area(
             "Additional Instructions", placeholder="E.g., 'Meeting about project planning with Alice, Bob, Charlie.'"
         )
+        max_concurrent_chunks = st.number_input(
+            "Chunks to transcribe in parallel", min_value=1, max_value=8, value=TRANSCRIPTION_MAX_CONCURRENCY,
+            help="Higher values finish long recordings faster but use more of the API rate limit."
+        )
+        compress_silence = st.checkbox(
+            "Compress long silences", value=False,
+            help="Shortens pauses longer than 2 seconds before upload to reduce audio tokens, and skips chunks that are silent throughout "
+                 "(shown as [silence]). Timestamps still refer to the original recording."
+        )
+        overlap_chunks = st.checkbox(
+            "Overlap neighbouring chunks", value=False,
+            help="Transcribes 10 seconds of shared audio at each chunk boundary and removes the duplicated lines, so sentences are not cut in half."
+        )
+        stream_segments = st.checkbox(
+            "Stream segments while transcribing", value=True,
+            help="Shows each chunk's segments as Gemini writes them instead of when the whole chunk is done. "
+                 "If a response is cut off, its complete segments are still kept."
+        )
+        upload_profile = st.selectbox(
+            "Upload encoding", list(UPLOAD_ENCODING_PROFILES.keys()),
+            index=list(UPLOAD_ENCODING_PROFILES.keys()).index(DEFAULT_UPLOAD_PROFILE),
+            help="Speech profiles upload mono 16 kHz audio, which is much smaller and faster to send. 'original' keeps the source channels and sample rate. "
+                 "'source' cuts chunks straight out of the uploaded file without re-encoding when its codec (MP3, AAC/M4A, FLAC, Vorbis, WAV) is supported."
+        )
+        overlap_ms = DEFAULT_OVERLAP_MS if overlap_chunks else 0
+        with st.expander("Pre-flight estimate"):
+            st.caption("Plans the chunks and counts tokens locally; nothing is uploaded.")
+            if st.button("Estimate tokens and cost"):
+                update_activity_timestamp()  # Update timestamp on user interaction
+                file_ext = os.path.splitext(st.session_state.uploaded_audio)[1].lower()
+                try:
+                    st.session_state.preflight_estimate = cached_transcription_estimate(
+                        hashlib.sha256(st.session_state.audio_bytes).hexdigest(), st.session_state.audio_bytes, file_ext,
+                        selected_model, additional_instructions, overlap_ms
+                    )
+                    st.session_state.preflight_settings = (selected_model, additional_instructions, overlap_ms)
+                except Exception as e:
+                    st.error(f"Could not estimate usage: {e}")
+            estimate = st.session_state.preflight_estimate
+            if estimate:
+                st.markdown(
+                    f"- **Duration:** {format_duration(estimate['duration_ms'] / 1000)} in {len(estimate['chunks'])} chunks\n"
+                    f"- **Transcription:** {estimate['audio_tokens']:,} audio + {estimate['prompt_tokens']:,} prompt + "
+                    f"~{estimate['output_tokens']:,} output tokens\n"
+                    f"- **Summary input:** ~{estimate['summary_input_tokens']:,} tokens\n"
+                    f"- **Total:** ~{estimate['total_tokens']:,} tokens ({format_cost(estimate['estimated_cost_usd'])})"
+                )
+                if compress_silence:
+                    st.caption("Silence compression is not taken into account, so audio tokens are an upper bound.")
+                if JOB_TOKEN_BUDGET and estimate["transcription_tokens"] > JOB_TOKEN_BUDGET:
+                    st.warning(f"This recording is estimated above the per-job budget of {JOB_TOKEN_BUDGET:,} tokens and will be rejected.", icon="⚠️")
+                st.caption(f"Text tokens counted with {estimate['tokenizer']}.")
+
         with st.expander("Advanced: View Full System Prompt"):
             st.code(TRANSCRIPTION_DEFAULT_SYSTEM_PROMPT, language="text")
             # full_prompt = st.text_area("Full System Prompt", 
@@ -138,7 +312,8 @@ with st.container(border=True) as step2_container:
             #                            disabled=True)
             st.warning("Changing the JSON structure may break the app. View only", icon="⚠️")
 
-        if st.button("Transcribe", disabled=not st.session_state.uploaded_audio):
+        transcription_running = bool(transcription_job and transcription_job["status"] in ACTIVE_STATES)
+        if st.button("Transcribe", disabled=not st.session_state.uploaded_audio or transcription_running):
             update_activity_timestamp()  # Update timestamp on user interaction
             temp_dir = os.path.join("transcription_temp", st.session_state.session_id)
             if os.path.exists(temp_dir):
@@ -146,29 +321,42 @@ with st.container(border=True) as step2_container:
                 print(f"Cleared temporary transcription directory: {temp_dir}")
             os.makedirs(temp_dir)
 
-            file_ext = os.path.splitext(st.session_state.uploaded_audio.name)[1].lower()
-            suffix = file_ext
-            
-            with tempfile.NamedTemporaryFile(delete=False, suffix=suffix) as temp_file:
-                temp_file.write(st.session_state.audio_bytes)
-                temp_file_path = temp_file.name
+            # Keep the audio on disk for the background job, so it survives page reloads
+            file_ext = os.path.splitext(st.session_state.uploaded_audio)[1].lower()
+            audio_path = os.path.join(temp_dir, f"source{file_ext}")
+            with open(audio_path, "wb") as f:
+                f.write(st.session_state.audio_bytes)
             prompt_to_use = additional_instructions if full_prompt == TRANSCRIPTION_DEFAULT_SYSTEM_PROMPT else full_prompt
+            # Reuse the pre-flight estimate when it was made for these settings; otherwise the job estimates itself
+            preflight_matches = st.session_state.preflight_settings == (selected_model, prompt_to_use, overlap_ms)
             try:
-                with st.spinner("Transcribing audio (processing 8-minute chunks)..."):
-                    transcription_json, uploaded_audio = transcribe_audio_with_diarization(
-                        temp_file_path, session_id=st.session_state.session_id, model=selected_model, additional_instructions=prompt_to_use
-                    )
+                job_id = submit_transcription_job(
+                    st.session_state.session_id, audio_path, st.session_state.uploaded_audio, selected_model,
+                    additional_instructions=prompt_to_use,
+                    max_concurrent_chunks=max_concurrent_chunks,
+                    max_silence_ms=2000 if compress_silence else None,
+                    overlap_ms=overlap_ms,
+                    upload_profile=upload_profile,
+                    stream=stream_segments,
+                    estimate=st.session_state.preflight_estimate if preflight_matches else None
+                )
                 st.session_state.update({
-                    "transcription_json": transcription_json,
-                    "uploaded_audio": uploaded_audio,  # Update with the API-uploaded file reference
-                    "transcription_done": True
+                    "transcription_job_id": job_id,
+                    "transcript": None,
+                    "transcription_done": False,
+                    "summary": None,
+                    "summary_job_id": None
                 })
-                st.success("Transcription completed.")
+                transcription_job = get_job(job_id)
             except Exception as e:
                 st.error(f"Error: {e}")
-            finally:
-                if os.path.exists(temp_file_path):
-                    os.unlink(temp_file_path)
+
+        if transcription_job and transcription_job["status"] in ACTIVE_STATES:
+            render_job_status(transcription_job["job_id"], "Transcribing")
+        elif transcription_job and transcription_job["status"] == JOB_FAILED:
+            st.error(f"Error: {transcription_job['error']}")
+        elif st.session_state.transcription_done:
+            st.success("Transcription completed.")
     else:
         st.info("Upload an audio file in Step 1 to enable transcription settings.", icon="ℹ️")
 
@@ -185,19 +373,22 @@ with st.container(border=True) as step3_container:
     st.subheader("Step 3: Review Transcription with Timestamps")
     if st.session_state.transcription_done:
         with st.container(height=500):
-            for idx, transcript in enumerate(st.session_state.transcription_json):
-                if st.button(transcript['timestamp'], key=f"ts_{idx}"):
+            transcript = st.session_state.transcript
+            for idx in range(len(transcript)):
+                if st.button(transcript.timestamp(idx), key=f"ts_{idx}"):
                     update_activity_timestamp()  # Update timestamp on user interaction
-                    st.session_state.selected_time = parse_timestamp_to_seconds(transcript['timestamp'])
-                speaker = transcript.get('speaker', 'Unknown Speaker')
-                text = transcript.get('text', '[Transcription Missing]')
+                    st.session_state.selected_time = transcript.start(idx)
+                speaker = transcript.speaker(idx)
+                text = transcript.text(idx)
                 st.markdown(f"**{speaker}**: {text}")
                 st.markdown("---")
         
         if st.session_state.audio_bytes:
-            file_ext = os.path.splitext(st.session_state.uploaded_audio.name)[1].lower()
+            file_ext = os.path.splitext(st.session_state.uploaded_audio)[1].lower()
             audio_format = "audio/wav" if file_ext == ".wav" else "audio/mp3"
             st.audio(st.session_state.audio_bytes, format=audio_format, start_time=st.session_state.selected_time)
+    elif transcription_job and transcription_job["status"] in ACTIVE_STATES:
+        render_partial_transcription(transcription_job["job_id"])
     else:
         st.info("Complete transcription in Step 2 to review the results here.", icon="ℹ️")
 
@@ -213,16 +404,39 @@ if current_step == 3:
 with st.container(border=True) as step4_container:
     st.subheader("Step 4: Generate Summary")
     if st.session_state.transcription_done:
-        if st.button("Generate Summary", disabled=not st.session_state.transcription_done):
+        # Step 2 is hidden when a reload restores the transcript without its audio
+        selected_model = st.session_state.selected_model or AVAILABLE_MODELS[0]
+        # Counting tokens is slow for long transcripts, so it is not repeated on every rerun
+        transcript_hash = hashlib.sha256(format_transcription_text(st.session_state.transcript).encode("utf-8")).hexdigest()
+        summary_estimate, compaction = cached_summary_estimate(transcript_hash, st.session_state.transcript, selected_model)
+        compaction_note = f" after compaction ({compaction['reduction']:.0%} fewer)" if compaction and compaction["reduction"] else ""
+        st.caption(
+            f"Summary input: {summary_estimate['input_tokens']:,} tokens{compaction_note} ({summary_estimate['tokenizer']}), "
+            f"{format_cost(summary_estimate['estimated_cost_usd'])} before output."
+        )
+        summary_running = bool(summary_job and summary_job["status"] in ACTIVE_STATES)
+        bypass_summary_cache = st.checkbox(
+            "Bypass cache",
+            value=False,
+            key="bypass_summary_cache",
+            help="Always call the model, even if this transcript was already summarized with the same model and prompt."
+        )
+        if st.button("Generate Summary", disabled=not st.session_state.transcription_done or summary_running):
             update_activity_timestamp()  # Update timestamp on user interaction
             try:
-                with st.spinner("Generating summary..."):
-                    summary = summarize_transcription(st.session_state.transcription_json, model=selected_model)
-                st.session_state.summary = summary
-                st.success("Summary generated successfully.")
+                job_id = submit_summary_job(
+                    st.session_state.session_id, st.session_state.transcript, selected_model, bypass_cache=bypass_summary_cache
+                )
+                st.session_state.update({"summary_job_id": job_id, "summary": None})
+                summary_job = get_job(job_id)
             except Exception as e:
                 st.error(f"Error generating summary: {e}")
 
+        if summary_job and summary_job["status"] in ACTIVE_STATES:
+            render_job_status(summary_job["job_id"], "Summary generation")
+        elif summary_job and summary_job["status"] == JOB_FAILED:
+            st.error(f"Error generating summary: {summary_job['error']}")
+
         if st.session_state.summary:
             st.subheader("Meeting Summary")
             with st.container(height=500):
@@ -277,7 +491,7 @@ with st.container(border=True) as step5_container:
                 with st.spinner("Exporting transcription and summary to DOCX..."):
                     transcript_file_name = f"{export_file_name}_transcript.docx"
                     transcript_path = export_transcription_to_docx(
-                        st.session_state.transcription_json,
+                        st.session_state.transcript,
                         output_folder=output_folder,
                         file_name=transcript_file_name
                     )
@@ -330,20 +544,23 @@ with st.container(border=True) as step5_container:
             update_activity_timestamp()  # Update timestamp on user interaction
             try:
                 temp_dir = os.path.join("transcription_temp", st.session_state.session_id)
-                delete_uploaded_file(st.session_state.uploaded_audio.name)
+                deleted_count = delete_session_files(st.session_state.session_id)
+                delete_session_caches(st.session_state.session_id)
                 if os.path.exists(temp_dir):
                     shutil.rmtree(temp_dir)
                     print(f"Cleaned up user-specific temporary directory: {temp_dir}")
                 del st.session_state.uploaded_audio
+                st.session_state.transcription_job_id = None
+                st.session_state.summary_job_id = None
                 st.session_state.transcription_done = False
-                st.session_state.transcription_json = None
+                st.session_state.transcript = None
                 st.session_state.audio_bytes = None
                 st.session_state.selected_time = 0
                 st.session_state.summary = None
                 st.session_state.exported_transcript_path = None
                 st.session_state.exported_summary_path = None
                 clear_session()  # Clear the session ID and related data
-                st.success("Uploaded audio file deleted from Gemini servers, local temporary files cleaned up, and session cleared.")
+                st.success(f"Deleted {deleted_count} uploaded file(s) from Gemini servers, cleaned up local temporary files, and cleared the session.")
             except Exception as e:
                 st.error(f"Error deleting file: {e}")
 
@@ -17,11 +17,18 @@ from src.prompts import (
     GENERAL_MEETING_PROMPT,
     OVERVIEW_SUMMARY_PROMPT
 )
+from config import SUMMARY_FALLBACK_MODEL, SUMMARY_HEDGING_ENABLED, TRANSCRIPT_COMPACTION_ENABLED
+from src.model_router import AUTO_MODEL, route_summary
 from src.text_processor import (
+    MODEL_CONFIG,
+    REASONING_MODELS,
+    combine_template_summaries,
     summarize_transcription,
+    summarize_with_templates,
     export_summary_to_docx,
     extract_text_from_docx,
     extract_text_from_pdf,
+    prepare_summary_input,
 )
 
 # Page configuration and layout
@@ -39,6 +46,7 @@ st.divider()
 
 # Define available models
 AVAILABLE_MODELS = {
+    "Auto (fastest model that fits)": AUTO_MODEL,
     "OpenAI GPT-4.1": "gpt-4.1",
     "Grok-3": "grok-3",
     "Grok-3-mini": "grok-3-mini",
@@ -70,6 +78,9 @@ PROMPT_TEMPLATES = {
     "overview": {"name": "Executive Overview", "icon": "👔", "description": "Provides a high-level summary suitable for executive stakeholders.", "prompt": OVERVIEW_SUMMARY_PROMPT}
 }
 
+# Summarization strategies: value is the map_reduce argument of summarize_transcription
+SUMMARY_STRATEGIES = {"Auto": None, "Single pass": False, "Map-reduce": True}
+
 # Main container
 main_container = st.container(border=False)
 
@@ -128,20 +139,43 @@ with main_container:
         selected_model = st.selectbox(
             "Select AI Model:",
             options=list(AVAILABLE_MODELS.keys()),
-            index=list(AVAILABLE_MODELS.values()).index("gemini-1.5-pro-latest"),
+            index=list(AVAILABLE_MODELS.values()).index(AUTO_MODEL),
             format_func=lambda x: x,
-            help="Choose the AI model for generating the summary."
+            help="Choose the AI model for generating the summary. Auto counts the transcript's tokens and picks the fastest model "
+                 "whose context window fits it, or summarizes in sections when none does."
         )
         model_id = AVAILABLE_MODELS[selected_model]
-
-        # Reasoning checkbox for supported models
+        compact_transcript = st.checkbox(
+            "Compact transcript before summarizing",
+            value=TRANSCRIPT_COMPACTION_ENABLED,
+            key="compact_transcript",
+            help="Merge consecutive turns of the same speaker, keep a timestamp only every minute, shorten long speaker names "
+                 "and drop filler turns such as 'okay' or '[Transcription Missing]'. Cuts input tokens, cost and latency."
+        )
+        routed_model = model_id
+        if st.session_state.get("loaded_transcript_text"):
+            _, summary_text, compaction = prepare_summary_input(st.session_state.loaded_transcript_text, compact_transcript)
+            if compaction and compaction["reduction"]:
+                st.caption(
+                    f"Compaction: {compaction['original_tokens']:,} → {compaction['compacted_tokens']:,} tokens "
+                    f"({compaction['reduction']:.0%} fewer; {compaction['dropped_turns']} filler turns dropped, "
+                    f"{compaction['merged_turns']} turns merged)."
+                )
+            route = route_summary(summary_text, model_id, model_config=MODEL_CONFIG)
+            routed_model = route["model"]
+            if model_id == AUTO_MODEL:
+                st.caption(f"Will use **{route['model']}** ({route['reason']}, ~{route['estimated_seconds']:.0f}s).")
+            elif route["map_reduce"]:
+                st.warning(f"{route['reason']}.", icon="⚠️")
+
+        # Reasoning checkbox for supported models, including the one Auto routes to
         enable_reasoning = False
-        if model_id in ["grok-3-mini", "gemini-2.5-pro-exp-03-25", "o4-mini"]:
+        if routed_model in REASONING_MODELS:
             enable_reasoning = st.checkbox(
-                f"Enable Reasoning Mode ({selected_model})",
+                f"Enable Reasoning Mode ({routed_model})",
                 value=False,
                 key="reasoning_mode",
-                help="Show step-by-step reasoning before the summary (available for Grok-3-mini and Gemini 2.5 Pro)."
+                help="Show step-by-step reasoning before the summary (available for Grok-3-mini, Gemini 2.5 Pro and o4-mini)."
             )
 
         st.divider()
@@ -158,6 +192,21 @@ with main_container:
 
         st.info(PROMPT_TEMPLATES[st.session_state.selected_prompt_key]["description"])
 
+        generate_all_templates = st.toggle(
+            "Generate several templates at once",
+            key="generate_all_templates_toggle",
+            help="Run the selected templates concurrently against the same transcript and export them as one combined document."
+        )
+        selected_template_keys = []
+        if generate_all_templates:
+            selected_template_keys = st.multiselect(
+                "Templates to generate:",
+                prompt_options,
+                default=prompt_options,
+                format_func=lambda x: f"{PROMPT_TEMPLATES[x]['icon']} {PROMPT_TEMPLATES[x]['name']}",
+                key="selected_template_keys"
+            )
+
         view_prompt_enabled = st.checkbox("View prompt template")
         if view_prompt_enabled:
             with st.expander("Selected Prompt Template", expanded=True):
@@ -177,6 +226,30 @@ with main_container:
             help="Provide specific keywords or topics for the AI to pay extra attention to."
         )
 
+        summary_strategy = st.radio(
+            "Summarization Strategy:",
+            list(SUMMARY_STRATEGIES.keys()),
+            horizontal=True,
+            key="summary_strategy_radio",
+            help="Map-reduce summarizes sections of the transcript in parallel and then merges them, for transcripts too long for one request. "
+                 "Auto uses it only when the transcript is very long."
+        )
+
+        bypass_cache = st.checkbox(
+            "Bypass cache",
+            value=False,
+            key="bypass_summary_cache",
+            help="Always call the model. By default, re-generating with the same document, template and model returns the stored summary."
+        )
+
+        hedge_summary = st.checkbox(
+            "Hedge with fallback model",
+            value=SUMMARY_HEDGING_ENABLED,
+            key="hedge_summary",
+            help=f"If the model is slower than usual, also send the request to {SUMMARY_FALLBACK_MODEL} and keep whichever answer "
+                 "arrives first. The summary is shown when complete instead of streamed."
+        )
+
     st.write("")
 
     # Step 3: Generate Summary
@@ -194,13 +267,51 @@ with main_container:
             final_prompt = st.session_state.selected_prompt
             if additional_focus:
                 final_prompt += f"\n\n--- Additional Focus Instructions ---\n{additional_focus}"
-            with st.spinner(f"⏳ Generating summary using {selected_model}... This may take a moment."):
-                summary, reasoning = summarize_transcription(
-                    st.session_state.loaded_transcript_text,
-                    model=model_id,
-                    custom_prompt=final_prompt,
-                    enable_reasoning=enable_reasoning
-                )
+            # Resolve Auto to a concrete model, and fall back to map-reduce when the transcript does not fit the model
+            _, summary_text, _ = prepare_summary_input(st.session_state.loaded_transcript_text, compact_transcript)
+            route = route_summary(summary_text, model_id, final_prompt, model_config=MODEL_CONFIG)
+            summary_model = route["model"]
+            summary_map_reduce = True if route["map_reduce"] else SUMMARY_STRATEGIES[summary_strategy]
+            if generate_all_templates and selected_template_keys:
+                templates = {}
+                for template_key in selected_template_keys:
+                    template_prompt = PROMPT_TEMPLATES[template_key]["prompt"]
+                    if additional_focus:
+                        template_prompt += f"\n\n--- Additional Focus Instructions ---\n{additional_focus}"
+                    templates[PROMPT_TEMPLATES[template_key]["name"]] = template_prompt
+                with st.spinner(f"⏳ Generating {len(templates)} summaries in parallel using {summary_model}..."):
+                    template_results = summarize_with_templates(
+                        st.session_state.loaded_transcript_text,
+                        templates,
+                        model=summary_model,
+                        enable_reasoning=enable_reasoning,
+                        map_reduce=summary_map_reduce,
+                        session_id=st.session_state.session_id,
+                        bypass_cache=bypass_cache,
+                        compact=compact_transcript,
+                        hedge=hedge_summary
+                    )
+                summary, reasoning = combine_template_summaries(template_results)
+            else:
+                with st.spinner(f"⏳ Generating summary using {summary_model}... This may take a moment."):
+                    summary_stream = summarize_transcription(
+                        st.session_state.loaded_transcript_text,
+                        model=summary_model,
+                        custom_prompt=final_prompt,
+                        enable_reasoning=enable_reasoning,
+                        map_reduce=summary_map_reduce,
+                        bypass_cache=bypass_cache,
+                        stream=True,
+                        session_id=st.session_state.session_id,
+                        compact=compact_transcript,
+                        hedge=hedge_summary
+                    )
+                    # Show the text as it arrives; the finished summary is rendered below as before
+                    streaming_placeholder = st.empty()
+                    with streaming_placeholder.container(border=True, height=600):
+                        st.write_stream(summary_stream)
+                    streaming_placeholder.empty()
+                summary, reasoning = summary_stream.result
             st.session_state.transcript_summary = summary
             st.session_state.transcript_reasoning = reasoning
             st.session_state.current_page = 1
@@ -259,7 +370,10 @@ with main_container:
                 else:
                     output_folder = os.path.join(base_transcript_dir, selected_folder_option)
 
-            selected_template_name = PROMPT_TEMPLATES[st.session_state.selected_prompt_key]["name"].replace(" ", "_")
+            if generate_all_templates and selected_template_keys:
+                selected_template_name = "Combined"
+            else:
+                selected_template_name = PROMPT_TEMPLATES[st.session_state.selected_prompt_key]["name"].replace(" ", "_")
             default_filename = f"{selected_template_name}_summary_{datetime.now().strftime('%Y%m%d_%H%M')}"
             export_file_name = st.text_input("File name (no extension):", value=default_filename, key="export_filename_plain")
             safe_export_file_name = "".join(c for c in export_file_name if c.isalnum() or c in ('_', '-')).strip() or "summary_export"
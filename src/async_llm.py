@@ -0,0 +1,171 @@
+# src/async_llm.py
+# Standard library imports
+import asyncio
+import threading
+import time
+
+# Local imports
+from config import SUMMARY_CALL_TIMEOUT_SECONDS
+from src.llm_clients import get_async_openai_client, get_gemini_client
+from src.model_router import record_latency
+from src.rate_limiter import async_rate_limited, current_session, limiter_for
+
+# One event loop in a background thread serves every session, so async clients
+# (and their connection pools) stay bound to a single loop
+_loop = None
+_loop_lock = threading.Lock()
+
+
+def _event_loop():
+    global _loop
+    with _loop_lock:
+        if _loop is None:
+            loop = asyncio.new_event_loop()
+            threading.Thread(target=loop.run_forever, name="async-llm", daemon=True).start()
+            _loop = loop
+        return _loop
+
+
+def run_async(coro):
+    """Run a coroutine on the shared background event loop and wait for its result."""
+    return asyncio.run_coroutine_threadsafe(coro, _event_loop()).result()
+
+
+async def agenerate_text(provider_config, model, system_prompt, user_text, max_output_tokens, cached_context=None):
+    """Send one system + user prompt to `model` and return the response text (no retries).
+
+    Args:
+        provider_config: The model's MODEL_CONFIG entry (client_type, api_key, base_url)
+        cached_context: Gemini context cache that already holds the user content
+    """
+    if provider_config["client_type"] == "openai":
+        client = get_async_openai_client(provider_config["api_key"], provider_config.get("base_url"))
+        token_limit = {"max_completion_tokens": max_output_tokens} if model == "o4-mini" else {"max_tokens": max_output_tokens}
+        response = await client.chat.completions.create(
+            model=model,
+            messages=[
+                {"role": "system", "content": system_prompt},
+                {"role": "user", "content": user_text}
+            ],
+            **token_limit
+        )
+        return response.choices[0].message.content
+
+    client = get_gemini_client(provider_config["api_key"])
+    if cached_context:  # transcript already in the context cache
+        response = await client.aio.models.generate_content(
+            model=model,
+            contents=[system_prompt],
+            config={"cached_content": cached_context}
+        )
+    else:
+        response = await client.aio.models.generate_content(
+            model=model,
+            contents=[system_prompt, user_text]
+        )
+    return response.text
+
+
+async def _timed_generate(provider_config, model, system_prompt, user_text, max_output_tokens, input_tokens, cached_context=None):
+    started_at = time.monotonic()
+    completed = failed = False
+    try:
+        text = await agenerate_text(provider_config, model, system_prompt, user_text, max_output_tokens, cached_context)
+        completed = True
+        return text
+    except Exception:
+        failed = True  # An error response says nothing about how long an answer takes
+        raise
+    finally:
+        if not failed:
+            # A timed-out or cancelled (losing hedge) call took at least this long; dropping it would hide slow tails
+            record_latency(model, input_tokens, time.monotonic() - started_at, censored=not completed)
+
+
+async def _rate_limited_generate(provider_config, model, system_prompt, user_text, max_output_tokens, input_tokens, session_id):
+    async with async_rate_limited(
+        provider_config["client_type"], provider_config["api_key"], provider_config.get("base_url"), input_tokens, session_id
+    ):
+        return await _timed_generate(provider_config, model, system_prompt, user_text, max_output_tokens, input_tokens)
+
+
+async def _hedged(requests, hedge_after):
+    """Start the primary request; if it has not succeeded after `hedge_after` seconds, start the fallback too.
+
+    Args:
+        requests: [(model, coroutine factory)] for the primary and the fallback
+
+    Returns (response, model) for the first successful response; the other request is cancelled.
+    """
+    (primary_model, primary), (fallback_model, fallback) = requests
+    tasks = {asyncio.ensure_future(primary()): primary_model}
+    try:
+        done, _ = await asyncio.wait(tasks, timeout=hedge_after)
+        if done and next(iter(done)).exception() is None:
+            return next(iter(done)).result(), primary_model
+        if done:
+            print(f"{primary_model} failed ({next(iter(done)).exception()}); trying {fallback_model}")
+        else:
+            print(f"{primary_model} has not answered after {hedge_after:.1f}s; also asking {fallback_model}")
+        tasks[asyncio.ensure_future(fallback())] = fallback_model
+
+        pending = {task for task in tasks if not task.done()}
+        errors = [task.exception() for task in done]
+        while pending:
+            done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+            for task in done:
+                if task.exception() is None:
+                    print(f"Hedged summary answered by {tasks[task]}")
+                    return task.result(), tasks[task]
+                errors.append(task.exception())
+        raise errors[-1]
+    finally:
+        for task in tasks:
+            if not task.done():
+                task.cancel()
+
+
+def generate_text(model_config, model, system_prompt, user_text, max_output_tokens, input_tokens, cached_context=None,
+                  timeout=SUMMARY_CALL_TIMEOUT_SECONDS, fallback_model=None, hedge_after=None):
+    """
+    Generate text through the async provider clients, with a timeout and optional hedging.
+
+    One attempt only; callers wrap this in src.retry_policy.call_with_retry.
+    The primary model's rate-limit slot is taken before the timeout and hedge
+    clocks start, so waiting for the shared limit is not mistaken for a slow
+    provider. A fallback still queued when the call ends leaves the queue.
+
+    Args:
+        model_config: MODEL_CONFIG mapping model -> provider settings
+        input_tokens: Approximate input size, for latency tracking
+        cached_context: Gemini context cache holding the user content (primary model only)
+        timeout: Seconds before the call (including any hedge) is abandoned with TimeoutError
+        fallback_model: Model to hedge with; the full `user_text` is sent to it
+        hedge_after: Seconds to wait for the primary model before also asking `fallback_model`
+
+    Returns:
+        Tuple of (response text, model that answered); the model is
+        `fallback_model` when the hedge won
+    """
+    # Tasks on the event loop do not see this thread's session, so pass it along for fair queuing
+    session_id = current_session()
+
+    def primary():
+        return _timed_generate(model_config[model], model, system_prompt, user_text, max_output_tokens, input_tokens, cached_context)
+
+    def fallback():
+        return _rate_limited_generate(model_config[fallback_model], fallback_model, system_prompt, user_text, max_output_tokens,
+                                      input_tokens, session_id)
+
+    provider_config = model_config[model]
+    limiter = limiter_for(provider_config["client_type"], provider_config["api_key"], provider_config.get("base_url"))
+    limiter.acquire(input_tokens, session_id)
+    try:
+        if not fallback_model:
+            return run_async(asyncio.wait_for(primary(), timeout)), model
+        return run_async(asyncio.wait_for(_hedged([(model, primary), (fallback_model, fallback)], hedge_after), timeout))
+    except asyncio.TimeoutError:
+        # Retried by call_with_retry like other network errors; the abandoned requests are cancelled
+        raise TimeoutError(f"{model} did not respond within {timeout:g}s")
+    finally:
+        limiter.release()
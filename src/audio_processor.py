@@ -2,39 +2,426 @@
 # Standard library imports
 import json
 import os
+import re
 import time
-import uuid
 import tempfile
+import threading
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from difflib import SequenceMatcher
 
 # Third-party imports
 import pypandoc
 from docx import Document
-from pydub import AudioSegment
-from google import genai
 
 # Local imports
-from config import GEMINI_API_KEY
+from config import GEMINI_API_KEY, TRANSCRIPTION_MAX_CONCURRENCY
+from src.audio_source import (
+    DEFAULT_UPLOAD_PROFILE,
+    PASSTHROUGH_CODECS,
+    UPLOAD_ENCODING_PROFILES,
+    can_stream_copy,
+    cut_audio_window,
+    encode_for_upload,
+    load_audio_window,
+    probe_audio,
+)
+from src.chunk_planner import (
+    DEFAULT_BOUNDARY_TOLERANCE_MS,
+    DEFAULT_CHUNK_LENGTH_MS,
+    compress_silences,
+    is_silent,
+    map_to_original_ms,
+    plan_chunks,
+)
+from src.errors import JobCancelled
+from src.gemini_context_cache import get_context_cache
+from src.gemini_files import upload_file
+from src.json_stream import JsonArrayStreamParser
+from src.llm_clients import get_gemini_client
+from src.preflight import AUDIO_TOKENS_PER_SECOND, CHARS_PER_TOKEN
+from src.rate_limiter import bind_session, rate_limited
+from src.transcript import Transcript, format_time, parse_time_range
+from src.retry_policy import call_with_retry, classify_error
+from src.transcription_cache import get_cached_transcription, make_cache_key, store_transcription
 from src.prompts import TRANSCRIPTION_DEFAULT_SYSTEM_PROMPT, SUMMARY_DEFAULT_SYSTEM_PROMPT, GENERAL_SUMMARY_PROMPT
 
-# Configure Gemini API
-client = genai.Client(api_key=GEMINI_API_KEY)
+# Shared Gemini client (also used by src.gemini_files and text_processor)
+client = get_gemini_client()
 
+# Text of the segment standing in for a chunk skipped as silent
+SILENCE_PLACEHOLDER = "[silence]"
+# Text of the segment standing in for a chunk that could not be transcribed
+TRANSCRIPTION_FAILED_PLACEHOLDER = "[Transcription Failed After Retries]"
 
-def convert_m4a_to_mp3(input_path, output_path):
-    """Convert an m4a file to mp3 using pydub."""
+
+class TranscriptionProgress:
+    """Thread-safe running totals for a transcription, forwarded to an optional callback.
+
+    Every callback payload carries the event fields plus a snapshot of
+    completed/total chunks, bytes uploaded, tokens used, elapsed time and ETA.
+    """
+
+    def __init__(self, total_chunks, callback=None):
+        self.total_chunks = total_chunks
+        self.callback = callback
+        self.completed_chunks = 0
+        self.bytes_uploaded = 0
+        self.tokens_used = 0
+        self.started_at = time.monotonic()
+        self._lock = threading.Lock()
+
+    def add_usage(self, bytes_uploaded=0, tokens=0):
+        with self._lock:
+            self.bytes_uploaded += bytes_uploaded
+            self.tokens_used += tokens
+
+    def snapshot(self):
+        elapsed = time.monotonic() - self.started_at
+        eta_seconds = None
+        if self.completed_chunks:
+            eta_seconds = elapsed / self.completed_chunks * (self.total_chunks - self.completed_chunks)
+        return {
+            "completed_chunks": self.completed_chunks,
+            "total_chunks": self.total_chunks,
+            "bytes_uploaded": self.bytes_uploaded,
+            "tokens_used": self.tokens_used,
+            "elapsed_seconds": round(elapsed, 1),
+            "eta_seconds": round(eta_seconds, 1) if eta_seconds is not None else None
+        }
+
+    def emit(self, event, **data):
+        with self._lock:
+            if event == "chunk_finished":
+                self.completed_chunks += 1
+            if self.callback is not None:
+                self.callback({"event": event, **data, **self.snapshot()})
+
+def _chunk_offset_seconds(relative_seconds, start_ms, time_map):
+    """Convert a chunk-relative timestamp to absolute seconds in the recording."""
+    relative_ms = relative_seconds * 1000
+    if time_map:
+        relative_ms = map_to_original_ms(relative_ms, time_map)
+    return (start_ms + relative_ms) // 1000
+
+def _chunk_resume_path(temp_dir, session_id, chunk_idx):
+    return os.path.join(temp_dir, f"{session_id}_chunk_{chunk_idx}_transcription.json")
+
+def load_chunk_resume(temp_dir, session_id, chunk_idx):
+    """Return the saved Transcript of an already transcribed chunk, or None if it still needs transcribing."""
+    temp_file = _chunk_resume_path(temp_dir, session_id, chunk_idx)
+    if not os.path.exists(temp_file):
+        return None
+    print(f"Loading previously transcribed chunk {chunk_idx} from {temp_file}")
+    with open(temp_file, "r", encoding="utf-8") as f:
+        chunk_transcription = Transcript.load(json.load(f))
+    if chunk_transcription and chunk_transcription.text(0) == TRANSCRIPTION_FAILED_PLACEHOLDER:
+        print(f"Chunk {chunk_idx} previously failed. Retrying...")
+        return None
+    return chunk_transcription
+
+def prepare_chunk_upload(audio_path, audio_info, chunk_idx, start_ms, end_ms, max_silence_ms=None, upload_profile=DEFAULT_UPLOAD_PROFILE):
+    """Decode, compress and encode one chunk into a temporary upload file.
+
+    This is the CPU-bound half of chunk transcription. It touches no shared
+    state, so it can run in a worker process. When `max_silence_ms` is set,
+    long pauses are shortened and the returned time map lets timestamps be
+    mapped back onto the original timeline; a chunk that is silent
+    throughout is then skipped and produces no file.
+
+    Returns:
+        None for a silent chunk, else dict with path, encoding_stats and time_map
+    """
+    if upload_profile == "source":
+        # Stream-copy the window: nothing is decoded, so silence detection and
+        # compression do not apply.
+        suffix = PASSTHROUGH_CODECS[audio_info["codec_name"]][1]
+        temp_file_path = tempfile.NamedTemporaryFile(delete=False, suffix=suffix).name
+        encoding_stats = cut_audio_window(audio_path, start_ms, end_ms, temp_file_path, audio_info)
+        return {"path": temp_file_path, "encoding_stats": encoding_stats, "time_map": None}
+
+    # Decode only this chunk's window from disk and release the PCM once the
+    # upload file is encoded, so memory stays bounded by a single chunk.
+    chunk = load_audio_window(audio_path, start_ms, end_ms, audio_info)
+    # Skipping uses a fixed level that quiet or low-gain recordings can fall
+    # under, so it is part of the opt-in silence handling only
+    if max_silence_ms is not None and is_silent(chunk):
+        print(f"Chunk {chunk_idx} is silent. Skipping upload.")
+        return None
+
+    time_map = None
+    if max_silence_ms is not None:
+        original_length = len(chunk)
+        chunk, time_map = compress_silences(chunk, max_silence_ms)
+        print(f"Compressed silences in chunk {chunk_idx}: {original_length} ms -> {len(chunk)} ms")
+
+    temp_file_path = tempfile.NamedTemporaryFile(delete=False, suffix=UPLOAD_ENCODING_PROFILES[upload_profile]["suffix"]).name
+    encoding_stats = encode_for_upload(chunk, temp_file_path, upload_profile)
+    del chunk
+    return {"path": temp_file_path, "encoding_stats": encoding_stats, "time_map": time_map}
+
+def transcribe_prepared_chunk(prepared, chunk_idx, start_ms, end_ms, session_id, model, full_prompt, log_dir, temp_dir, max_retries=3, retry_delay=5,
+                              progress=None, stream=False):
+    """Transcribe a chunk produced by prepare_chunk_upload() and save its resume file.
+
+    The upload file is deleted afterwards. A silent chunk (`prepared` is
+    None) yields a single SILENCE_PLACEHOLDER segment without any request,
+    so the gap is visible in the transcript.
+
+    Returns:
+        Tuple of (chunk Transcript, list of files uploaded for this chunk)
+    """
+    temp_file = _chunk_resume_path(temp_dir, session_id, chunk_idx)
+    if prepared is None:
+        silence = Transcript()
+        silence.append(start_ms // 1000, end_ms // 1000, "Unknown Speaker", SILENCE_PLACEHOLDER)
+        with open(temp_file, "w", encoding="utf-8") as f:
+            json.dump(silence.to_dict(), f, ensure_ascii=False, indent=2)
+        return silence, []
+    return _transcribe_encoded_chunk(
+        prepared["path"], prepared["encoding_stats"], prepared["time_map"], chunk_idx, start_ms, end_ms, session_id, model, full_prompt,
+        log_dir, temp_file, max_retries, retry_delay, [], progress, stream
+    )
+
+def _transcribe_chunk(audio_path, audio_info, chunk_idx, start_ms, end_ms, session_id, model, full_prompt, log_dir, temp_dir, max_retries, retry_delay, max_silence_ms=None,
+                      upload_profile=DEFAULT_UPLOAD_PROFILE, progress=None, stream=False):
+    """Transcribe a single chunk, resuming from its per-chunk JSON file if one exists.
+
+    With silence compression, silent chunks are skipped without an upload. The chunk is prepared with
+    prepare_chunk_upload() (see there for `max_silence_ms` and
+    `upload_profile`). With `stream`, segments are reported through
+    `progress` as soon as Gemini has produced them.
+
+    Returns:
+        Tuple of (chunk Transcript, list of files uploaded for this chunk)
+    """
+    chunk_transcription = load_chunk_resume(temp_dir, session_id, chunk_idx)
+    if chunk_transcription is not None:
+        return chunk_transcription, []
+
+    if progress:
+        progress.emit("chunk_started", chunk=chunk_idx)
+    prepared = prepare_chunk_upload(audio_path, audio_info, chunk_idx, start_ms, end_ms, max_silence_ms, upload_profile)
+    return transcribe_prepared_chunk(
+        prepared, chunk_idx, start_ms, end_ms, session_id, model, full_prompt, log_dir, temp_dir,
+        max_retries, retry_delay, progress, stream
+    )
+
+def _offset_transcript(relative_entries, start_ms, time_map):
+    """Parse chunk-relative entries once into a Transcript on the recording's timeline."""
+    transcript = Transcript()
+    for entry in relative_entries:
+        start, end = parse_time_range(entry["timestamp"])
+        transcript.append(
+            _chunk_offset_seconds(start, start_ms, time_map), _chunk_offset_seconds(end, start_ms, time_map),
+            entry["speaker"], entry["text"]
+        )
+    return transcript
+
+def _transcribe_encoded_chunk(temp_file_path, encoding_stats, time_map, chunk_idx, start_ms, end_ms, session_id, model, full_prompt,
+                              log_dir, temp_file, max_retries, retry_delay, uploaded_files, progress=None, stream=False):
+    """Transcribe an encoded chunk file (from cache or Gemini), offset its timestamps and save the resume file.
+
+    A response cut off before the end of its JSON array keeps its complete
+    segments, followed by a "[Transcription Truncated]" marker; such partial
+    results are not cached.
+    """
+    start_sec, end_sec = start_ms // 1000, end_ms // 1000
+
+    def on_segments(relative_entries, attempt):
+        progress.emit("chunk_segments", chunk=chunk_idx, attempt=attempt, segments=_offset_transcript(relative_entries, start_ms, time_map))
+    upload_profile = encoding_stats["profile"]
+    print(
+        f"Encoded chunk {chunk_idx} with '{upload_profile}': {encoding_stats['encoded_bytes']} bytes "
+        f"({encoding_stats['bytes_saved']} bytes saved vs. default MP3 export)"
+    )
+
+    try:
+        # Identical audio with the same model and prompt is served from the
+        # shared cache, whichever session or user transcribed it first.
+        cache_key = make_cache_key(temp_file_path, model, full_prompt)
+        relative_transcription = get_cached_transcription(cache_key)
+        complete = True
+        if relative_transcription is not None:
+            print(f"Loaded chunk {chunk_idx} from transcription cache ({cache_key[:12]})")
+        else:
+            relative_transcription, complete = _request_chunk_transcription(
+                temp_file_path, chunk_idx, start_sec, end_sec, session_id, model, full_prompt, log_dir,
+                max_retries, retry_delay, uploaded_files, progress, stream=stream,
+                on_segments=on_segments if stream and progress else None
+            )
+            if relative_transcription is not None and complete:
+                store_transcription(cache_key, relative_transcription)
+    finally:
+        if os.path.exists(temp_file_path):
+            os.unlink(temp_file_path)
+
+    if relative_transcription is None:
+        print(f"Max retries reached for chunk {chunk_idx}. Skipping this chunk.")
+        chunk_transcription = Transcript()
+        chunk_transcription.append(start_sec, end_sec, "Unknown Speaker", TRANSCRIPTION_FAILED_PLACEHOLDER)
+    else:
+        chunk_transcription = _offset_transcript(relative_transcription, start_ms, time_map)
+        if not complete:
+            last_end = chunk_transcription.end(len(chunk_transcription) - 1) if chunk_transcription else start_sec
+            chunk_transcription.append(last_end, end_sec, "Unknown Speaker", "[Transcription Truncated]")
+
+    with open(temp_file, "w", encoding="utf-8") as f:
+        json.dump(chunk_transcription.to_dict(), f, ensure_ascii=False, indent=2)
+    if relative_transcription is not None:
+        print(f"Saved successful transcription for chunk {chunk_idx} to {temp_file}")
+    return chunk_transcription, uploaded_files
+
+def _with_default_fields(entry):
+    """Fill in any field the model left out of a transcription entry."""
+    return {
+        **entry,
+        "timestamp": entry.get("timestamp", f"{format_time(0)} - {format_time(1)}"),
+        "speaker": entry.get("speaker", "Unknown Speaker"),
+        "text": entry.get("text", "[Transcription Missing]")
+    }
+
+def _request_chunk_transcription(chunk_file_path, chunk_idx, start_sec, end_sec, session_id, model, full_prompt, log_dir, max_retries, retry_delay, uploaded_files,
+                                 progress=None, stream=False, on_segments=None):
+    """Upload an encoded chunk and ask Gemini for its transcription, retrying transient failures.
+
+    Uploads go through the Gemini file registry, so identical bytes are
+    uploaded once and tracked for batch cleanup with the session. Every
+    distinct file used is appended to `uploaded_files`. Retries send the
+    audio through a Gemini context cache when the model supports one. Rate limits, server
+    and network errors and unparseable JSON are retried with the shared retry
+    policy (`retry_delay` is the backoff base); client errors fail at once.
+
+    The response is parsed incrementally as a JSON array. With `stream`, the
+    streaming API is used and `on_segments(entries_so_far, attempt)` is called
+    whenever new segments are complete. A response cut off mid-array keeps
+    its complete segments instead of being discarded.
+
+    Returns:
+        Tuple of (list of entries with chunk-relative timestamps, or None if the
+        chunk could not be transcribed; whether the response was complete)
+    """
+    request_tokens = (end_sec - start_sec) * AUDIO_TOKENS_PER_SECOND + len(full_prompt) // CHARS_PER_TOKEN
+
+    def request(attempt):
+        # Retries reuse the already-uploaded bytes (verifying they still exist)
+        audio_file = upload_file(chunk_file_path, session_id, verify=attempt > 0)
+        if audio_file not in uploaded_files:
+            uploaded_files.append(audio_file)
+            if progress:
+                progress.add_usage(bytes_uploaded=os.path.getsize(chunk_file_path))
+
+        parser = JsonArrayStreamParser()
+        request_kwargs = {
+            "model": model,
+            "contents": [full_prompt, audio_file],
+            "config": {"response_mime_type": "application/json"}
+        }
+        if attempt > 0:
+            # Retries reference the chunk audio through an existing context cache instead of paying for it again
+            # in full; none is created here, since at most one more call would ever use it
+            cached_context = get_context_cache(model, [audio_file], session_id, create=False)
+            if cached_context:
+                request_kwargs["contents"] = [full_prompt]
+                request_kwargs["config"]["cached_content"] = cached_context
+        # Shares the Gemini key's request/token budget with every other session
+        with rate_limited("gemini", GEMINI_API_KEY, tokens=request_tokens):
+            if stream:
+                text_parts = []
+                usage = None
+                for response in client.models.generate_content_stream(**request_kwargs):
+                    text = response.text or ""
+                    text_parts.append(text)
+                    usage = getattr(response, "usage_metadata", None) or usage
+                    if parser.feed(text) and on_segments:
+                        on_segments([_with_default_fields(item) for item in parser.items if isinstance(item, dict)], attempt)
+                response_text = "".join(text_parts)
+            else:
+                response = client.models.generate_content(**request_kwargs)
+                response_text = response.text or ""
+                usage = getattr(response, "usage_metadata", None)
+                parser.feed(response_text)
+
+        log_file = os.path.join(log_dir, f"{session_id}_chunk_{chunk_idx}_start_{start_sec//60:02d}{start_sec%60:02d}_end_{end_sec//60:02d}{end_sec%60:02d}_attempt_{attempt}.json")
+        with open(log_file, "w", encoding="utf-8") as f:
+            f.write(response_text)
+        print(f"Saved raw response for chunk {chunk_idx} (attempt {attempt}) to {log_file}")
+        if progress and usage is not None:
+            progress.add_usage(tokens=getattr(usage, "total_token_count", 0) or 0)
+
+        entries = [_with_default_fields(item) for item in parser.items if isinstance(item, dict)]
+        if not parser.complete:
+            if not entries:
+                # Nothing usable: let the retry policy treat it as a malformed response
+                raise json.JSONDecodeError("Response is not a JSON array of segments", response_text, 0)
+            # Truncation (e.g. the output token limit) would recur on retry, so keep what we have
+            print(f"Response for chunk {chunk_idx} (attempt {attempt}) was cut off; keeping its first {len(entries)} segments")
+        return entries, parser.complete
+
+    def before_retry(attempt, error, error_class):
+        # Raised job cancellations propagate from here rather than being retried
+        if progress:
+            progress.emit("chunk_attempt", chunk=chunk_idx, attempt=attempt, error_class=error_class)
+
+    if progress:
+        progress.emit("chunk_attempt", chunk=chunk_idx, attempt=0)
     try:
-        audio = AudioSegment.from_file(input_path, format="m4a")
-        audio.export(output_path, format="mp3")
-        print(f"Converted {input_path} to {output_path}")
-        return output_path
+        return call_with_retry(
+            request,
+            description=f"Transcription of chunk {chunk_idx}",
+            max_attempts=max_retries,
+            base_delay=retry_delay,
+            on_retry=before_retry,
+            fatal_errors=(JobCancelled,)
+        )
+    except JobCancelled:
+        raise
     except Exception as e:
-        raise Exception(f"Failed to convert m4a to mp3: {e}")
+        print(f"Giving up on chunk {chunk_idx} ({classify_error(e)}): {e}")
+        return None, False
 
-def transcribe_audio_with_diarization(audio_path, session_id, model="gemini-2.0-flash", additional_instructions="", max_retries=3, retry_delay=5):
-    """Transcribe audio with diarization, splitting into 8-min chunks with 30s overlap."""
+def build_transcription_prompt(additional_instructions=""):
+    """Full transcription prompt: the default system prompt plus any user instructions."""
     full_prompt = TRANSCRIPTION_DEFAULT_SYSTEM_PROMPT
     if additional_instructions:
         full_prompt += f"\n\nAdditional Instructions: {additional_instructions}"
+    return full_prompt
+
+def merge_chunk_transcripts(chunk_results, chunks, overlap_ms=0):
+    """Join per-chunk Transcripts in chunk order, stitching away overlap duplicates when `overlap_ms` is set."""
+    if overlap_ms:
+        return stitch_chunk_transcriptions(chunk_results, chunks)
+    merged = Transcript()
+    for chunk_transcription in chunk_results:
+        merged.extend(chunk_transcription)
+    return merged
+
+def transcribe_audio_with_diarization(audio_path, session_id, model="gemini-2.0-flash", additional_instructions="", max_retries=3, retry_delay=5, max_concurrent_chunks=TRANSCRIPTION_MAX_CONCURRENCY,
+                                      chunk_length_ms=DEFAULT_CHUNK_LENGTH_MS, boundary_tolerance_ms=DEFAULT_BOUNDARY_TOLERANCE_MS, max_silence_ms=None, overlap_ms=0,
+                                      upload_profile=DEFAULT_UPLOAD_PROFILE, progress_callback=None, stream=False):
+    """Transcribe audio with diarization, splitting into roughly 8-min chunks.
+
+    Chunk boundaries are snapped to the nearest pause within
+    `boundary_tolerance_ms` of each nominal `chunk_length_ms` cut. Set
+    `max_silence_ms` to shorten (or, with 0, drop) longer silences before
+    upload. With `overlap_ms` set, neighbouring chunks share that much audio
+    and the duplicated segments are removed by stitch_chunk_transcriptions().
+    Chunks are encoded with `upload_profile` (see UPLOAD_ENCODING_PROFILES).
+    Up to `max_concurrent_chunks` chunks are exported, uploaded and
+    transcribed in parallel; pass 1 to process them strictly one after another.
+    With `stream`, chunks use the streaming Gemini API so their segments are
+    available while the response is still being generated.
+
+    `progress_callback`, if given, is called (from worker threads, one call at
+    a time) with a dict per event: "plan", "chunk_started", "chunk_attempt",
+    "chunk_segments" (streaming only: the chunk's segments so far, restarting
+    on each attempt) and "chunk_finished" (which carries that chunk's
+    "segments"); segments are Transcript objects. Every event also includes
+    the TranscriptionProgress snapshot fields.
+
+    Returns:
+        Tuple of (Transcript of the whole recording, first uploaded file or None)
+    """
+    full_prompt = build_transcription_prompt(additional_instructions)
 
     log_dir = os.path.join("transcription_logs", session_id)
     temp_dir = os.path.join("transcription_temp", session_id)
@@ -42,119 +429,44 @@ def transcribe_audio_with_diarization(audio_path, session_id, model="gemini-2.0-
         if not os.path.exists(directory):
             os.makedirs(directory)
     
-    file_ext = os.path.splitext(audio_path)[1].lower()
-    temp_audio_path = audio_path
-    if file_ext == ".m4a":
-        temp_mp3_path = os.path.join(temp_dir, f"converted_{uuid.uuid4().hex}.mp3")
-        temp_audio_path = convert_m4a_to_mp3(audio_path, temp_mp3_path)
-    
-    if file_ext == ".wav":
-        audio = AudioSegment.from_wav(temp_audio_path)
-    else:
-        audio = AudioSegment.from_mp3(temp_audio_path)
-    
-    chunks = []
-    start_time = 0
-    audio_length = len(audio)
-    chunk_length_ms = 480000
-    overlap_ms = 0
-    
-    while start_time < audio_length:
-        end_time = min(start_time + chunk_length_ms, audio_length)
-        chunks.append((start_time // 1000, end_time // 1000))
-        start_time = end_time - overlap_ms if end_time < audio_length else audio_length
-    
-    all_transcriptions = []
-    uploaded_files = []
-    
-    for chunk_idx, (start_sec, end_sec) in enumerate(chunks):
-        temp_file = os.path.join(temp_dir, f"{session_id}_chunk_{chunk_idx}_transcription.json")
-        if os.path.exists(temp_file):
-            print(f"Loading previously transcribed chunk {chunk_idx} from {temp_file}")
-            with open(temp_file, "r", encoding="utf-8") as f:
-                chunk_transcription = json.load(f)
-            if chunk_transcription and chunk_transcription[0].get("text") == "[Transcription Failed After Retries]":
-                print(f"Chunk {chunk_idx} previously failed. Retrying...")
-            else:
-                all_transcriptions.extend(chunk_transcription)
-                continue
-        
-        success = False
-        for attempt in range(max_retries):
-            start_ms = start_sec * 1000
-            end_ms = end_sec * 1000
-            chunk = audio[start_ms:end_ms]
-            temp_file_path = tempfile.NamedTemporaryFile(delete=False, suffix=".mp3").name
-            chunk.export(temp_file_path, format="mp3")
-            
-            try:
-                audio_file = client.files.upload(file=temp_file_path)
-                uploaded_files.append(audio_file)
-                response = client.models.generate_content(
-                    model=model,
-                    contents=[full_prompt, audio_file],
-                    config={"response_mime_type": "application/json"}
-                )
-                log_file = os.path.join(log_dir, f"{session_id}_chunk_{chunk_idx}_start_{start_sec//60:02d}{start_sec%60:02d}_end_{end_sec//60:02d}{end_sec%60:02d}_attempt_{attempt}.json")
-                with open(log_file, "w", encoding="utf-8") as f:
-                    f.write(response.text)
-                print(f"Saved raw response for chunk {chunk_idx} (attempt {attempt}) to {log_file}")
-                
-                chunk_transcription = json.loads(response.text)
-                for entry in chunk_transcription:
-                    if 'timestamp' not in entry:
-                        entry['timestamp'] = f"{format_time(start_sec)} - {format_time(start_sec + 1)}"
-                    if 'speaker' not in entry:
-                        entry['speaker'] = "Unknown Speaker"
-                    if 'text' not in entry:
-                        entry['text'] = "[Transcription Missing]"
-                    start = parse_timestamp_to_seconds(entry["timestamp"].split(" - ")[0])
-                    end = parse_timestamp_to_seconds(entry["timestamp"].split(" - ")[1])
-                    entry["timestamp"] = f"{format_time(start_sec + start)} - {format_time(start_sec + end)}"
-                
-                with open(temp_file, "w", encoding="utf-8") as f:
-                    json.dump(chunk_transcription, f, ensure_ascii=False, indent=2)
-                print(f"Saved successful transcription for chunk {chunk_idx} to {temp_file}")
-                
-                all_transcriptions.extend(chunk_transcription)
-                success = True
-                break
-            
-            except json.JSONDecodeError as e:
-                print(f"Failed to parse transcription for chunk {chunk_idx} (attempt {attempt}): {e}")
-                if attempt == max_retries - 1:
-                    print(f"Max retries reached for chunk {chunk_idx}. Skipping this chunk.")
-                    chunk_transcription = [{
-                        "timestamp": f"{format_time(start_sec)} - {format_time(end_sec)}",
-                        "speaker": "Unknown Speaker",
-                        "text": "[Transcription Failed After Retries]"
-                    }]
-                    all_transcriptions.extend(chunk_transcription)
-                    with open(temp_file, "w", encoding="utf-8") as f:
-                        json.dump(chunk_transcription, f, ensure_ascii=False, indent=2)
-                    break
-                print(f"Retrying chunk {chunk_idx} in {retry_delay} seconds...")
-                time.sleep(retry_delay)
-            
-            except Exception as e:
-                print(f"Unexpected error for chunk {chunk_idx} (attempt {attempt}): {e}")
-                if attempt == max_retries - 1:
-                    print(f"Max retries reached for chunk {chunk_idx}. Skipping this chunk.")
-                    chunk_transcription = [{
-                        "timestamp": f"{format_time(start_sec)} - {format_time(end_sec)}",
-                        "speaker": "Unknown Speaker",
-                        "text": "[Transcription Failed After Retries]"
-                    }]
-                    all_transcriptions.extend(chunk_transcription)
-                    with open(temp_file, "w", encoding="utf-8") as f:
-                        json.dump(chunk_transcription, f, ensure_ascii=False, indent=2)
-                    break
-                print(f"Retrying chunk {chunk_idx} in {retry_delay} seconds...")
-                time.sleep(retry_delay)
-            
-            finally:
-                if os.path.exists(temp_file_path):
-                    os.unlink(temp_file_path)
+    # Only the headers are read here; each chunk decodes (or stream-copies) its
+    # own window straight from the source container, whatever its format.
+    audio_info = probe_audio(audio_path)
+    if upload_profile == "source" and not can_stream_copy(audio_info):
+        print(f"Codec '{audio_info['codec_name']}' cannot be uploaded as-is; encoding with '{DEFAULT_UPLOAD_PROFILE}'")
+        upload_profile = "speech_mp3" if DEFAULT_UPLOAD_PROFILE == "source" else DEFAULT_UPLOAD_PROFILE
+
+    chunks = plan_chunks(audio_path, audio_info, chunk_length_ms=chunk_length_ms, tolerance_ms=boundary_tolerance_ms, overlap_ms=overlap_ms)
+    print(f"Planned {len(chunks)} chunks: {[(start_ms // 1000, end_ms // 1000) for start_ms, end_ms in chunks]}")
+    progress = TranscriptionProgress(len(chunks), progress_callback)
+    progress.emit("plan", duration_ms=audio_info["duration_ms"], chunks=chunks)
+
+    # Transcribe chunks with bounded concurrency; results are slotted back by
+    # chunk index so the final transcript stays in chunk order.
+    chunk_results = [None] * len(chunks)
+    chunk_uploads = [[] for _ in chunks]
+    max_workers = max(1, min(max_concurrent_chunks, len(chunks)))
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        futures = {
+            executor.submit(
+                # Chunks wait in this session's rate-limit queue, taking turns with other sessions
+                bind_session(_transcribe_chunk, session_id), audio_path, audio_info, chunk_idx, start_ms, end_ms, session_id, model,
+                full_prompt, log_dir, temp_dir, max_retries, retry_delay, max_silence_ms, upload_profile, progress, stream
+            ): chunk_idx
+            for chunk_idx, (start_ms, end_ms) in enumerate(chunks)
+        }
+        try:
+            for future in as_completed(futures):
+                chunk_idx = futures[future]
+                chunk_results[chunk_idx], chunk_uploads[chunk_idx] = future.result()
+                progress.emit("chunk_finished", chunk=chunk_idx, segments=chunk_results[chunk_idx])
+        except BaseException:
+            # Don't start queued chunks once the run has failed or been cancelled
+            executor.shutdown(wait=False, cancel_futures=True)
+            raise
+
+    all_transcriptions = merge_chunk_transcripts(chunk_results, chunks, overlap_ms)
+    uploaded_files = [audio_file for files in chunk_uploads for audio_file in files]
     
     # Clean up converted file if it was created
     # Clean up temporary transcription files after successful completion
@@ -180,31 +492,103 @@ def transcribe_audio_with_diarization(audio_path, session_id, model="gemini-2.0-
 
 
 
+def _normalize_segment_text(text):
+    """Lowercase and strip punctuation so near-identical segments compare equal."""
+    return " ".join(re.sub(r"[^\w\s]", " ", text.lower()).split())
+
+def _segments_match(tail_text, head_text, similarity_threshold):
+    """Return True if two overlap segments carry the same speech."""
+    if not tail_text or not head_text:
+        return False
+    shorter, longer = sorted((tail_text, head_text), key=len)
+    if len(shorter) >= 8 and shorter in longer:
+        # One side of the cut usually holds only part of the sentence
+        return True
+    matcher = SequenceMatcher(None, tail_text, head_text, autojunk=False)
+    return matcher.real_quick_ratio() >= similarity_threshold and matcher.ratio() >= similarity_threshold
+
+def stitch_chunk_transcriptions(chunk_results, chunks, time_tolerance_sec=3, similarity_threshold=0.6):
+    """Merge per-chunk transcriptions, removing segments duplicated by chunk overlap.
+
+    For each pair of neighbouring chunks only the segments that fall inside
+    their shared overlap window are compared, and both sides are walked once
+    in timestamp order, so the cost grows linearly with the number of
+    segments. When a pair matches by timestamp and text, the copy that lies
+    further from its own chunk edge (i.e. before the overlap midpoint for
+    chunk N, after it for chunk N+1) is kept, since edge segments are the
+    ones most likely to be cut off.
+
+    Args:
+        chunk_results: List of per-chunk Transcripts (or entry lists), in chunk order
+        chunks: List of (start_ms, end_ms) tuples the results were produced from
+
+    Returns:
+        Single Transcript in chronological order
+    """
+    if not chunk_results:
+        return Transcript()
+
+    # Segments are tracked as (chunk, segment) references and copied into the
+    # result once at the end, so dropping a duplicate never rebuilds the transcript
+    loaded = [Transcript.load(result) for result in chunk_results]
+    kept = [(0, idx) for idx in range(len(loaded[0]))]
+    dropped = set()  # positions in `kept`
+    for chunk_idx in range(1, len(loaded)):
+        head = loaded[chunk_idx]
+        overlap_start = chunks[chunk_idx][0] / 1000
+        overlap_end = chunks[chunk_idx - 1][1] / 1000
+        if overlap_end <= overlap_start or not kept or not head:
+            kept.extend((chunk_idx, idx) for idx in range(len(head)))
+            continue
+        midpoint = (overlap_start + overlap_end) / 2
+
+        # Tail of the merged segments that reaches into the overlap window
+        tail_begin = len(kept)
+        while tail_begin > 0 and loaded[kept[tail_begin - 1][0]].end(kept[tail_begin - 1][1]) >= overlap_start - time_tolerance_sec:
+            tail_begin -= 1
+        # Head of the next chunk that starts inside the overlap window
+        head_end = 0
+        while head_end < len(head) and head.start(head_end) <= overlap_end + time_tolerance_sec:
+            head_end += 1
+
+        tail = [
+            (position, loaded[kept[position][0]].start(kept[position][1]), _normalize_segment_text(loaded[kept[position][0]].text(kept[position][1])))
+            for position in range(tail_begin, len(kept)) if position not in dropped
+        ]
+        drop_tail, drop_head = set(), set()
+        tail_idx = 0
+        for head_idx in range(head_end):
+            head_start = head.start(head_idx)
+            head_text = _normalize_segment_text(head.text(head_idx))
+            # Skip tail segments that are already too early to match this one
+            while tail_idx < len(tail) and tail[tail_idx][1] < head_start - time_tolerance_sec:
+                tail_idx += 1
+            probe = tail_idx
+            while probe < len(tail) and tail[probe][1] <= head_start + time_tolerance_sec:
+                if probe not in drop_tail and _segments_match(tail[probe][2], head_text, similarity_threshold):
+                    if tail[probe][1] < midpoint:
+                        drop_head.add(head_idx)
+                    else:
+                        drop_tail.add(probe)
+                    tail_idx = probe + 1
+                    break
+                probe += 1
+
+        dropped.update(tail[probe][0] for probe in drop_tail)
+        kept.extend((chunk_idx, idx) for idx in range(len(head)) if idx not in drop_head)
+        if drop_tail or drop_head:
+            print(f"Stitched chunks {chunk_idx - 1}/{chunk_idx}: dropped {len(drop_tail) + len(drop_head)} duplicated segment(s)")
+
+    stitched = Transcript()
+    for position, (chunk_idx, idx) in enumerate(kept):
+        if position not in dropped:
+            source = loaded[chunk_idx]
+            stitched.append(source.start(idx), source.end(idx), source.speaker(idx), source.text(idx))
+    return stitched
+
 def count_audio_tokens(audio_file, model="gemini-2.0-flash"):
     response = client.models.count_tokens(model=model, contents=[audio_file])
     return response.total_tokens
 
 def delete_uploaded_file(file_name):
     client.files.delete(name=file_name)
-
-def parse_timestamp_to_seconds(timestamp):
-    """Convert MM:SS or HH:MM:SS format to start seconds."""
-    try:
-        parts = timestamp.split(":")
-        if len(parts) == 3:
-            hours, minutes, seconds = map(int, parts)
-            return hours * 3600 + minutes * 60 + seconds
-        elif len(parts) == 2:
-            minutes, seconds = map(int, parts)
-            return minutes * 60 + seconds
-        else:
-            return 0
-    except:
-        return 0
-
-def format_time(seconds):
-    """Convert seconds to MM:SS format."""
-    minutes = seconds // 60
-    secs = seconds % 60
-    return f"{minutes:02d}:{secs:02d}"
-
@@ -0,0 +1,226 @@
+# src/audio_source.py
+# Standard library imports
+import json
+import os
+import subprocess
+
+# Third-party imports
+import numpy as np
+from pydub import AudioSegment
+from pydub.utils import get_encoder_name, get_prober_name
+
+# Local imports
+from config import UPLOAD_ENCODING_PROFILE
+
+# Encoding profiles for chunks uploaded to Gemini. Speech profiles downmix to
+# mono 16 kHz, which is all the model needs for meeting audio.
+UPLOAD_ENCODING_PROFILES = {
+    "speech_mp3": {"format": "mp3", "suffix": ".mp3", "codec": "libmp3lame", "bitrate": "32k", "channels": 1, "frame_rate": 16000},
+    "speech_opus": {"format": "ogg", "suffix": ".ogg", "codec": "libopus", "bitrate": "24k", "channels": 1, "frame_rate": 16000},
+    "original": {"format": "mp3", "suffix": ".mp3", "codec": None, "bitrate": None, "channels": None, "frame_rate": None},
+    # Cut the source stream without decoding when its codec is accepted by Gemini
+    "source": {"format": None, "suffix": None, "codec": "copy", "bitrate": None, "channels": None, "frame_rate": None},
+}
+DEFAULT_UPLOAD_PROFILE = UPLOAD_ENCODING_PROFILE if UPLOAD_ENCODING_PROFILE in UPLOAD_ENCODING_PROFILES else "speech_mp3"
+
+# Source codecs Gemini accepts as-is, with the ffmpeg muxer and file suffix
+# used when stream-copying a window out of the original container
+PASSTHROUGH_CODECS = {
+    "mp3": ("mp3", ".mp3"),
+    "aac": ("adts", ".aac"),
+    "flac": ("flac", ".flac"),
+    "vorbis": ("ogg", ".ogg"),
+    "pcm_s16le": ("wav", ".wav"),
+}
+
+# ffmpeg's libmp3lame default, used by pydub's plain export(format="mp3")
+BASELINE_MP3_BITRATE = 128000
+RESAMPLE_FILTER_TAPS = 31
+
+
+def probe_audio(audio_path):
+    """Read duration, sample rate and channel count of an audio file with ffprobe.
+
+    Only the container headers are read, so this is cheap even for multi-hour
+    recordings.
+
+    Returns:
+        Dict with duration_ms, frame_rate, channels and codec_name
+    """
+    command = [
+        get_prober_name(), "-v", "error",
+        "-select_streams", "a:0",
+        "-show_entries", "format=duration:stream=sample_rate,channels,codec_name",
+        "-of", "json",
+        audio_path
+    ]
+    result = subprocess.run(command, capture_output=True, check=False)
+    if result.returncode != 0:
+        raise Exception(f"Failed to probe audio file {audio_path}: {result.stderr.decode(errors='ignore').strip()}")
+
+    info = json.loads(result.stdout.decode("utf-8"))
+    if not info.get("streams"):
+        raise Exception(f"No audio stream found in {audio_path}")
+    stream = info["streams"][0]
+    return {
+        "duration_ms": int(float(info["format"]["duration"]) * 1000),
+        "frame_rate": int(stream["sample_rate"]),
+        "channels": int(stream["channels"]),
+        "codec_name": stream.get("codec_name", "")
+    }
+
+
+def load_audio_window(audio_path, start_ms, end_ms, audio_info=None):
+    """Decode only the [start_ms, end_ms) window of an audio file.
+
+    ffmpeg seeks on the input (`-ss` before `-i`) and stops after the window
+    duration, so memory use is bounded by the window rather than the whole
+    recording.
+
+    Args:
+        audio_path: Path to any container/codec ffmpeg can read
+        start_ms: Window start in milliseconds
+        end_ms: Window end in milliseconds
+        audio_info: Optional result of probe_audio() to avoid re-probing
+
+    Returns:
+        pydub AudioSegment holding the decoded window
+    """
+    if audio_info is None:
+        audio_info = probe_audio(audio_path)
+    duration_ms = max(0, end_ms - start_ms)
+    command = [
+        get_encoder_name(), "-v", "error", "-nostdin",
+        "-ss", f"{start_ms / 1000:.3f}",
+        "-t", f"{duration_ms / 1000:.3f}",
+        "-i", audio_path,
+        "-vn", "-f", "s16le", "-acodec", "pcm_s16le",
+        "-ar", str(audio_info["frame_rate"]),
+        "-ac", str(audio_info["channels"]),
+        "-"
+    ]
+    result = subprocess.run(command, capture_output=True, check=False)
+    if result.returncode != 0:
+        raise Exception(f"Failed to decode {audio_path} [{start_ms}-{end_ms} ms]: {result.stderr.decode(errors='ignore').strip()}")
+
+    # Drop a trailing partial frame so the raw buffer is always frame-aligned
+    frame_width = 2 * audio_info["channels"]
+    raw = result.stdout[:len(result.stdout) - len(result.stdout) % frame_width]
+    return AudioSegment(
+        data=raw,
+        sample_width=2,
+        frame_rate=audio_info["frame_rate"],
+        channels=audio_info["channels"]
+    )
+
+
+def downmix_and_resample(segment, channels=None, frame_rate=None):
+    """Downmix to mono and/or resample an AudioSegment in a single vectorized NumPy pass.
+
+    Resampling applies a short windowed-sinc low-pass filter before linear
+    interpolation so downsampled speech does not alias.
+
+    Args:
+        segment: Source AudioSegment
+        channels: Target channel count (only 1 is supported for downmixing), or None to keep
+        frame_rate: Target sample rate, or None to keep
+
+    Returns:
+        16-bit AudioSegment with the requested layout
+    """
+    target_channels = channels or segment.channels
+    target_rate = frame_rate or segment.frame_rate
+    if target_channels == segment.channels and target_rate == segment.frame_rate:
+        return segment
+
+    full_scale = float(1 << (8 * segment.sample_width - 1))
+    samples = np.array(segment.get_array_of_samples(), dtype=np.float32).reshape(-1, segment.channels) / full_scale
+    if target_channels == 1 and segment.channels > 1:
+        samples = samples.mean(axis=1, keepdims=True)
+
+    if target_rate != segment.frame_rate and len(samples) > 0:
+        if target_rate < segment.frame_rate:
+            cutoff = target_rate / segment.frame_rate / 2
+            taps = np.arange(-RESAMPLE_FILTER_TAPS // 2 + 1, RESAMPLE_FILTER_TAPS // 2 + 1)
+            kernel = 2 * cutoff * np.sinc(2 * cutoff * taps) * np.hamming(RESAMPLE_FILTER_TAPS)
+            kernel /= kernel.sum()
+            samples = np.stack([np.convolve(samples[:, ch], kernel, mode="same") for ch in range(samples.shape[1])], axis=1)
+        n_out = int(len(samples) * target_rate / segment.frame_rate)
+        source_times = np.arange(len(samples)) / segment.frame_rate
+        target_times = np.arange(n_out) / target_rate
+        samples = np.stack([np.interp(target_times, source_times, samples[:, ch]) for ch in range(samples.shape[1])], axis=1)
+
+    pcm = np.clip(samples * 32767.0, -32768, 32767).astype(np.int16)
+    return AudioSegment(
+        data=pcm.tobytes(),
+        sample_width=2,
+        frame_rate=target_rate,
+        channels=pcm.shape[1]
+    )
+
+
+def encode_for_upload(segment, output_path, profile_name=DEFAULT_UPLOAD_PROFILE):
+    """Encode a chunk for upload with one of UPLOAD_ENCODING_PROFILES.
+
+    Returns:
+        Dict with encoded_bytes, baseline_bytes (pydub's default 128 kbps MP3
+        export of the same audio) and bytes_saved
+    """
+    if profile_name not in UPLOAD_ENCODING_PROFILES or profile_name == "source":
+        raise ValueError(f"Unknown upload encoding profile: {profile_name}")
+    profile = UPLOAD_ENCODING_PROFILES[profile_name]
+
+    prepared = downmix_and_resample(segment, profile["channels"], profile["frame_rate"])
+    export_kwargs = {"format": profile["format"]}
+    if profile["codec"]:
+        export_kwargs["codec"] = profile["codec"]
+    if profile["bitrate"]:
+        export_kwargs["bitrate"] = profile["bitrate"]
+    prepared.export(output_path, **export_kwargs)
+
+    encoded_bytes = os.path.getsize(output_path)
+    baseline_bytes = int(len(segment) / 1000 * BASELINE_MP3_BITRATE / 8)
+    return {
+        "profile": profile_name,
+        "encoded_bytes": encoded_bytes,
+        "baseline_bytes": baseline_bytes,
+        "bytes_saved": baseline_bytes - encoded_bytes
+    }
+
+
+def can_stream_copy(audio_info):
+    """Return True if windows of this source can be uploaded without re-encoding."""
+    return audio_info.get("codec_name") in PASSTHROUGH_CODECS
+
+
+def cut_audio_window(audio_path, start_ms, end_ms, output_path, audio_info):
+    """Stream-copy the [start_ms, end_ms) window of the source into its own file.
+
+    No audio is decoded or re-encoded; ffmpeg only remuxes the compressed
+    packets (e.g. AAC from an .m4a into ADTS), so cuts land on the nearest
+    packet boundary.
+
+    Returns:
+        Dict with the same keys as encode_for_upload()
+    """
+    muxer, _ = PASSTHROUGH_CODECS[audio_info["codec_name"]]
+    command = [
+        get_encoder_name(), "-y", "-v", "error", "-nostdin",
+        "-ss", f"{start_ms / 1000:.3f}",
+        "-t", f"{(end_ms - start_ms) / 1000:.3f}",
+        "-i", audio_path,
+        "-vn", "-map", "0:a:0", "-c:a", "copy", "-f", muxer,
+        output_path
+    ]
+    result = subprocess.run(command, capture_output=True, check=False)
+    if result.returncode != 0:
+        raise Exception(f"Failed to cut {audio_path} [{start_ms}-{end_ms} ms]: {result.stderr.decode(errors='ignore').strip()}")
+
+    encoded_bytes = os.path.getsize(output_path)
+    baseline_bytes = int((end_ms - start_ms) / 1000 * BASELINE_MP3_BITRATE / 8)
+    return {
+        "profile": "source",
+        "encoded_bytes": encoded_bytes,
+        "baseline_bytes": baseline_bytes,
+        "bytes_saved": baseline_bytes - encoded_bytes
+    }
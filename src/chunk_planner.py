@@ -0,0 +1,180 @@
+# src/chunk_planner.py
+# Standard library imports
+from bisect import bisect_right
+
+# Third-party imports
+import numpy as np
+from pydub import AudioSegment
+
+# Local imports
+from src.audio_source import load_audio_window
+
+# Defaults for silence-aware chunking
+DEFAULT_CHUNK_LENGTH_MS = 480000
+DEFAULT_BOUNDARY_TOLERANCE_MS = 30000
+DEFAULT_SILENCE_THRESH_DB = -40.0
+DEFAULT_FRAME_MS = 50
+DEFAULT_OVERLAP_MS = 10000
+# A final chunk with less new audio than this (beyond the overlap) is merged into the previous one
+DEFAULT_MIN_CHUNK_MS = 30000
+
+
+def _frame_length(segment, frame_ms):
+    """Samples per analysis frame; frame times must use frame_len / frame_rate, not `frame_ms`, as this is rounded down."""
+    return max(1, int(segment.frame_rate * frame_ms / 1000))
+
+
+def frame_energy_db(segment, frame_ms=DEFAULT_FRAME_MS):
+    """Compute per-frame RMS energy of an AudioSegment in dBFS.
+
+    Channels are averaged to mono and the samples are reshaped into
+    fixed-length frames, so the whole computation is a handful of vectorized
+    NumPy operations. A trailing partial frame is ignored.
+
+    Returns:
+        1-D float array with one dBFS value per frame
+    """
+    samples = np.array(segment.get_array_of_samples(), dtype=np.float32)
+    if segment.channels > 1:
+        samples = samples.reshape(-1, segment.channels).mean(axis=1)
+    frame_len = _frame_length(segment, frame_ms)
+    n_frames = len(samples) // frame_len
+    if n_frames == 0:
+        return np.empty(0, dtype=np.float32)
+
+    frames = samples[:n_frames * frame_len].reshape(n_frames, frame_len)
+    rms = np.sqrt(np.mean(frames * frames, axis=1))
+    full_scale = float(1 << (8 * segment.sample_width - 1))
+    return 20.0 * np.log10(np.maximum(rms / full_scale, 1e-10))
+
+
+def find_pause_near(segment, target_ms, silence_thresh_db=DEFAULT_SILENCE_THRESH_DB, frame_ms=DEFAULT_FRAME_MS):
+    """Return the offset (ms, relative to `segment`) of the pause closest to `target_ms`.
+
+    Frames quieter than `silence_thresh_db` count as pauses. If the window has
+    no such frame, the quietest frame is used instead.
+    """
+    energy = frame_energy_db(segment, frame_ms)
+    if len(energy) == 0:
+        return target_ms
+
+    frame_duration_ms = _frame_length(segment, frame_ms) * 1000 / segment.frame_rate
+    centers = (np.arange(len(energy)) + 0.5) * frame_duration_ms
+    quiet = energy < silence_thresh_db
+    if quiet.any():
+        candidates = np.flatnonzero(quiet)
+        best = candidates[np.argmin(np.abs(centers[candidates] - target_ms))]
+    else:
+        best = int(np.argmin(energy))
+    return int(centers[best])
+
+
+def plan_chunks(audio_path, audio_info, chunk_length_ms=DEFAULT_CHUNK_LENGTH_MS, tolerance_ms=DEFAULT_BOUNDARY_TOLERANCE_MS,
+                silence_thresh_db=DEFAULT_SILENCE_THRESH_DB, frame_ms=DEFAULT_FRAME_MS, overlap_ms=0, min_chunk_ms=DEFAULT_MIN_CHUNK_MS):
+    """Plan chunk boundaries that fall on pauses instead of fixed offsets.
+
+    Each nominal boundary (every `chunk_length_ms`) is moved to the nearest
+    pause within +/- `tolerance_ms`. Only the small window around each
+    boundary is decoded, so planning stays cheap for long recordings. Pass
+    `tolerance_ms=0` to get the fixed-length plan. With `overlap_ms` set, each
+    chunk after the first starts that much before the previous chunk's end.
+    A last chunk that would hold less than `min_chunk_ms` of new audio is
+    merged into the one before it instead of costing a near-empty call.
+
+    Returns:
+        List of (start_ms, end_ms) tuples covering the whole recording
+    """
+    duration_ms = audio_info["duration_ms"]
+    if overlap_ms >= chunk_length_ms // 2:
+        raise ValueError("overlap_ms must be less than half of chunk_length_ms")
+    chunks = []
+    start_ms = 0
+    while start_ms < duration_ms:
+        target_ms = start_ms + chunk_length_ms
+        if target_ms >= duration_ms:
+            chunks.append((start_ms, duration_ms))
+            break
+
+        end_ms = target_ms
+        if tolerance_ms > 0:
+            window_start = max(start_ms + chunk_length_ms // 2, target_ms - tolerance_ms)
+            window_end = min(duration_ms, target_ms + tolerance_ms)
+            window = load_audio_window(audio_path, window_start, window_end, audio_info)
+            end_ms = window_start + find_pause_near(window, target_ms - window_start, silence_thresh_db, frame_ms)
+
+        if duration_ms - end_ms < min_chunk_ms:
+            chunks.append((start_ms, duration_ms))
+            break
+        chunks.append((start_ms, end_ms))
+        start_ms = end_ms - overlap_ms
+    return chunks
+
+
+def compress_silences(segment, max_silence_ms, silence_thresh_db=DEFAULT_SILENCE_THRESH_DB, frame_ms=DEFAULT_FRAME_MS):
+    """Shorten every silent stretch in `segment` to at most `max_silence_ms`.
+
+    Half of the allowed silence is kept on each side of a long pause so speech
+    onsets and tails are not clipped; `max_silence_ms=0` drops long silences
+    entirely. The returned time map lets timestamps measured on the compressed
+    audio be translated back with map_to_original_ms().
+
+    Returns:
+        Tuple of (compressed AudioSegment, time map as a list of (compressed_ms, original_ms) breakpoints)
+    """
+    energy = frame_energy_db(segment, frame_ms)
+    frame_len = _frame_length(segment, frame_ms)
+    frame_duration_ms = frame_len * 1000 / segment.frame_rate
+    max_silent_frames = int(max_silence_ms // frame_duration_ms)
+    n_frames = len(energy)
+    if n_frames == 0:
+        return segment, [(0, 0)]
+
+    # Locate runs of quiet frames from the edges of the padded mask
+    quiet = np.concatenate(([False], energy < silence_thresh_db, [False]))
+    edges = np.flatnonzero(np.diff(quiet.astype(np.int8)))
+    run_starts, run_ends = edges[0::2], edges[1::2]
+    long_runs = (run_ends - run_starts) > max_silent_frames
+    if not long_runs.any():
+        return segment, [(0, 0)]
+
+    keep = np.ones(n_frames, dtype=bool)
+    head = max_silent_frames // 2
+    tail = max_silent_frames - head
+    cut_starts = run_starts[long_runs] + head
+    cut_ends = run_ends[long_runs] - tail
+    for cut_start, cut_end in zip(cut_starts, cut_ends):
+        keep[cut_start:cut_end] = False
+
+    segment = segment.set_sample_width(2)
+    samples = np.frombuffer(segment.raw_data, dtype=np.int16).reshape(-1, segment.channels)
+    framed = samples[:n_frames * frame_len].reshape(n_frames, frame_len * segment.channels)
+    remainder = samples[n_frames * frame_len:]
+    compressed = np.concatenate((framed[keep].reshape(-1), remainder.reshape(-1)))
+
+    # Each cut collapses [cut_start, cut_end) frames; record where the
+    # compressed timeline rejoins the original one after every cut.
+    removed_before = np.cumsum(cut_ends - cut_starts)
+    time_map = [(0, 0)] + [
+        (int((cut_end - removed) * frame_duration_ms), int(cut_end * frame_duration_ms))
+        for cut_end, removed in zip(cut_ends, removed_before)
+    ]
+    compressed_segment = AudioSegment(
+        data=compressed.tobytes(),
+        sample_width=2,
+        frame_rate=segment.frame_rate,
+        channels=segment.channels
+    )
+    return compressed_segment, time_map
+
+
+def map_to_original_ms(compressed_ms, time_map):
+    """Translate a position on compressed audio back to the original timeline."""
+    idx = bisect_right([compressed for compressed, _ in time_map], compressed_ms) - 1
+    compressed_bp, original_bp = time_map[max(idx, 0)]
+    return original_bp + (compressed_ms - compressed_bp)
+
+
+def is_silent(segment, silence_thresh_db=DEFAULT_SILENCE_THRESH_DB, frame_ms=DEFAULT_FRAME_MS):
+    """Return True if no frame of `segment` rises above the silence threshold."""
+    energy = frame_energy_db(segment, frame_ms)
+    return len(energy) == 0 or bool((energy < silence_thresh_db).all())
@@ -0,0 +1,5 @@
+# src/errors.py
+
+
+class JobCancelled(Exception):
+    """Raised inside a job handler, or the transcription it runs, when its job was cancelled."""
@@ -0,0 +1,255 @@
+# src/gemini_context_cache.py
+# Standard library imports
+import hashlib
+import sqlite3
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+
+# Third-party imports
+from google.genai import types
+
+# Local imports
+from config import GEMINI_CONTEXT_CACHE_TTL_SECONDS
+from src.llm_clients import get_gemini_client
+from src.retry_policy import CLIENT_ERROR, classify_error, get_status_code
+
+# SQLite database file (same as used in ragflow_utils.py)
+DB_FILE = "project_ragflow_config.db"
+
+# A reused handle with less than this left is extended so it cannot expire mid-request
+TTL_REFRESH_MARGIN = timedelta(minutes=5)
+
+# Concurrent requests for the same content take the same lock, so they create one
+# handle; a fixed set of lock stripes keyed by cache key keeps memory bounded
+CACHE_LOCK_STRIPES = 64
+_cache_locks = [threading.Lock() for _ in range(CACHE_LOCK_STRIPES)]
+
+# Keys whose creation was rejected outright (content under the model's minimum,
+# model without caching support); not retried for the life of the process
+_uncacheable_keys = set()
+
+# Status codes of those rejections: 400 INVALID_ARGUMENT (too few tokens) and
+# 404 NOT_FOUND (no caching for this model)
+UNCACHEABLE_STATUS_CODES = (400, 404)
+
+
+def init_context_cache_db():
+    """Initialize the SQLite tables that track Gemini cached-content handles."""
+    conn = sqlite3.connect(DB_FILE)
+    cursor = conn.cursor()
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS gemini_context_caches (
+            cache_key TEXT PRIMARY KEY,
+            cache_name TEXT NOT NULL,
+            model TEXT NOT NULL,
+            created_at TIMESTAMP NOT NULL,
+            expires_at TIMESTAMP NOT NULL
+        )
+    """)
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS gemini_context_cache_sessions (
+            session_id TEXT NOT NULL,
+            cache_key TEXT NOT NULL,
+            PRIMARY KEY (session_id, cache_key)
+        )
+    """)
+    conn.commit()
+    conn.close()
+
+
+def make_context_key(model, contents, system_instruction=None):
+    """Identify cached content by model, system instruction and contents (uploaded files by URI, text by value)."""
+    digest = hashlib.sha256()
+    digest.update(f"{model}\0{system_instruction or ''}\0".encode("utf-8"))
+    for part in contents:
+        uri = getattr(part, "uri", None)
+        digest.update((f"file:{uri}" if uri else f"text:{part}").encode("utf-8"))
+        digest.update(b"\0")
+    return digest.hexdigest()
+
+
+def _lock_for(cache_key):
+    return _cache_locks[int(cache_key[:8], 16) % CACHE_LOCK_STRIPES]
+
+
+def get_context_cache(model, contents, session_id, system_instruction=None, ttl_seconds=GEMINI_CONTEXT_CACHE_TTL_SECONDS, create=True):
+    """Return the name of a Gemini cached-content handle holding `contents`, creating it on first use.
+
+    Creating a handle costs a request plus storage, so pass create=False when
+    only one call will use the content: an existing handle is then reused,
+    but no new one is made.
+
+    Identical content shares one handle across calls and sessions while its
+    TTL lasts; the handle is linked to `session_id` so it is deleted with the
+    session. Pass the name as `cached_content` in the request config and send
+    only the remaining parts.
+
+    Returns:
+        Cache name, or None if the content cannot be cached (callers then send it inline)
+    """
+    init_context_cache_db()
+    cache_key = make_context_key(model, contents, system_instruction)
+    if cache_key in _uncacheable_keys:
+        return None
+    client = get_gemini_client()
+    ttl = f"{int(ttl_seconds)}s"
+    with _lock_for(cache_key):
+        conn = sqlite3.connect(DB_FILE)
+        cursor = conn.cursor()
+        cursor.execute("SELECT cache_name, expires_at FROM gemini_context_caches WHERE cache_key = ?", (cache_key,))
+        row = cursor.fetchone()
+        conn.close()
+
+        now = datetime.now()
+        cache_name = None
+        if row and datetime.fromisoformat(row[1]) > now:
+            cache_name = row[0]
+            expires_at = None
+            if datetime.fromisoformat(row[1]) - now < TTL_REFRESH_MARGIN:
+                try:
+                    client.caches.update(name=cache_name, config=types.UpdateCachedContentConfig(ttl=ttl))
+                    expires_at = now + timedelta(seconds=ttl_seconds)
+                except Exception as e:
+                    print(f"Could not extend Gemini context cache {cache_name}: {e}")
+                    cache_name = None
+            if cache_name is not None:
+                if _link_session(cache_key, cache_name, session_id, expires_at):
+                    print(f"Reusing Gemini context cache {cache_name}")
+                    return cache_name
+                # Deleted with its last owning session since it was looked up
+                cache_name = None
+
+        if cache_name is None:
+            if not create:
+                return None
+            try:
+                cached_content = client.caches.create(
+                    model=model,
+                    config=types.CreateCachedContentConfig(contents=contents, system_instruction=system_instruction, ttl=ttl)
+                )
+            except Exception as e:
+                error_class = classify_error(e)
+                if error_class == CLIENT_ERROR and get_status_code(e) in UNCACHEABLE_STATUS_CODES:
+                    print(f"Context caching unavailable for {model}; sending content inline: {e}")
+                    _uncacheable_keys.add(cache_key)
+                else:
+                    # Rate limits, server and network errors are transient: try caching again next time
+                    print(f"Could not create Gemini context cache ({error_class}); sending content inline: {e}")
+                return None
+            cache_name = cached_content.name
+            _record_cache(cache_key, cache_name, model, now, ttl_seconds, session_id)
+            print(f"Created Gemini context cache {cache_name} for {model} ({ttl})")
+    return cache_name
+
+
+def _link_session(cache_key, cache_name, session_id, expires_at=None):
+    """Link `session_id` to a registered handle, in one transaction with the check that it is still registered.
+
+    delete_session_caches removes a handle's registry row in the same kind of
+    transaction once its last link is gone, so a handle is never deleted after
+    being handed out here. `expires_at` records an extended TTL.
+
+    Returns:
+        False if the handle is no longer registered
+    """
+    conn = sqlite3.connect(DB_FILE, timeout=30)
+    try:
+        cursor = conn.cursor()
+        cursor.execute("BEGIN IMMEDIATE")
+        cursor.execute(
+            "UPDATE gemini_context_caches SET expires_at = COALESCE(?, expires_at) WHERE cache_key = ? AND cache_name = ?",
+            (expires_at.isoformat() if expires_at else None, cache_key, cache_name)
+        )
+        if cursor.rowcount == 0:
+            conn.rollback()
+            return False
+        cursor.execute(
+            "INSERT OR IGNORE INTO gemini_context_cache_sessions (session_id, cache_key) VALUES (?, ?)",
+            (session_id, cache_key)
+        )
+        conn.commit()
+        return True
+    finally:
+        conn.close()
+
+
+def _record_cache(cache_key, cache_name, model, created_at, ttl_seconds, session_id):
+    """Register a new handle and link it to `session_id` in one transaction."""
+    conn = sqlite3.connect(DB_FILE, timeout=30)
+    try:
+        cursor = conn.cursor()
+        cursor.execute("BEGIN IMMEDIATE")
+        cursor.execute("""
+            INSERT OR REPLACE INTO gemini_context_caches (cache_key, cache_name, model, created_at, expires_at)
+            VALUES (?, ?, ?, ?, ?)
+        """, (cache_key, cache_name, model, created_at.isoformat(), (created_at + timedelta(seconds=ttl_seconds)).isoformat()))
+        cursor.execute(
+            "INSERT OR IGNORE INTO gemini_context_cache_sessions (session_id, cache_key) VALUES (?, ?)",
+            (session_id, cache_key)
+        )
+        conn.commit()
+    finally:
+        conn.close()
+
+
+def _delete_remote_cache(cache_name):
+    try:
+        get_gemini_client().caches.delete(name=cache_name)
+        return True
+    except Exception as e:
+        # Already expired or deleted remotely; nothing left to clean up
+        print(f"Could not delete Gemini context cache {cache_name}: {e}")
+        return False
+
+
+def delete_session_caches(session_id, max_workers=8):
+    """Delete every context cache referenced only by this session, in one parallel batch.
+
+    Returns:
+        Number of remote caches deleted
+    """
+    init_context_cache_db()
+    conn = sqlite3.connect(DB_FILE, timeout=30)
+    cursor = conn.cursor()
+    # Check the remaining links and drop orphaned handles atomically (see _link_session)
+    cursor.execute("BEGIN IMMEDIATE")
+    cursor.execute("SELECT cache_key FROM gemini_context_cache_sessions WHERE session_id = ?", (session_id,))
+    keys = [row[0] for row in cursor.fetchall()]
+    cursor.execute("DELETE FROM gemini_context_cache_sessions WHERE session_id = ?", (session_id,))
+    orphaned = []
+    for cache_key in keys:
+        cursor.execute("SELECT 1 FROM gemini_context_cache_sessions WHERE cache_key = ? LIMIT 1", (cache_key,))
+        if cursor.fetchone() is None:
+            cursor.execute("SELECT cache_name FROM gemini_context_caches WHERE cache_key = ?", (cache_key,))
+            row = cursor.fetchone()
+            if row:
+                orphaned.append((cache_key, row[0]))
+    if orphaned:
+        cursor.executemany(
+            "DELETE FROM gemini_context_caches WHERE cache_key = ?",
+            [(cache_key,) for cache_key, _ in orphaned]
+        )
+    conn.commit()
+    conn.close()
+
+    if not orphaned:
+        return 0
+    with ThreadPoolExecutor(max_workers=max(1, min(max_workers, len(orphaned)))) as executor:
+        deleted = sum(executor.map(_delete_remote_cache, [cache_name for _, cache_name in orphaned]))
+    print(f"Deleted {deleted} Gemini context cache(s) for session {session_id}")
+    return deleted
+
+
+def purge_expired_caches():
+    """Forget registry entries whose context caches Gemini has already expired."""
+    init_context_cache_db()
+    conn = sqlite3.connect(DB_FILE)
+    cursor = conn.cursor()
+    cursor.execute("SELECT cache_key FROM gemini_context_caches WHERE expires_at < ?", (datetime.now().isoformat(),))
+    expired = [row[0] for row in cursor.fetchall()]
+    cursor.executemany("DELETE FROM gemini_context_caches WHERE cache_key = ?", [(key,) for key in expired])
+    cursor.executemany("DELETE FROM gemini_context_cache_sessions WHERE cache_key = ?", [(key,) for key in expired])
+    conn.commit()
+    conn.close()
+    return len(expired)
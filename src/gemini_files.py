@@ -0,0 +1,222 @@
+# src/gemini_files.py
+# Standard library imports
+import hashlib
+import sqlite3
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+
+# Third-party imports
+from google.genai import types
+
+# Local imports
+from src.llm_clients import get_gemini_client
+
+# SQLite database file (same as used in ragflow_utils.py)
+DB_FILE = "project_ragflow_config.db"
+
+# Gemini deletes uploaded files after 48 hours; stop reusing them a bit earlier
+FILE_REUSE_WINDOW = timedelta(hours=47)
+
+client = get_gemini_client()
+
+# Concurrent uploads of the same bytes take the same lock, so they upload once.
+# A fixed set of lock stripes keyed by content hash keeps memory bounded;
+# different files that share a stripe just upload one after the other.
+UPLOAD_LOCK_STRIPES = 64
+_upload_locks = [threading.Lock() for _ in range(UPLOAD_LOCK_STRIPES)]
+
+
+def init_uploaded_files_db():
+    """Initialize the SQLite tables that track files uploaded to Gemini."""
+    conn = sqlite3.connect(DB_FILE)
+    cursor = conn.cursor()
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS gemini_uploaded_files (
+            content_hash TEXT PRIMARY KEY,
+            file_name TEXT NOT NULL,
+            file_uri TEXT NOT NULL,
+            mime_type TEXT NOT NULL,
+            uploaded_at TIMESTAMP NOT NULL,
+            expires_at TIMESTAMP NOT NULL
+        )
+    """)
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS gemini_file_sessions (
+            session_id TEXT NOT NULL,
+            content_hash TEXT NOT NULL,
+            PRIMARY KEY (session_id, content_hash)
+        )
+    """)
+    conn.commit()
+    conn.close()
+
+
+def _hash_file(file_path):
+    digest = hashlib.sha256()
+    with open(file_path, "rb") as f:
+        for block in iter(lambda: f.read(1024 * 1024), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def _lock_for(content_hash):
+    return _upload_locks[int(content_hash[:8], 16) % UPLOAD_LOCK_STRIPES]
+
+
+def upload_file(file_path, session_id, verify=False):
+    """Upload a file to Gemini unless identical bytes are already uploaded, and link it to the session.
+
+    Args:
+        file_path: Local file to upload
+        session_id: Session that will own (a reference to) the remote file
+        verify: Check that a reused remote file still exists before returning it
+
+    Returns:
+        google.genai File usable in generate_content contents
+    """
+    init_uploaded_files_db()
+    content_hash = _hash_file(file_path)
+    with _lock_for(content_hash):
+        conn = sqlite3.connect(DB_FILE)
+        cursor = conn.cursor()
+        cursor.execute(
+            "SELECT file_name, file_uri, mime_type, expires_at FROM gemini_uploaded_files WHERE content_hash = ?",
+            (content_hash,)
+        )
+        row = cursor.fetchone()
+        conn.close()
+
+        remote_file = None
+        if row and datetime.fromisoformat(row[3]) > datetime.now():
+            remote_file = types.File(name=row[0], uri=row[1], mime_type=row[2])
+            if verify:
+                try:
+                    remote_file = client.files.get(name=row[0])
+                except Exception as e:
+                    print(f"Registered file {row[0]} is no longer available: {e}")
+                    remote_file = None
+            if remote_file is not None:
+                if _link_session(content_hash, row[0], session_id):
+                    print(f"Reusing uploaded file {row[0]} for {file_path}")
+                    return remote_file
+                # Deleted with its last owning session since it was looked up
+                remote_file = None
+
+        remote_file = client.files.upload(file=file_path)
+        _record_upload(content_hash, remote_file, session_id)
+        return remote_file
+
+
+def _link_session(content_hash, file_name, session_id):
+    """Link `session_id` to a registered file, in one transaction with the check that it is still registered.
+
+    delete_session_files removes a file's registry row in the same kind of
+    transaction once its last link is gone, so a file is never deleted after
+    being handed out here.
+
+    Returns:
+        False if the file is no longer registered
+    """
+    conn = sqlite3.connect(DB_FILE, timeout=30)
+    try:
+        cursor = conn.cursor()
+        cursor.execute("BEGIN IMMEDIATE")
+        cursor.execute("SELECT 1 FROM gemini_uploaded_files WHERE content_hash = ? AND file_name = ?", (content_hash, file_name))
+        if cursor.fetchone() is None:
+            conn.rollback()
+            return False
+        cursor.execute(
+            "INSERT OR IGNORE INTO gemini_file_sessions (session_id, content_hash) VALUES (?, ?)",
+            (session_id, content_hash)
+        )
+        conn.commit()
+        return True
+    finally:
+        conn.close()
+
+
+def _record_upload(content_hash, remote_file, session_id):
+    """Register a new upload and link it to `session_id` in one transaction."""
+    uploaded_at = datetime.now()
+    conn = sqlite3.connect(DB_FILE, timeout=30)
+    try:
+        cursor = conn.cursor()
+        cursor.execute("BEGIN IMMEDIATE")
+        cursor.execute("""
+            INSERT OR REPLACE INTO gemini_uploaded_files (content_hash, file_name, file_uri, mime_type, uploaded_at, expires_at)
+            VALUES (?, ?, ?, ?, ?, ?)
+        """, (content_hash, remote_file.name, remote_file.uri, remote_file.mime_type,
+              uploaded_at.isoformat(), (uploaded_at + FILE_REUSE_WINDOW).isoformat()))
+        cursor.execute(
+            "INSERT OR IGNORE INTO gemini_file_sessions (session_id, content_hash) VALUES (?, ?)",
+            (session_id, content_hash)
+        )
+        conn.commit()
+    finally:
+        conn.close()
+
+
+def _delete_remote_file(file_name):
+    try:
+        client.files.delete(name=file_name)
+        return True
+    except Exception as e:
+        # Already expired or deleted remotely; nothing left to clean up
+        print(f"Could not delete Gemini file {file_name}: {e}")
+        return False
+
+
+def delete_session_files(session_id, max_workers=8):
+    """Delete every Gemini file referenced only by this session, in one parallel batch.
+
+    Files still referenced by other sessions are kept; only this session's
+    references are dropped.
+
+    Returns:
+        Number of remote files deleted
+    """
+    init_uploaded_files_db()
+    conn = sqlite3.connect(DB_FILE, timeout=30)
+    cursor = conn.cursor()
+    # Check the remaining links and drop orphaned files atomically (see _link_session)
+    cursor.execute("BEGIN IMMEDIATE")
+    cursor.execute("SELECT content_hash FROM gemini_file_sessions WHERE session_id = ?", (session_id,))
+    hashes = [row[0] for row in cursor.fetchall()]
+    cursor.execute("DELETE FROM gemini_file_sessions WHERE session_id = ?", (session_id,))
+    orphaned = []
+    for content_hash in hashes:
+        cursor.execute("SELECT 1 FROM gemini_file_sessions WHERE content_hash = ? LIMIT 1", (content_hash,))
+        if cursor.fetchone() is None:
+            cursor.execute("SELECT file_name FROM gemini_uploaded_files WHERE content_hash = ?", (content_hash,))
+            row = cursor.fetchone()
+            if row:
+                orphaned.append((content_hash, row[0]))
+    if orphaned:
+        cursor.executemany(
+            "DELETE FROM gemini_uploaded_files WHERE content_hash = ?",
+            [(content_hash,) for content_hash, _ in orphaned]
+        )
+    conn.commit()
+    conn.close()
+
+    if not orphaned:
+        return 0
+    with ThreadPoolExecutor(max_workers=max(1, min(max_workers, len(orphaned)))) as executor:
+        deleted = sum(executor.map(_delete_remote_file, [file_name for _, file_name in orphaned]))
+    print(f"Deleted {deleted} Gemini file(s) for session {session_id}")
+    return deleted
+
+
+def purge_expired_files():
+    """Forget registry entries whose remote files Gemini has already expired."""
+    init_uploaded_files_db()
+    conn = sqlite3.connect(DB_FILE)
+    cursor = conn.cursor()
+    cursor.execute("SELECT content_hash FROM gemini_uploaded_files WHERE expires_at < ?", (datetime.now().isoformat(),))
+    expired = [row[0] for row in cursor.fetchall()]
+    cursor.executemany("DELETE FROM gemini_uploaded_files WHERE content_hash = ?", [(h,) for h in expired])
+    cursor.executemany("DELETE FROM gemini_file_sessions WHERE content_hash = ?", [(h,) for h in expired])
+    conn.commit()
+    conn.close()
+    return len(expired)
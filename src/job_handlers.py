@@ -0,0 +1,153 @@
+# src/job_handlers.py
+# Standard library imports
+import time
+
+# Local imports
+from config import JOB_TOKEN_BUDGET
+from src.audio_processor import transcribe_audio_with_diarization
+from src.job_queue import TokenBudgetExceeded, register_job_handler, start_workers, submit_job
+from src.preflight import count_text_tokens, estimate_summary, estimate_transcription
+from src.rate_limiter import session_scope
+from src.text_processor import prepare_summary_input, summarize_transcription
+from src.transcript import Transcript
+
+# How often a streaming summary job saves the text received so far
+SUMMARY_PROGRESS_INTERVAL_SECONDS = 1.0
+# How often a streaming transcription job saves the segments received so far
+TRANSCRIPTION_PROGRESS_INTERVAL_SECONDS = 1.0
+
+
+def run_transcription_job(params, job):
+    """Background job: transcribe the session's stored audio file.
+
+    Progress snapshots, including the segments of every finished chunk (and,
+    when streaming, of chunks still in progress), are written to the job row
+    so the page can render them while the job runs. Streamed segments are
+    saved at most once per TRANSCRIPTION_PROGRESS_INTERVAL_SECONDS, since
+    each snapshot rewrites every segment received so far. A job queued
+    without a pre-flight estimate is estimated here first, and stops if the
+    estimate is over its token budget.
+    """
+    if params.get("estimated_tokens") is None:
+        estimate = estimate_transcription(
+            params["audio_path"], params["model"], params.get("additional_instructions", ""), overlap_ms=params.get("overlap_ms", 0)
+        )
+        token_budget = params.get("token_budget")
+        if token_budget and estimate["transcription_tokens"] > token_budget:
+            raise TokenBudgetExceeded(
+                f"Estimated {estimate['transcription_tokens']:,} tokens exceeds the job token budget of {token_budget:,}"
+            )
+    finished_segments = {}
+    last_report = None
+
+    def report_progress(event):
+        nonlocal last_report
+        if event["event"] in ("chunk_segments", "chunk_finished"):
+            finished_segments[str(event["chunk"])] = event["segments"].to_dict()
+        if (event["event"] == "chunk_segments" and last_report is not None
+                and time.monotonic() - last_report < TRANSCRIPTION_PROGRESS_INTERVAL_SECONDS):
+            return
+        snapshot = {key: value for key, value in event.items() if key not in ("segments", "chunks")}
+        job.report_progress({**snapshot, "finished_segments": finished_segments}, tokens_used=event.get("tokens_used"))
+        last_report = time.monotonic()
+
+    transcription, _ = transcribe_audio_with_diarization(
+        params["audio_path"],
+        session_id=params["session_id"],
+        model=params["model"],
+        additional_instructions=params.get("additional_instructions", ""),
+        max_concurrent_chunks=params["max_concurrent_chunks"],
+        max_silence_ms=params.get("max_silence_ms"),
+        overlap_ms=params.get("overlap_ms", 0),
+        upload_profile=params["upload_profile"],
+        progress_callback=report_progress,
+        stream=params.get("stream", False)
+    )
+    return {"transcription": transcription.to_dict()}
+
+
+def run_summary_job(params, job):
+    """Background job: summarize a transcription.
+
+    The locally counted input tokens are charged before the request is sent,
+    so a job over its budget stops without calling the model. The summary is
+    streamed, and the text received so far is saved to the job's progress
+    about once a second for the page to show.
+    """
+    transcript = Transcript.load(params["transcription"])
+    estimate = params.get("estimate") or estimate_summary(
+        prepare_summary_input(transcript, model=params["model"])[1], params["model"], params.get("custom_prompt")
+    )
+    job.report_progress({"event": "summary_started", **estimate}, tokens_used=estimate["input_tokens"])
+    summary_stream = summarize_transcription(
+        transcript,
+        model=params["model"],
+        custom_prompt=params.get("custom_prompt"),
+        enable_reasoning=params.get("enable_reasoning", False),
+        bypass_cache=params.get("bypass_cache", False),
+        stream=True,
+        session_id=params.get("session_id")
+    )
+    partial_summary = ""
+    last_report = time.monotonic()
+    # API calls wait in the session's rate-limit queue, taking turns with other sessions
+    with session_scope(params.get("session_id")):
+        for piece in summary_stream:
+            partial_summary += piece
+            if time.monotonic() - last_report >= SUMMARY_PROGRESS_INTERVAL_SECONDS:
+                job.report_progress(
+                    {"event": "summary_streaming", **estimate, "partial_summary": partial_summary},
+                    tokens_used=estimate["input_tokens"] + count_text_tokens(partial_summary, params["model"])
+                )
+                last_report = time.monotonic()
+    summary, reasoning = summary_stream.result
+    return {"summary": summary, "reasoning": reasoning}
+
+
+def submit_transcription_job(session_id, audio_path, audio_name, model, additional_instructions="", max_concurrent_chunks=1,
+                             max_silence_ms=None, overlap_ms=0, upload_profile="speech_mp3", stream=False, token_budget=JOB_TOKEN_BUDGET,
+                             estimate=None):
+    """Queue a transcription of an audio file already saved under the session's temp directory.
+
+    Args:
+        estimate: Pre-flight estimate already computed for this file and these
+            settings; a recording estimated over `token_budget` is then rejected
+            with a ValueError. Without one, the worker probes the audio and
+            checks the budget, so submitting never waits on ffmpeg.
+    """
+    estimated_tokens = estimate["transcription_tokens"] if estimate else None
+    return submit_job("transcription", {
+        "session_id": session_id,
+        "audio_path": audio_path,
+        "audio_name": audio_name,
+        "model": model,
+        "additional_instructions": additional_instructions,
+        "max_concurrent_chunks": max_concurrent_chunks,
+        "max_silence_ms": max_silence_ms,
+        "overlap_ms": overlap_ms,
+        "upload_profile": upload_profile,
+        "stream": stream,
+        "estimated_tokens": estimated_tokens,
+        "token_budget": token_budget
+    }, session_id, token_budget=token_budget, estimated_tokens=estimated_tokens)
+
+
+def submit_summary_job(session_id, transcription, model, custom_prompt=None, enable_reasoning=False, bypass_cache=False,
+                       token_budget=JOB_TOKEN_BUDGET):
+    """Queue a summary of a Transcript, rejecting it if its (compacted) input alone is over `token_budget`."""
+    transcript = Transcript.load(transcription)
+    estimate = estimate_summary(prepare_summary_input(transcript, model=model)[1], model, custom_prompt)
+    return submit_job("summary", {
+        "session_id": session_id,
+        "transcription": transcript.to_dict(),
+        "model": model,
+        "custom_prompt": custom_prompt,
+        "enable_reasoning": enable_reasoning,
+        "bypass_cache": bypass_cache,
+        "estimate": estimate
+    }, session_id, token_budget=token_budget, estimated_tokens=estimate["input_tokens"])
+
+
+register_job_handler("transcription", run_transcription_job)
+register_job_handler("summary", run_summary_job)
+start_workers()
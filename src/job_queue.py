@@ -0,0 +1,343 @@
+# src/job_queue.py
+# Standard library imports
+import json
+import os
+import sqlite3
+import threading
+import time
+import traceback
+import uuid
+from datetime import datetime, timedelta
+
+# Local imports
+from config import JOB_WORKERS
+from src.errors import JobCancelled  # Re-exported for job handlers
+
+# SQLite database file (same as used in ragflow_utils.py)
+DB_FILE = "project_ragflow_config.db"
+
+# Job states: queued -> running -> succeeded | failed | cancelled
+JOB_QUEUED = "queued"
+JOB_RUNNING = "running"
+JOB_SUCCEEDED = "succeeded"
+JOB_FAILED = "failed"
+JOB_CANCELLED = "cancelled"
+ACTIVE_STATES = (JOB_QUEUED, JOB_RUNNING)
+
+# Running jobs whose worker stopped heartbeating (e.g. the server restarted)
+# are put back in the queue after this long
+HEARTBEAT_INTERVAL = timedelta(seconds=15)
+STALE_AFTER = timedelta(seconds=90)
+# An abandoned job that has already been started this many times is failed
+# instead of requeued, so a job that crashes its worker is not retried forever
+MAX_JOB_ATTEMPTS = 3
+POLL_INTERVAL_SECONDS = 1.0
+
+# Handlers by job kind: handler(params, job_context) -> JSON-serializable result
+JOB_HANDLERS = {}
+
+_workers = []
+_workers_lock = threading.Lock()
+_running_jobs = set()
+_running_jobs_lock = threading.Lock()
+_worker_id = f"{os.getpid()}-{uuid.uuid4().hex[:8]}"
+
+
+class TokenBudgetExceeded(JobCancelled):
+    """Raised inside a handler when its job used more tokens than its budget allows."""
+
+
+class JobContext:
+    """Handle passed to job handlers for reporting progress and checking cancellation."""
+
+    def __init__(self, job_id):
+        self.job_id = job_id
+
+    def report_progress(self, progress, tokens_used=None):
+        """Persist a JSON-serializable progress snapshot and, optionally, the job's cumulative token usage.
+
+        Raises:
+            JobCancelled: If the job was cancelled
+            TokenBudgetExceeded: If `tokens_used` is over the job's token budget
+        """
+        conn = sqlite3.connect(DB_FILE, timeout=30)
+        cursor = conn.cursor()
+        cursor.execute(
+            "UPDATE jobs SET progress = ?, tokens_used = MAX(tokens_used, COALESCE(?, 0)), updated_at = ? WHERE job_id = ?",
+            (json.dumps(progress, ensure_ascii=False), tokens_used, datetime.now().isoformat(), self.job_id)
+        )
+        cursor.execute("SELECT status, token_budget, tokens_used FROM jobs WHERE job_id = ?", (self.job_id,))
+        row = cursor.fetchone()
+        conn.commit()
+        conn.close()
+        if row and row[0] == JOB_CANCELLED:
+            raise JobCancelled(self.job_id)
+        if row and row[1] and row[2] > row[1]:
+            raise TokenBudgetExceeded(f"Job used {row[2]:,} tokens, over its budget of {row[1]:,} tokens")
+
+
+def init_jobs_db():
+    """Initialize the SQLite table for background jobs."""
+    conn = sqlite3.connect(DB_FILE, timeout=30)
+    cursor = conn.cursor()
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS jobs (
+            job_id TEXT PRIMARY KEY,
+            session_id TEXT NOT NULL,
+            kind TEXT NOT NULL,
+            status TEXT NOT NULL,
+            params TEXT NOT NULL,
+            progress TEXT,
+            result TEXT,
+            error TEXT,
+            worker_id TEXT,
+            attempts INTEGER NOT NULL DEFAULT 0,
+            created_at TIMESTAMP NOT NULL,
+            updated_at TIMESTAMP NOT NULL,
+            heartbeat_at TIMESTAMP,
+            token_budget INTEGER,
+            tokens_used INTEGER NOT NULL DEFAULT 0
+        )
+    """)
+    # Add token accounting columns to tables created before they existed
+    cursor.execute("PRAGMA table_info(jobs)")
+    columns = {row[1] for row in cursor.fetchall()}
+    if "token_budget" not in columns:
+        cursor.execute("ALTER TABLE jobs ADD COLUMN token_budget INTEGER")
+    if "tokens_used" not in columns:
+        cursor.execute("ALTER TABLE jobs ADD COLUMN tokens_used INTEGER NOT NULL DEFAULT 0")
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_jobs_status_created ON jobs (status, created_at)")
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_jobs_session ON jobs (session_id, kind, created_at)")
+    conn.commit()
+    conn.close()
+
+
+def register_job_handler(kind, handler):
+    """Register the function that runs jobs of `kind`."""
+    JOB_HANDLERS[kind] = handler
+
+
+def submit_job(kind, params, session_id, token_budget=None, estimated_tokens=None):
+    """Queue a job and make sure workers are running. Returns the new job ID.
+
+    Args:
+        token_budget: Maximum tokens the job may use, or None/0 for no limit
+        estimated_tokens: Pre-flight estimate; a job estimated over its budget is rejected up front
+    """
+    if kind not in JOB_HANDLERS:
+        raise ValueError(f"No handler registered for job kind: {kind}")
+    if token_budget and estimated_tokens and estimated_tokens > token_budget:
+        raise ValueError(f"Estimated {estimated_tokens:,} tokens exceeds the job token budget of {token_budget:,}")
+    init_jobs_db()
+    job_id = uuid.uuid4().hex
+    now = datetime.now().isoformat()
+    conn = sqlite3.connect(DB_FILE, timeout=30)
+    cursor = conn.cursor()
+    cursor.execute("""
+        INSERT INTO jobs (job_id, session_id, kind, status, params, created_at, updated_at, token_budget)
+        VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+    """, (job_id, session_id, kind, JOB_QUEUED, json.dumps(params, ensure_ascii=False), now, now, token_budget or None))
+    conn.commit()
+    conn.close()
+    start_workers()
+    return job_id
+
+
+def _row_to_job(row):
+    job_id, session_id, kind, status, params, progress, result, error, created_at, updated_at, token_budget, tokens_used = row
+    return {
+        "job_id": job_id,
+        "session_id": session_id,
+        "kind": kind,
+        "status": status,
+        "params": json.loads(params),
+        "progress": json.loads(progress) if progress else None,
+        "result": json.loads(result) if result else None,
+        "error": error,
+        "created_at": created_at,
+        "updated_at": updated_at,
+        "token_budget": token_budget,
+        "tokens_used": tokens_used
+    }
+
+
+_JOB_COLUMNS = "job_id, session_id, kind, status, params, progress, result, error, created_at, updated_at, token_budget, tokens_used"
+
+
+def get_job(job_id):
+    """Return a job as a dict, or None if it does not exist."""
+    init_jobs_db()
+    conn = sqlite3.connect(DB_FILE, timeout=30)
+    cursor = conn.cursor()
+    cursor.execute(f"SELECT {_JOB_COLUMNS} FROM jobs WHERE job_id = ?", (job_id,))
+    row = cursor.fetchone()
+    conn.close()
+    return _row_to_job(row) if row else None
+
+
+def get_latest_job(session_id, kind):
+    """Return the most recently submitted job of `kind` for a session, or None."""
+    init_jobs_db()
+    conn = sqlite3.connect(DB_FILE, timeout=30)
+    cursor = conn.cursor()
+    cursor.execute(
+        f"SELECT {_JOB_COLUMNS} FROM jobs WHERE session_id = ? AND kind = ? ORDER BY created_at DESC LIMIT 1",
+        (session_id, kind)
+    )
+    row = cursor.fetchone()
+    conn.close()
+    return _row_to_job(row) if row else None
+
+
+def cancel_job(job_id):
+    """Cancel a queued or running job. Running handlers stop at their next progress report."""
+    conn = sqlite3.connect(DB_FILE, timeout=30)
+    cursor = conn.cursor()
+    cursor.execute(
+        f"UPDATE jobs SET status = ?, updated_at = ? WHERE job_id = ? AND status IN ({','.join('?' * len(ACTIVE_STATES))})",
+        (JOB_CANCELLED, datetime.now().isoformat(), job_id, *ACTIVE_STATES)
+    )
+    conn.commit()
+    conn.close()
+
+
+def cancel_session_jobs(session_id):
+    """Cancel every active job belonging to a session."""
+    init_jobs_db()
+    conn = sqlite3.connect(DB_FILE, timeout=30)
+    cursor = conn.cursor()
+    cursor.execute(
+        f"UPDATE jobs SET status = ?, updated_at = ? WHERE session_id = ? AND status IN ({','.join('?' * len(ACTIVE_STATES))})",
+        (JOB_CANCELLED, datetime.now().isoformat(), session_id, *ACTIVE_STATES)
+    )
+    conn.commit()
+    conn.close()
+
+
+def _claim_next_job():
+    """Atomically move the oldest queued job to running and return (job_id, kind, params)."""
+    conn = sqlite3.connect(DB_FILE, timeout=30, isolation_level=None)
+    cursor = conn.cursor()
+    try:
+        cursor.execute("BEGIN IMMEDIATE")
+        cursor.execute(
+            "SELECT job_id, kind, params FROM jobs WHERE status = ? ORDER BY created_at LIMIT 1",
+            (JOB_QUEUED,)
+        )
+        row = cursor.fetchone()
+        if row is None:
+            cursor.execute("COMMIT")
+            return None
+        now = datetime.now().isoformat()
+        cursor.execute("""
+            UPDATE jobs SET status = ?, worker_id = ?, attempts = attempts + 1, updated_at = ?, heartbeat_at = ?
+            WHERE job_id = ?
+        """, (JOB_RUNNING, _worker_id, now, now, row[0]))
+        cursor.execute("COMMIT")
+        return row[0], row[1], json.loads(row[2])
+    except Exception:
+        cursor.execute("ROLLBACK")
+        raise
+    finally:
+        conn.close()
+
+
+def _finish_job(job_id, status, result=None, error=None):
+    conn = sqlite3.connect(DB_FILE, timeout=30)
+    cursor = conn.cursor()
+    # Never overwrite a cancellation that happened while the handler ran
+    cursor.execute(
+        "UPDATE jobs SET status = ?, result = ?, error = ?, updated_at = ? WHERE job_id = ? AND status = ?",
+        (status, json.dumps(result, ensure_ascii=False) if result is not None else None, error,
+         datetime.now().isoformat(), job_id, JOB_RUNNING)
+    )
+    conn.commit()
+    conn.close()
+
+
+def _heartbeat_and_requeue():
+    """Refresh heartbeats of this process's jobs and requeue jobs abandoned by dead workers."""
+    now = datetime.now()
+    with _running_jobs_lock:
+        running = list(_running_jobs)
+    conn = sqlite3.connect(DB_FILE, timeout=30)
+    cursor = conn.cursor()
+    cursor.executemany(
+        "UPDATE jobs SET heartbeat_at = ? WHERE job_id = ?",
+        [(now.isoformat(), job_id) for job_id in running]
+    )
+    cursor.execute(
+        "UPDATE jobs SET status = ?, worker_id = NULL, updated_at = ? WHERE status = ? AND heartbeat_at < ? AND attempts < ?",
+        (JOB_QUEUED, now.isoformat(), JOB_RUNNING, (now - STALE_AFTER).isoformat(), MAX_JOB_ATTEMPTS)
+    )
+    if cursor.rowcount:
+        print(f"Requeued {cursor.rowcount} job(s) abandoned by a stopped worker")
+    cursor.execute(
+        "UPDATE jobs SET status = ?, error = ?, worker_id = NULL, updated_at = ? WHERE status = ? AND heartbeat_at < ? AND attempts >= ?",
+        (JOB_FAILED, f"Worker stopped during each of {MAX_JOB_ATTEMPTS} attempts", now.isoformat(), JOB_RUNNING,
+         (now - STALE_AFTER).isoformat(), MAX_JOB_ATTEMPTS)
+    )
+    if cursor.rowcount:
+        print(f"Failed {cursor.rowcount} abandoned job(s) after {MAX_JOB_ATTEMPTS} attempts")
+    conn.commit()
+    conn.close()
+
+
+def _heartbeat_loop():
+    while True:
+        try:
+            _heartbeat_and_requeue()
+        except Exception as e:
+            print(f"Job heartbeat failed: {e}")
+        time.sleep(HEARTBEAT_INTERVAL.total_seconds())
+
+
+def _worker_loop():
+    while True:
+        try:
+            claimed = _claim_next_job()
+        except Exception as e:
+            print(f"Failed to claim job: {e}")
+            claimed = None
+        if claimed is None:
+            time.sleep(POLL_INTERVAL_SECONDS)
+            continue
+
+        job_id, kind, params = claimed
+        with _running_jobs_lock:
+            _running_jobs.add(job_id)
+        print(f"Worker {_worker_id} started {kind} job {job_id}")
+        try:
+            handler = JOB_HANDLERS.get(kind)
+            if handler is None:
+                raise ValueError(f"No handler registered for job kind: {kind}")
+            result = handler(params, JobContext(job_id))
+            _finish_job(job_id, JOB_SUCCEEDED, result=result)
+            print(f"Job {job_id} succeeded")
+        except TokenBudgetExceeded as e:
+            print(f"Job {job_id} stopped: {e}")
+            _finish_job(job_id, JOB_FAILED, error=str(e))
+        except JobCancelled:
+            print(f"Job {job_id} was cancelled")
+        except Exception as e:
+            traceback.print_exc()
+            _finish_job(job_id, JOB_FAILED, error=str(e))
+        finally:
+            with _running_jobs_lock:
+                _running_jobs.discard(job_id)
+
+
+def start_workers(num_workers=JOB_WORKERS):
+    """Start the worker and heartbeat threads once per process."""
+    with _workers_lock:
+        if _workers:
+            return
+        init_jobs_db()
+        heartbeat = threading.Thread(target=_heartbeat_loop, name="job-heartbeat", daemon=True)
+        heartbeat.start()
+        _workers.append(heartbeat)
+        for idx in range(num_workers):
+            worker = threading.Thread(target=_worker_loop, name=f"job-worker-{idx}", daemon=True)
+            worker.start()
+            _workers.append(worker)
+        print(f"Started {num_workers} job worker(s) in process {_worker_id}")
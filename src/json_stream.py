@@ -0,0 +1,58 @@
+# src/json_stream.py
+# Standard library imports
+import json
+
+
+class JsonArrayStreamParser:
+    """Incrementally parse a top-level JSON array whose text arrives in pieces.
+
+    Each call to feed() returns the array elements completed by the new text,
+    so callers can use them before the response ends. If the text stops before
+    the closing bracket, the elements returned so far are the valid prefix and
+    `complete` stays False.
+    """
+
+    def __init__(self):
+        self._decoder = json.JSONDecoder()
+        self._buffer = ""
+        self._started = False
+        self.complete = False
+        self.items = []
+
+    def feed(self, text):
+        """Add more response text and return the list of newly completed elements."""
+        if self.complete or not text:
+            return []
+        self._buffer += text
+        new_items = []
+        pos = 0
+        buffer = self._buffer
+        while True:
+            if not self._started:
+                # Skip anything before the array, e.g. a stray ```json fence
+                start = buffer.find("[", pos)
+                if start == -1:
+                    pos = len(buffer)
+                    break
+                self._started = True
+                pos = start + 1
+
+            while pos < len(buffer) and (buffer[pos].isspace() or buffer[pos] == ","):
+                pos += 1
+            if pos >= len(buffer):
+                break
+            if buffer[pos] == "]":
+                self.complete = True
+                pos += 1
+                break
+            try:
+                item, end = self._decoder.raw_decode(buffer, pos)
+            except json.JSONDecodeError:
+                # The element is still incomplete; wait for more text
+                break
+            new_items.append(item)
+            pos = end
+
+        self._buffer = buffer[pos:]
+        self.items.extend(new_items)
+        return new_items
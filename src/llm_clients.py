@@ -0,0 +1,112 @@
+# src/llm_clients.py
+# Standard library imports
+import threading
+
+# Third-party imports
+import httpx
+import openai
+from google import genai
+from google.genai import types
+
+# Local imports
+from config import (
+    GEMINI_API_KEY,
+    LLM_CONNECT_TIMEOUT_SECONDS,
+    LLM_POOL_MAX_CONNECTIONS,
+    LLM_POOL_MAX_KEEPALIVE,
+    LLM_REQUEST_TIMEOUT_SECONDS,
+)
+
+OPENAI_PROVIDER = "openai"
+OPENAI_ASYNC_PROVIDER = "openai-async"
+GEMINI_PROVIDER = "gemini"
+OPENAI_DEFAULT_BASE_URL = "https://api.openai.com/v1"
+
+# One client per (provider, base_url, api_key), shared by every session in the
+# process so HTTP keep-alive connections and TLS sessions are reused
+_clients = {}
+_clients_lock = threading.Lock()
+
+
+def _pool_limits():
+    return httpx.Limits(max_connections=LLM_POOL_MAX_CONNECTIONS, max_keepalive_connections=LLM_POOL_MAX_KEEPALIVE)
+
+
+def _timeout():
+    return httpx.Timeout(LLM_REQUEST_TIMEOUT_SECONDS, connect=LLM_CONNECT_TIMEOUT_SECONDS)
+
+
+def _create_client(provider, base_url, api_key):
+    if provider == OPENAI_PROVIDER:
+        return openai.OpenAI(
+            api_key=api_key,
+            base_url=base_url,
+            timeout=_timeout(),
+            max_retries=0,  # retries are handled by src.retry_policy
+            http_client=httpx.Client(limits=_pool_limits(), timeout=_timeout())
+        )
+    if provider == OPENAI_ASYNC_PROVIDER:
+        return openai.AsyncOpenAI(
+            api_key=api_key,
+            base_url=base_url,
+            timeout=_timeout(),
+            max_retries=0,  # retries are handled by src.retry_policy
+            http_client=httpx.AsyncClient(limits=_pool_limits(), timeout=_timeout())
+        )
+    if provider == GEMINI_PROVIDER:
+        http_options = {"timeout": int(LLM_REQUEST_TIMEOUT_SECONDS * 1000)}
+        # Newer google-genai releases accept httpx client arguments; older ones keep their default pool
+        if "client_args" in types.HttpOptions.model_fields:
+            http_options["client_args"] = {"limits": _pool_limits()}
+        return genai.Client(api_key=api_key, http_options=types.HttpOptions(**http_options))
+    raise ValueError(f"Unknown LLM provider: {provider}")
+
+
+def get_client(provider, api_key, base_url=None):
+    """Return the shared client for (provider, base_url, api_key), creating it on first use.
+
+    Args:
+        provider: "openai" (also used for OpenAI-compatible APIs such as xAI), "openai-async" or "gemini"
+        api_key: API key the client authenticates with
+        base_url: API base URL for OpenAI-compatible providers (ignored for Gemini)
+    """
+    if provider in (OPENAI_PROVIDER, OPENAI_ASYNC_PROVIDER):
+        # "No base_url" and the explicit OpenAI URL are the same endpoint; share one pool
+        base_url = (base_url or OPENAI_DEFAULT_BASE_URL).rstrip("/")
+    else:
+        base_url = None
+    key = (provider, base_url, api_key)
+    with _clients_lock:
+        client = _clients.get(key)
+        if client is None:
+            client = _clients[key] = _create_client(provider, base_url, api_key)
+        return client
+
+
+def get_openai_client(api_key, base_url=None):
+    """Shared OpenAI (or OpenAI-compatible) client."""
+    return get_client(OPENAI_PROVIDER, api_key, base_url)
+
+
+def get_async_openai_client(api_key, base_url=None):
+    """Shared AsyncOpenAI client; only use it on the src.async_llm event loop its pool is bound to."""
+    return get_client(OPENAI_ASYNC_PROVIDER, api_key, base_url)
+
+
+def get_gemini_client(api_key=GEMINI_API_KEY):
+    """Shared Gemini client."""
+    return get_client(GEMINI_PROVIDER, api_key)
+
+
+def close_all_clients():
+    """Close every pooled sync client and forget all clients (e.g. before the process exits)."""
+    with _clients_lock:
+        clients = list(_clients.values())
+        _clients.clear()
+    for client in clients:
+        close = getattr(client, "close", None)
+        if close is not None and not isinstance(client, openai.AsyncOpenAI):
+            try:
+                close()
+            except Exception as e:
+                print(f"Failed to close LLM client: {e}")
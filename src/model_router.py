@@ -0,0 +1,148 @@
+# src/model_router.py
+# Standard library imports
+import math
+import threading
+from collections import deque
+
+# Local imports
+from config import SUMMARY_SECTION_TOKENS
+from src.preflight import SUMMARY_MAX_OUTPUT_TOKENS, count_text_tokens
+
+# Model id that asks for routing instead of a fixed model
+AUTO_MODEL = "auto"
+
+# Per-model limits and a latency baseline: a summary call is expected to take
+# about overhead_seconds (queueing, first token, generating the summary) plus
+# seconds_per_1k_input for every thousand input tokens. Measured calls scale
+# the baseline per model (see record_latency).
+MODEL_CAPABILITIES = {
+    "gemini-2.0-flash": {"context_tokens": 1_048_576, "max_output_tokens": 8_192, "overhead_seconds": 8, "seconds_per_1k_input": 0.05},
+    "gpt-4.1": {"context_tokens": 1_047_576, "max_output_tokens": 32_768, "overhead_seconds": 20, "seconds_per_1k_input": 0.15},
+    "grok-3": {"context_tokens": 131_072, "max_output_tokens": 16_384, "overhead_seconds": 25, "seconds_per_1k_input": 0.2},
+    "gemini-1.5-pro-latest": {"context_tokens": 2_097_152, "max_output_tokens": 8_192, "overhead_seconds": 25, "seconds_per_1k_input": 0.1},
+    "grok-3-mini": {"context_tokens": 131_072, "max_output_tokens": 16_384, "overhead_seconds": 30, "seconds_per_1k_input": 0.1},
+    "o4-mini": {"context_tokens": 200_000, "max_output_tokens": 100_000, "overhead_seconds": 40, "seconds_per_1k_input": 0.1},
+    "gemini-2.5-pro-exp-03-25": {"context_tokens": 1_048_576, "max_output_tokens": 65_536, "overhead_seconds": 45, "seconds_per_1k_input": 0.1},
+}
+
+# Leave headroom for tokenizer differences between the local count and the provider's
+CONTEXT_SAFETY_MARGIN = 0.9
+# Weight of the newest measurement in each model's latency moving average
+LATENCY_EWMA_ALPHA = 0.3
+
+# Recent measured / baseline latency ratios kept per model for percentiles
+LATENCY_SAMPLE_WINDOW = 50
+# Fewer samples than this and latency_percentile falls back to the estimate
+MIN_PERCENTILE_SAMPLES = 5
+
+# Model -> moving average of measured / baseline latency (1.0 = as in the table)
+_latency_factors = {}
+_latency_samples = {}
+_latency_lock = threading.Lock()
+
+
+def _baseline_seconds(model, input_tokens):
+    capabilities = MODEL_CAPABILITIES[model]
+    return capabilities["overhead_seconds"] + capabilities["seconds_per_1k_input"] * input_tokens / 1000
+
+
+def estimate_latency(model, input_tokens):
+    """Expected seconds for a summary call: the table baseline scaled by this model's measured latencies."""
+    with _latency_lock:
+        factor = _latency_factors.get(model, 1.0)
+    return factor * _baseline_seconds(model, input_tokens)
+
+
+def record_latency(model, input_tokens, elapsed_seconds, censored=False):
+    """Fold one call into the model's latency moving average and percentile window.
+
+    A censored call (timed out or cancelled) only shows the latency is at
+    least `elapsed_seconds`, so it is counted only when that exceeds the
+    model's current average.
+    """
+    if model not in MODEL_CAPABILITIES or elapsed_seconds <= 0:
+        return
+    observed = elapsed_seconds / _baseline_seconds(model, input_tokens)
+    with _latency_lock:
+        previous = _latency_factors.get(model)
+        if censored and observed <= (1.0 if previous is None else previous):
+            return
+        _latency_factors[model] = observed if previous is None else LATENCY_EWMA_ALPHA * observed + (1 - LATENCY_EWMA_ALPHA) * previous
+        _latency_samples.setdefault(model, deque(maxlen=LATENCY_SAMPLE_WINDOW)).append(observed)
+
+
+def latency_percentile(model, input_tokens, percentile):
+    """Seconds within which `percentile`% of recent calls to the model finished, scaled to `input_tokens`.
+
+    Returns None until the model has MIN_PERCENTILE_SAMPLES measurements.
+    """
+    if model not in MODEL_CAPABILITIES:
+        return None
+    with _latency_lock:
+        samples = sorted(_latency_samples.get(model, ()))
+    if len(samples) < MIN_PERCENTILE_SAMPLES:
+        return None
+    rank = min(len(samples) - 1, max(0, math.ceil(percentile / 100 * len(samples)) - 1))
+    return samples[rank] * _baseline_seconds(model, input_tokens)
+
+
+def hedge_delay(model, input_tokens, percentile):
+    """Seconds to wait for `model` before hedging: its latency percentile, or twice the estimate until enough calls are measured."""
+    delay = latency_percentile(model, input_tokens, percentile)
+    if delay is None:
+        delay = 2 * estimate_latency(model, input_tokens) if model in MODEL_CAPABILITIES else None
+    return delay
+
+
+def fits_context(model, input_tokens):
+    """Whether `input_tokens` plus room for the summary fit in the model's context window."""
+    capabilities = MODEL_CAPABILITIES[model]
+    output_reserve = min(SUMMARY_MAX_OUTPUT_TOKENS, capabilities["max_output_tokens"])
+    return input_tokens + output_reserve <= capabilities["context_tokens"] * CONTEXT_SAFETY_MARGIN
+
+
+def route_summary(transcription_text, model=AUTO_MODEL, custom_prompt=None, candidates=None, model_config=None):
+    """
+    Pick the summary model and strategy for a transcript, counting its tokens locally.
+
+    With AUTO_MODEL, the fastest candidate whose context fits the whole
+    transcript is chosen; if none fits, the fastest candidate is used with
+    map-reduce. An explicit model is kept as chosen, but switched to
+    map-reduce when the transcript does not fit it.
+
+    Args:
+        candidates: Models AUTO_MODEL may pick from (default: every model in MODEL_CAPABILITIES)
+        model_config: MODEL_CONFIG mapping; candidates whose provider has no API key are left out
+
+    Returns:
+        Dict with model, map_reduce (True when chunking is required, else None
+        to leave the strategy to the caller), input_tokens, estimated_seconds
+        and a short human-readable reason
+    """
+    input_tokens = count_text_tokens(transcription_text) + count_text_tokens(custom_prompt or "")
+    if model != AUTO_MODEL:
+        if model not in MODEL_CAPABILITIES or fits_context(model, input_tokens):
+            return {"model": model, "map_reduce": None, "input_tokens": input_tokens,
+                    "estimated_seconds": estimate_latency(model, input_tokens) if model in MODEL_CAPABILITIES else None,
+                    "reason": f"{input_tokens:,} input tokens fit {model}"}
+        return {"model": model, "map_reduce": True, "input_tokens": input_tokens,
+                "estimated_seconds": estimate_latency(model, SUMMARY_SECTION_TOKENS),
+                "reason": f"{input_tokens:,} input tokens exceed the context of {model}; summarizing in sections"}
+
+    candidates = [
+        name for name in (MODEL_CAPABILITIES if candidates is None else candidates)
+        if name in MODEL_CAPABILITIES and (model_config is None or model_config.get(name, {}).get("api_key"))
+    ]
+    if not candidates:
+        print("Error routing summary: no candidate model has an API key configured")
+        raise Exception("No summary model has an API key configured")
+    fitting = [name for name in candidates if fits_context(name, input_tokens)]
+    if fitting:
+        chosen = min(fitting, key=lambda name: estimate_latency(name, input_tokens))
+        return {"model": chosen, "map_reduce": None, "input_tokens": input_tokens,
+                "estimated_seconds": estimate_latency(chosen, input_tokens),
+                "reason": f"fastest model that fits {input_tokens:,} input tokens"}
+    chosen = min(candidates, key=lambda name: estimate_latency(name, SUMMARY_SECTION_TOKENS))
+    return {"model": chosen, "map_reduce": True, "input_tokens": input_tokens,
+            "estimated_seconds": estimate_latency(chosen, SUMMARY_SECTION_TOKENS),
+            "reason": f"{input_tokens:,} input tokens fit no model; summarizing in sections with the fastest model"}
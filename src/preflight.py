@@ -0,0 +1,140 @@
+# src/preflight.py
+# Standard library imports
+import math
+
+# Third-party imports (optional: exact local token counts for OpenAI-style tokenizers)
+try:
+    import tiktoken
+except ImportError:
+    tiktoken = None
+
+# Local imports
+from src.audio_source import probe_audio
+from src.chunk_planner import DEFAULT_BOUNDARY_TOLERANCE_MS, DEFAULT_CHUNK_LENGTH_MS, plan_chunks
+from src.prompts import GENERAL_SUMMARY_PROMPT, TRANSCRIPTION_DEFAULT_SYSTEM_PROMPT
+
+# Gemini bills audio input at a fixed 32 tokens per second
+AUDIO_TOKENS_PER_SECOND = 32
+# Meeting speech runs at roughly 150-160 words per minute, i.e. ~4 tokens per
+# second of transcript text; the JSON transcription output (timestamps,
+# speaker keys, quoting) is about half as large again
+TRANSCRIPT_TOKENS_PER_SECOND = 4
+TRANSCRIPTION_OUTPUT_TOKENS_PER_SECOND = 6
+# Fallback when tiktoken is not installed
+CHARS_PER_TOKEN = 4
+# Summaries are requested with at most this many output tokens
+SUMMARY_MAX_OUTPUT_TOKENS = 20000
+
+# Approximate list prices in USD per million tokens. Audio input is only
+# billed differently by Gemini; models without an entry are not costed.
+MODEL_PRICING = {
+    "gemini-2.0-flash": {"input": 0.10, "audio_input": 0.70, "output": 0.40},
+    "gemini-2.5-pro-exp-03-25": {"input": 1.25, "audio_input": 1.25, "output": 10.00},
+    "gemini-1.5-pro-latest": {"input": 1.25, "audio_input": 1.25, "output": 5.00},
+    "gpt-4.1": {"input": 2.00, "output": 8.00},
+    "o4-mini": {"input": 1.10, "output": 4.40},
+    "grok-3": {"input": 3.00, "output": 15.00},
+    "grok-3-mini": {"input": 0.30, "output": 0.50},
+}
+
+
+def _get_encoding(model):
+    try:
+        return tiktoken.encoding_for_model(model)
+    except (KeyError, ValueError):
+        return tiktoken.get_encoding("o200k_base")
+
+
+def count_text_tokens(text, model=None):
+    """Count tokens locally: exactly with tiktoken if installed, else about one token per 4 characters.
+
+    Non-OpenAI models are counted with the o200k tokenizer, which is a close
+    approximation for Gemini and Grok.
+    """
+    if not text:
+        return 0
+    if tiktoken is not None:
+        return len(_get_encoding(model or "gpt-4.1").encode(text, disallowed_special=()))
+    return math.ceil(len(text) / CHARS_PER_TOKEN)
+
+
+def tokenizer_name():
+    """Name of the local counting method, for display next to estimates."""
+    return "tiktoken" if tiktoken is not None else f"~{CHARS_PER_TOKEN} chars/token"
+
+
+def estimate_cost(model, input_tokens=0, output_tokens=0, audio_tokens=0):
+    """Estimated USD cost of a call, or None if the model has no pricing entry."""
+    pricing = MODEL_PRICING.get(model)
+    if pricing is None:
+        return None
+    return (
+        input_tokens * pricing["input"]
+        + audio_tokens * pricing.get("audio_input", pricing["input"])
+        + output_tokens * pricing["output"]
+    ) / 1_000_000
+
+
+def estimate_transcription(audio_path, model="gemini-2.0-flash", additional_instructions="", chunk_length_ms=DEFAULT_CHUNK_LENGTH_MS,
+                           boundary_tolerance_ms=DEFAULT_BOUNDARY_TOLERANCE_MS, overlap_ms=0, summary_model=None, summary_prompt=None):
+    """Estimate the tokens and cost of transcribing (and then summarizing) an audio file.
+
+    Nothing is uploaded: the chunk plan is computed locally with the same
+    planner the transcription uses, audio tokens follow from the chunk
+    durations (overlapping audio is counted twice, as it is billed twice),
+    and prompt tokens are counted locally. Silence compression is ignored,
+    so audio tokens are an upper bound when it is enabled.
+
+    Returns:
+        Dict with duration_ms, chunks, audio_tokens, prompt_tokens,
+        output_tokens, transcription_tokens, summary_input_tokens,
+        total_tokens, estimated_cost_usd (None if unknown) and tokenizer
+    """
+    audio_info = probe_audio(audio_path)
+    chunks = plan_chunks(audio_path, audio_info, chunk_length_ms=chunk_length_ms, tolerance_ms=boundary_tolerance_ms, overlap_ms=overlap_ms)
+
+    full_prompt = TRANSCRIPTION_DEFAULT_SYSTEM_PROMPT
+    if additional_instructions:
+        full_prompt += f"\n\nAdditional Instructions: {additional_instructions}"
+    prompt_tokens = count_text_tokens(full_prompt, model) * len(chunks)
+    chunk_seconds = sum(end_ms - start_ms for start_ms, end_ms in chunks) / 1000
+    audio_tokens = math.ceil(chunk_seconds * AUDIO_TOKENS_PER_SECOND)
+    output_tokens = math.ceil(chunk_seconds * TRANSCRIPTION_OUTPUT_TOKENS_PER_SECOND)
+    transcription_tokens = prompt_tokens + audio_tokens + output_tokens
+
+    summary_model = summary_model or model
+    summary_input_tokens = (
+        count_text_tokens(summary_prompt or GENERAL_SUMMARY_PROMPT, summary_model)
+        + math.ceil(audio_info["duration_ms"] / 1000 * TRANSCRIPT_TOKENS_PER_SECOND)
+    )
+
+    transcription_cost = estimate_cost(model, input_tokens=prompt_tokens, output_tokens=output_tokens, audio_tokens=audio_tokens)
+    summary_cost = estimate_cost(summary_model, input_tokens=summary_input_tokens)
+    return {
+        "duration_ms": audio_info["duration_ms"],
+        "chunks": chunks,
+        "audio_tokens": audio_tokens,
+        "prompt_tokens": prompt_tokens,
+        "output_tokens": output_tokens,
+        "transcription_tokens": transcription_tokens,
+        "summary_input_tokens": summary_input_tokens,
+        "total_tokens": transcription_tokens + summary_input_tokens,
+        "estimated_cost_usd": None if transcription_cost is None or summary_cost is None else transcription_cost + summary_cost,
+        "tokenizer": tokenizer_name()
+    }
+
+
+def estimate_summary(transcription_text, model="gemini-2.0-flash", custom_prompt=None):
+    """Count the input tokens of a summary request locally.
+
+    Returns:
+        Dict with input_tokens, max_output_tokens, estimated_cost_usd (input
+        only, None if unknown) and tokenizer
+    """
+    input_tokens = count_text_tokens(custom_prompt or GENERAL_SUMMARY_PROMPT, model) + count_text_tokens(transcription_text, model)
+    return {
+        "input_tokens": input_tokens,
+        "max_output_tokens": SUMMARY_MAX_OUTPUT_TOKENS,
+        "estimated_cost_usd": estimate_cost(model, input_tokens=input_tokens),
+        "tokenizer": tokenizer_name()
+    }
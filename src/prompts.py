@@ -190,4 +190,38 @@ A good general summary should include:
 *   **Next Steps:** What are the planned next steps following the meeting? Are there future meetings scheduled?
 
 Your summary should be accurate, objective, and easy to understand. Aim for a length of no more than [DESIRED_LENGTH] words (adjust as needed) while ensuring you capture all of the essential information.  Focus on extracting the core information; avoid verbatim transcription or unnecessary details.
-"""
\ No newline at end of file
+"""
+SECTION_SUMMARY_PROMPT = """
+You are an AI assistant taking notes on one section of a long meeting transcript. The transcript has been split into {section_count} consecutive sections; this is section {section_number} ({time_range}). Your notes will later be merged with the notes of the other sections into a single summary, so do not write an introduction or conclusion.
+
+Write detailed, factual notes for this section only:
+
+*   **Topics Discussed:** The subjects covered, with the specific details, figures and examples mentioned.
+*   **Decisions:** Any decisions made, who made them and why.
+*   **Action Items:** Tasks assigned, with the owner and any deadline mentioned.
+*   **Open Issues:** Questions or problems left unresolved in this section.
+
+Keep speaker names and timestamps where they help attribute a point. Preserve anything the final summary below would need:
+
+--- Final Summary Instructions ---
+{final_instructions}
+"""
+
+MERGE_SECTION_NOTES_PROMPT = """
+You are an AI assistant combining notes taken on consecutive sections of a long meeting transcript. The notes below are in chronological order and will be merged again with notes from other parts of the meeting, so do not write an introduction or conclusion.
+
+Merge them into one set of notes with the same headings (Topics Discussed, Decisions, Action Items, Open Issues):
+
+*   Combine points about the same topic, decision or action item, keeping the most specific details (owners, deadlines, figures).
+*   Where a later section revises or reverses an earlier point, keep only the final outcome and note that it changed.
+*   Do not drop any decision, action item or open issue.
+
+Keep the result focused on what the final summary below will need:
+
+--- Final Summary Instructions ---
+{final_instructions}
+"""
+
+FINAL_MERGE_PREAMBLE = """
+The input below is not a raw transcript: it is a set of notes taken on consecutive sections of one long meeting, in chronological order. Treat it as the complete record of the meeting and write the summary described next from it.
+"""
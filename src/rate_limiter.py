@@ -0,0 +1,280 @@
+# src/rate_limiter.py
+# Standard library imports
+import asyncio
+import contextvars
+import threading
+import time
+from collections import deque
+from contextlib import asynccontextmanager, contextmanager
+
+# Local imports
+from config import (
+    GEMINI_REQUESTS_PER_MINUTE, GEMINI_TOKENS_PER_MINUTE, OPENAI_REQUESTS_PER_MINUTE, OPENAI_TOKENS_PER_MINUTE,
+    XAI_REQUESTS_PER_MINUTE, XAI_TOKENS_PER_MINUTE, LLM_MAX_CONCURRENT_REQUESTS,
+)
+
+GEMINI_PROVIDER = "gemini"
+OPENAI_PROVIDER = "openai"
+XAI_PROVIDER = "xai"
+
+# Provider -> (requests per minute, tokens per minute); 0 = unlimited
+PROVIDER_LIMITS = {
+    GEMINI_PROVIDER: (GEMINI_REQUESTS_PER_MINUTE, GEMINI_TOKENS_PER_MINUTE),
+    OPENAI_PROVIDER: (OPENAI_REQUESTS_PER_MINUTE, OPENAI_TOKENS_PER_MINUTE),
+    XAI_PROVIDER: (XAI_REQUESTS_PER_MINUTE, XAI_TOKENS_PER_MINUTE),
+}
+
+# Calls made outside any session (e.g. batch_transcribe.py) share one queue
+DEFAULT_SESSION = "default"
+
+# Session whose queue a call waits in; set with session_scope() or bind_session()
+_current_session = contextvars.ContextVar("rate_limit_session", default=DEFAULT_SESSION)
+
+# One limiter per (provider, api_key), shared by every session in the process
+_limiters = {}
+_limiters_lock = threading.Lock()
+
+
+class AcquireCancelled(Exception):
+    """Raised by RateLimiter.acquire when its cancel event is set while it waits."""
+
+
+class _Bucket:
+    """Token bucket holding up to `per_minute` units, refilled continuously."""
+
+    def __init__(self, per_minute):
+        self.capacity = float(per_minute)
+        self.level = float(per_minute)
+        self.refill_per_second = per_minute / 60
+        self.updated_at = time.monotonic()
+
+    def _refill(self):
+        now = time.monotonic()
+        self.level = min(self.capacity, self.level + (now - self.updated_at) * self.refill_per_second)
+        self.updated_at = now
+
+    def seconds_until(self, amount):
+        self._refill()
+        # A request larger than the whole bucket waits for a full bucket instead of forever
+        missing = min(amount, self.capacity) - self.level
+        return max(0.0, missing / self.refill_per_second)
+
+    def take(self, amount):
+        self.level -= min(amount, self.capacity)
+
+
+class RateLimiter:
+    """
+    Requests-per-minute, tokens-per-minute and in-flight limits for one provider API key.
+
+    Waiting calls are queued per session and served round-robin, one call per
+    session in turn, so a session with many parallel chunks or sections
+    cannot starve the others.
+    """
+
+    def __init__(self, name, requests_per_minute=0, tokens_per_minute=0, max_concurrent=0):
+        self.name = name
+        self._requests = _Bucket(requests_per_minute) if requests_per_minute > 0 else None
+        self._tokens = _Bucket(tokens_per_minute) if tokens_per_minute > 0 else None
+        self.max_concurrent = max_concurrent
+        self._condition = threading.Condition()
+        self._queues = {}  # session -> deque of waiting tickets
+        self._turns = deque()  # sessions with waiting calls, in serving order
+        self._in_flight = 0
+        self._granted = 0
+        self._total_wait = 0.0
+        self._max_wait = 0.0
+
+    def _seconds_until_ready(self, tokens):
+        """0 when the call can start now, seconds until a bucket refills, or None while all slots are busy."""
+        if self.max_concurrent and self._in_flight >= self.max_concurrent:
+            return None
+        return max(
+            self._requests.seconds_until(1) if self._requests else 0.0,
+            self._tokens.seconds_until(tokens) if self._tokens else 0.0
+        )
+
+    def _leave_queue(self, session_id, ticket, served):
+        queue = self._queues[session_id]
+        queue.remove(ticket)
+        if not queue:
+            del self._queues[session_id]
+            self._turns.remove(session_id)
+        elif served:
+            # The session had its turn; its next call waits behind the other sessions
+            self._turns.rotate(-1)
+        self._condition.notify_all()
+
+    def acquire(self, tokens=0, session_id=None, cancel_event=None):
+        """Block until this call may start, then take its request, tokens and an in-flight slot.
+
+        Args:
+            tokens: Estimated tokens the call consumes
+            session_id: Queue to wait in; defaults to the current session (see session_scope)
+            cancel_event: threading.Event; once set (see cancel()), the call leaves the
+                queue without taking any budget and AcquireCancelled is raised
+
+        Returns:
+            Seconds spent waiting
+        """
+        session_id = session_id or _current_session.get()
+        ticket = object()
+        queued_at = time.monotonic()
+        with self._condition:
+            if session_id not in self._queues:
+                self._queues[session_id] = deque()
+                self._turns.append(session_id)
+            self._queues[session_id].append(ticket)
+            try:
+                while True:
+                    if cancel_event is not None and cancel_event.is_set():
+                        raise AcquireCancelled(f"Gave up waiting for the {self.name} rate limit")
+                    if self._turns[0] == session_id and self._queues[session_id][0] is ticket:
+                        delay = self._seconds_until_ready(tokens)
+                        if delay == 0:
+                            break
+                        self._condition.wait(delay)
+                    else:
+                        self._condition.wait()
+            except BaseException:
+                self._leave_queue(session_id, ticket, served=False)
+                raise
+            if self._requests:
+                self._requests.take(1)
+            if self._tokens:
+                self._tokens.take(tokens)
+            self._in_flight += 1
+            self._leave_queue(session_id, ticket, served=True)
+
+            waited = time.monotonic() - queued_at
+            self._granted += 1
+            self._total_wait += waited
+            self._max_wait = max(self._max_wait, waited)
+        if waited >= 1:
+            print(f"Waited {waited:.1f}s for the {self.name} rate limit (session {session_id})")
+        return waited
+
+    def cancel(self, cancel_event):
+        """Set a waiting acquire()'s cancel event and wake it so it leaves the queue."""
+        with self._condition:
+            cancel_event.set()
+            self._condition.notify_all()
+
+    def release(self):
+        """Free the in-flight slot taken by acquire()."""
+        with self._condition:
+            self._in_flight -= 1
+            self._condition.notify_all()
+
+    @contextmanager
+    def limit(self, tokens=0, session_id=None):
+        """Hold a slot for the duration of the block."""
+        self.acquire(tokens, session_id)
+        try:
+            yield
+        finally:
+            self.release()
+
+    def stats(self):
+        """Queue depth, in-flight calls and wait times of this limiter."""
+        with self._condition:
+            return {
+                "limiter": self.name,
+                "queue_depth": sum(len(queue) for queue in self._queues.values()),
+                "waiting_sessions": len(self._turns),
+                "in_flight": self._in_flight,
+                "granted": self._granted,
+                "average_wait_seconds": self._total_wait / self._granted if self._granted else 0.0,
+                "max_wait_seconds": self._max_wait,
+            }
+
+
+def provider_for(client_type, base_url=None):
+    """Rate-limit provider of a MODEL_CONFIG entry; OpenAI-compatible APIs are told apart by base URL."""
+    if client_type == GEMINI_PROVIDER:
+        return GEMINI_PROVIDER
+    return XAI_PROVIDER if base_url and "x.ai" in base_url else OPENAI_PROVIDER
+
+
+def get_limiter(provider, api_key):
+    """Return the shared limiter for (provider, api_key), creating it on first use."""
+    key = (provider, api_key)
+    with _limiters_lock:
+        limiter = _limiters.get(key)
+        if limiter is None:
+            requests_per_minute, tokens_per_minute = PROVIDER_LIMITS[provider]
+            # Name limiters by the key's last characters, never the whole key
+            name = f"{provider} (...{api_key[-4:]})" if api_key else provider
+            limiter = _limiters[key] = RateLimiter(name, requests_per_minute, tokens_per_minute, LLM_MAX_CONCURRENT_REQUESTS)
+        return limiter
+
+
+def limiter_for(client_type, api_key, base_url=None):
+    """Shared limiter of a MODEL_CONFIG entry's provider and key."""
+    return get_limiter(provider_for(client_type, base_url), api_key)
+
+
+def rate_limited(client_type, api_key, base_url=None, tokens=0):
+    """Context manager holding a rate-limit slot for one API call (see RateLimiter.acquire)."""
+    return limiter_for(client_type, api_key, base_url).limit(tokens)
+
+
+@asynccontextmanager
+async def async_rate_limited(client_type, api_key, base_url=None, tokens=0, session_id=None):
+    """Async counterpart of rate_limited; the wait runs in a worker thread so the event loop stays free.
+
+    Cancelling the waiting task removes the call from the queue without spending any budget.
+    """
+    limiter = limiter_for(client_type, api_key, base_url)
+    cancel_event = threading.Event()
+    acquiring = asyncio.ensure_future(asyncio.to_thread(limiter.acquire, tokens, session_id, cancel_event))
+    try:
+        await asyncio.shield(acquiring)
+    except asyncio.CancelledError:
+        limiter.cancel(cancel_event)
+        # A slot granted just before the cancel is handed straight back
+        acquiring.add_done_callback(lambda task: task.cancelled() or task.exception() is not None or limiter.release())
+        raise
+    try:
+        yield
+    finally:
+        limiter.release()
+
+
+def current_session():
+    return _current_session.get()
+
+
+def set_current_session(session_id):
+    """Queue the rest of this thread's calls (e.g. a Streamlit script run) under `session_id`."""
+    _current_session.set(session_id or DEFAULT_SESSION)
+
+
+@contextmanager
+def session_scope(session_id):
+    """Queue the calls made in this block (in this thread) under `session_id`; None keeps the current session."""
+    if not session_id:
+        yield
+        return
+    token = _current_session.set(session_id)
+    try:
+        yield
+    finally:
+        _current_session.reset(token)
+
+
+def bind_session(fn, session_id=None):
+    """Wrap `fn` so it runs under `session_id` (default: the caller's session), e.g. in a thread pool worker."""
+    session_id = session_id or _current_session.get()
+
+    def bound(*args, **kwargs):
+        with session_scope(session_id):
+            return fn(*args, **kwargs)
+    return bound
+
+
+def rate_limit_stats():
+    """Stats of every limiter in use, for display."""
+    with _limiters_lock:
+        limiters = list(_limiters.values())
+    return [limiter.stats() for limiter in limiters]
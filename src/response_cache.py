@@ -0,0 +1,122 @@
+# src/response_cache.py
+# Standard library imports
+import hashlib
+import json
+import sqlite3
+import threading
+import time
+
+# Local imports
+from config import LLM_RESPONSE_CACHE_DB, LLM_RESPONSE_CACHE_MAX_BYTES, LLM_RESPONSE_CACHE_TTL_SECONDS
+
+# Bump when the cached value format changes so old entries are never reused
+CACHE_VERSION = "1"
+
+_cache_lock = threading.Lock()
+
+
+def _connect():
+    conn = sqlite3.connect(LLM_RESPONSE_CACHE_DB, timeout=30)
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS llm_responses (
+            cache_key TEXT PRIMARY KEY,
+            kind TEXT NOT NULL,
+            model TEXT NOT NULL,
+            response TEXT NOT NULL,
+            size_bytes INTEGER NOT NULL,
+            created_at REAL NOT NULL,
+            last_used_at REAL NOT NULL
+        )
+    """)
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_llm_responses_last_used ON llm_responses (last_used_at)")
+    return conn
+
+
+def make_response_key(kind, model, system_prompt, user_input, **params):
+    """Content hash of everything that determines a response: model, full system prompt, input and parameters."""
+    payload = json.dumps(
+        {"version": CACHE_VERSION, "kind": kind, "model": model, "system_prompt": system_prompt, "input": user_input, "params": params},
+        ensure_ascii=False, sort_keys=True, default=str
+    )
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+def get_cached_response(cache_key, ttl_seconds=LLM_RESPONSE_CACHE_TTL_SECONDS):
+    """Return the cached (JSON-decoded) response for `cache_key`, or None on a miss or an expired entry."""
+    now = time.time()
+    try:
+        with _cache_lock:
+            conn = _connect()
+            try:
+                row = conn.execute("SELECT response, created_at FROM llm_responses WHERE cache_key = ?", (cache_key,)).fetchone()
+                if row is None:
+                    return None
+                if now - row[1] > ttl_seconds:
+                    conn.execute("DELETE FROM llm_responses WHERE cache_key = ?", (cache_key,))
+                    conn.commit()
+                    return None
+                # Mark as recently used so size eviction removes it last
+                conn.execute("UPDATE llm_responses SET last_used_at = ? WHERE cache_key = ?", (now, cache_key))
+                conn.commit()
+                return json.loads(row[0])
+            finally:
+                conn.close()
+    except (sqlite3.Error, json.JSONDecodeError) as e:
+        print(f"Response cache read failed: {e}")
+        return None
+
+
+def store_response(cache_key, kind, model, response, ttl_seconds=LLM_RESPONSE_CACHE_TTL_SECONDS, max_bytes=LLM_RESPONSE_CACHE_MAX_BYTES):
+    """Store a JSON-serializable response, then drop expired entries and least recently used ones over `max_bytes`."""
+    encoded = json.dumps(response, ensure_ascii=False)
+    now = time.time()
+    try:
+        with _cache_lock:
+            conn = _connect()
+            try:
+                conn.execute(
+                    "INSERT OR REPLACE INTO llm_responses (cache_key, kind, model, response, size_bytes, created_at, last_used_at) "
+                    "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                    (cache_key, kind, model, encoded, len(encoded.encode("utf-8")), now, now)
+                )
+                conn.execute("DELETE FROM llm_responses WHERE created_at < ?", (now - ttl_seconds,))
+                _evict_least_recently_used(conn, max_bytes)
+                conn.commit()
+            finally:
+                conn.close()
+    except sqlite3.Error as e:
+        print(f"Response cache write failed: {e}")
+
+
+def _evict_least_recently_used(conn, max_bytes):
+    total_bytes = conn.execute("SELECT COALESCE(SUM(size_bytes), 0) FROM llm_responses").fetchone()[0]
+    if total_bytes <= max_bytes:
+        return 0
+    evicted = []
+    for cache_key, size_bytes in conn.execute("SELECT cache_key, size_bytes FROM llm_responses ORDER BY last_used_at").fetchall():
+        evicted.append((cache_key,))
+        total_bytes -= size_bytes
+        if total_bytes <= max_bytes:
+            break
+    conn.executemany("DELETE FROM llm_responses WHERE cache_key = ?", evicted)
+    print(f"Evicted {len(evicted)} LLM response cache entries")
+    return len(evicted)
+
+
+def cached_response(kind, model, system_prompt, user_input, compute, bypass_cache=False, store_if=None, **params):
+    """Return the cached response for these inputs, or call `compute()` and cache its result.
+
+    With bypass_cache=True the cache is not read, but the fresh response
+    still replaces the stored one. A fresh response for which `store_if`
+    returns False is not stored.
+    """
+    cache_key = make_response_key(kind, model, system_prompt, user_input, **params)
+    if not bypass_cache:
+        cached = get_cached_response(cache_key)
+        if cached is not None:
+            print(f"Response cache hit for {kind} with {model}")
+            return cached
+    response = compute()
+    if store_if is None or store_if(response):
+        store_response(cache_key, kind, model, response)
+    return response
@@ -0,0 +1,157 @@
+# src/retry_policy.py
+# Standard library imports
+import json
+import random
+import re
+import time
+from email.utils import parsedate_to_datetime
+from datetime import datetime, timezone
+
+# Local imports
+from config import LLM_CALL_DEADLINE_SECONDS, LLM_RETRY_MAX_ATTEMPTS
+
+# Error classes returned by classify_error()
+RATE_LIMITED = "rate_limited"
+SERVER_ERROR = "server_error"
+NETWORK_ERROR = "network_error"
+MALFORMED_RESPONSE = "malformed_response"
+CLIENT_ERROR = "client_error"
+UNKNOWN_ERROR = "unknown_error"
+
+# Unknown errors (KeyError, TypeError, invalid-argument ValueErrors, ...) are
+# usually bugs or bad requests, so they fail fast instead of being retried
+RETRYABLE_ERRORS = {RATE_LIMITED, SERVER_ERROR, NETWORK_ERROR, MALFORMED_RESPONSE}
+
+# Defaults shared by the audio, text and table modules
+DEFAULT_MAX_ATTEMPTS = LLM_RETRY_MAX_ATTEMPTS
+DEFAULT_BASE_DELAY = 2.0
+DEFAULT_MAX_DELAY = 60.0
+DEFAULT_DEADLINE_SECONDS = LLM_CALL_DEADLINE_SECONDS
+# Throttled calls back off from a larger base so we stop hammering the quota
+RATE_LIMIT_BASE_DELAY = 10.0
+
+_NETWORK_ERROR_NAMES = ("Timeout", "Connection", "TransportError", "RemoteProtocolError", "ReadError", "WriteError")
+
+
+def get_status_code(exc):
+    """Extract an HTTP status code from OpenAI, google-genai or httpx exceptions, if any."""
+    for attr in ("status_code", "code", "status"):
+        value = getattr(exc, attr, None)
+        if isinstance(value, int) and 100 <= value < 600:
+            return value
+    response = getattr(exc, "response", None)
+    value = getattr(response, "status_code", None)
+    if isinstance(value, int):
+        return value
+    return None
+
+
+def get_retry_after(exc):
+    """Return the server-requested delay in seconds (Retry-After header or Gemini RetryInfo), or None."""
+    response = getattr(exc, "response", None)
+    headers = getattr(response, "headers", None) or {}
+    try:
+        retry_after_ms = headers.get("retry-after-ms")
+        if retry_after_ms:
+            return float(retry_after_ms) / 1000
+        retry_after = headers.get("retry-after")
+        if retry_after:
+            try:
+                return float(retry_after)
+            except ValueError:
+                retry_at = parsedate_to_datetime(retry_after)
+                return max(0.0, (retry_at - datetime.now(timezone.utc)).total_seconds())
+    except (AttributeError, TypeError, ValueError):
+        pass
+
+    # google-genai puts google.rpc.RetryInfo ("retryDelay": "17s") in the error details
+    details = getattr(exc, "details", None)
+    match = re.search(r'"retryDelay":\s*"(\d+(?:\.\d+)?)s"', json.dumps(details, default=str)) if details else None
+    if match:
+        return float(match.group(1))
+    return None
+
+
+def classify_error(exc):
+    """Classify an exception from an LLM call into one of the error classes above.
+
+    Only json.JSONDecodeError (raised by the parsers for unusable model
+    output) counts as a malformed response; other ValueErrors are unknown.
+    """
+    if isinstance(exc, json.JSONDecodeError):
+        return MALFORMED_RESPONSE
+
+    status = get_status_code(exc)
+    if status == 429 or "RESOURCE_EXHAUSTED" in str(exc):
+        return RATE_LIMITED
+    if status == 408:
+        return NETWORK_ERROR
+    if status is not None and status >= 500:
+        return SERVER_ERROR
+    if status is not None and 400 <= status < 500:
+        return CLIENT_ERROR
+
+    if isinstance(exc, (ConnectionError, TimeoutError)):
+        return NETWORK_ERROR
+    if any(name in cls.__name__ for cls in type(exc).__mro__ for name in _NETWORK_ERROR_NAMES):
+        return NETWORK_ERROR
+    return UNKNOWN_ERROR
+
+
+def compute_backoff(attempt, error_class, retry_after=None, base_delay=DEFAULT_BASE_DELAY, max_delay=DEFAULT_MAX_DELAY):
+    """Exponential backoff with full jitter; honours a server-provided Retry-After."""
+    if error_class == RATE_LIMITED:
+        base_delay = max(base_delay, RATE_LIMIT_BASE_DELAY)
+    delay = random.uniform(base_delay / 2, min(max_delay, base_delay * (2 ** attempt)))
+    if retry_after is not None:
+        # Wait at least as long as asked, plus a little jitter so callers don't resume in lockstep
+        delay = max(delay, retry_after + random.uniform(0, 1))
+    return delay
+
+
+def call_with_retry(fn, description="LLM call", max_attempts=DEFAULT_MAX_ATTEMPTS, base_delay=DEFAULT_BASE_DELAY,
+                    max_delay=DEFAULT_MAX_DELAY, deadline_seconds=DEFAULT_DEADLINE_SECONDS, on_retry=None, fatal_errors=()):
+    """Call `fn(attempt)` until it succeeds, retrying only transient errors.
+
+    Client errors (4xx other than 408/429) and unknown errors are raised
+    immediately. Rate limits, server, network and JSON parse errors are retried with exponential backoff and jitter, honouring
+    Retry-After. The last error is raised once `max_attempts` is used up or
+    the next wait would overrun `deadline_seconds` (measured from the first
+    attempt).
+
+    The deadline is a retry budget only: it is checked before each backoff,
+    never during an attempt, so a running attempt is bounded solely by the
+    timeout of the call inside `fn` (e.g. SUMMARY_CALL_TIMEOUT_SECONDS or the
+    client's LLM_REQUEST_TIMEOUT_SECONDS).
+
+    Args:
+        fn: Callable taking the zero-based attempt number
+        description: Label used in log messages
+        deadline_seconds: Seconds after which no further retry is started, or None for no deadline
+        on_retry: Optional callable(attempt, exc, error_class) invoked after the
+            backoff, just before `attempt` is made; exceptions it raises (e.g. a
+            job cancellation) propagate without further retries
+        fatal_errors: Exception types raised at once without being classified
+
+    Returns:
+        Whatever `fn` returns
+    """
+    deadline_at = time.monotonic() + deadline_seconds if deadline_seconds else None
+    for attempt in range(max_attempts):
+        try:
+            return fn(attempt)
+        except fatal_errors:
+            raise
+        except Exception as e:
+            last_error = e
+            error_class = classify_error(e)
+            if error_class not in RETRYABLE_ERRORS or attempt == max_attempts - 1:
+                raise
+            delay = compute_backoff(attempt, error_class, get_retry_after(e), base_delay, max_delay)
+            if deadline_at is not None and time.monotonic() + delay > deadline_at:
+                print(f"{description}: deadline reached after attempt {attempt} ({error_class}); giving up")
+                raise
+            print(f"{description} failed on attempt {attempt} ({error_class}: {e}). Retrying in {delay:.1f} seconds...")
+            time.sleep(delay)
+        if on_retry:
+            on_retry(attempt + 1, last_error, error_class)
@@ -1,12 +1,37 @@
 # src/table_generator.py
-import openai
 from config import OPENAI_API_KEY
+from src.llm_clients import get_openai_client
+from src.preflight import CHARS_PER_TOKEN
 from src.prompts import TABLES_DEFAULT_SYSTEM_PROMPT
+from src.rate_limiter import rate_limited
+from src.response_cache import cached_response
+from src.retry_policy import call_with_retry
 
-# Initialize OpenAI client
-client = openai.OpenAI(api_key=OPENAI_API_KEY)
+# Shared OpenAI client (pooled connections, retries are handled by src.retry_policy)
+client = get_openai_client(OPENAI_API_KEY)
 
-def generate_tables(system_prompt=TABLES_DEFAULT_SYSTEM_PROMPT, image_base64=None, mime_type=None, user_prompt=""):
+# Rough token cost of one diagram image, for the tokens-per-minute limit
+IMAGE_TOKENS_ESTIMATE = 1000
+
+def _estimate_tokens(messages):
+    """Approximate input tokens of a chat request (text by length, images at IMAGE_TOKENS_ESTIMATE)."""
+    tokens = 0
+    for message in messages:
+        parts = message["content"] if isinstance(message["content"], list) else [{"type": "text", "text": message["content"]}]
+        for part in parts:
+            tokens += IMAGE_TOKENS_ESTIMATE if part["type"] == "image_url" else len(part["text"]) // CHARS_PER_TOKEN
+    return tokens
+
+def _create_completion(messages):
+    # Shares the OpenAI key's request/token budget with every other session
+    with rate_limited("openai", OPENAI_API_KEY, tokens=_estimate_tokens(messages)):
+        return client.chat.completions.create(
+            model="gpt-4.1",
+            messages=messages,
+            max_tokens=2000
+        )
+
+def generate_tables(system_prompt=TABLES_DEFAULT_SYSTEM_PROMPT, image_base64=None, mime_type=None, user_prompt="", bypass_cache=False):
     full_prompt = system_prompt
     if user_prompt:
         full_prompt += f"\n\nAdditional Instructions: {user_prompt}"
@@ -19,18 +44,18 @@ def generate_tables(system_prompt=TABLES_DEFAULT_SYSTEM_PROMPT, image_base64=Non
         ]}
     ]
     
-    response = client.chat.completions.create(
-        model="gpt-4.1",
-        messages=messages,
-        max_tokens=2000
+    def generate():
+        response = call_with_retry(lambda attempt: _create_completion(messages), description="Table generation")
+        return response.choices[0].message.content
+
+    # The same diagram with the same prompts reuses the stored tables
+    content = cached_response(
+        "tables", "gpt-4.1", full_prompt, {"image_base64": image_base64, "mime_type": mime_type}, generate,
+        bypass_cache=bypass_cache, max_tokens=2000
     )
-    return response.choices[0].message.content, messages
+    return content, messages
 
 def refine_tables(messages, feedback):
     messages.append({"role": "user", "content": feedback})
-    response = client.chat.completions.create(
-        model="gpt-4.1",
-        messages=messages,
-        max_tokens=2000
-    )
+    response = call_with_retry(lambda attempt: _create_completion(messages), description="Table refinement")
     return response.choices[0].message.content, messages
\ No newline at end of file
@@ -1,15 +1,32 @@
 import io
 import os
+import queue
+import threading
+import time
 import uuid
+from concurrent.futures import ThreadPoolExecutor
 from docx import Document
 import docx2txt
 import fitz
 import pypandoc
 import streamlit as st
-import openai
-from google import genai
-from config import OPENAI_API_KEY, GEMINI_API_KEY, XAI_API_KEY
-from src.prompts import GENERAL_SUMMARY_PROMPT
+from config import (
+    OPENAI_API_KEY, GEMINI_API_KEY, XAI_API_KEY, GEMINI_CONTEXT_CACHE_MIN_TOKENS,
+    SUMMARY_MAP_CONCURRENCY, SUMMARY_MAP_REDUCE_THRESHOLD_TOKENS, SUMMARY_SECTION_TOKENS, TRANSCRIPT_COMPACTION_ENABLED,
+    SUMMARY_FALLBACK_MODEL, SUMMARY_HEDGE_PERCENTILE, SUMMARY_HEDGING_ENABLED, SUMMARY_CALL_TIMEOUT_SECONDS,
+    SUMMARY_STREAM_IDLE_TIMEOUT_SECONDS,
+)
+from src.async_llm import generate_text
+from src.gemini_context_cache import get_context_cache
+from src.llm_clients import get_client
+from src.model_router import MODEL_CAPABILITIES, fits_context, hedge_delay, record_latency
+from src.preflight import CHARS_PER_TOKEN, SUMMARY_MAX_OUTPUT_TOKENS, count_text_tokens
+from src.rate_limiter import bind_session, limiter_for
+from src.prompts import FINAL_MERGE_PREAMBLE, GENERAL_SUMMARY_PROMPT, MERGE_SECTION_NOTES_PROMPT, SECTION_SUMMARY_PROMPT
+from src.response_cache import cached_response, get_cached_response, make_response_key, store_response
+from src.retry_policy import call_with_retry
+from src.transcript_compaction import CompactTranscript, compact_transcript
+from src.transcript import TRANSCRIPT_LINE_PATTERN, Transcript, format_time, parse_time_range
 
 # Model configuration
 MODEL_CONFIG = {
@@ -47,93 +64,558 @@ MODEL_CONFIG = {
     }
 }
 
-def summarize_transcription(transcription_input, model="gemini-2.0-flash", custom_prompt=None, enable_reasoning=False):
+# Models that can return step-by-step reasoning ahead of the summary
+REASONING_MODELS = ["grok-3-mini", "gemini-2.5-pro-exp-03-25", "o4-mini"]
+
+# Map-reduce summarization: notes per section/merge are capped at this many
+# tokens, and this many note sets are merged per call
+SECTION_NOTES_MAX_OUTPUT_TOKENS = 4000
+SUMMARY_MERGE_FAN_IN = 4
+
+def format_transcription_text(transcription_input):
+    """Render a transcription (Transcript, JSON entries or already-extracted text) as the plain text sent to the model."""
+    if isinstance(transcription_input, (Transcript, list)):
+        # Transcript (or legacy JSON entries) from direct transcription
+        return Transcript.load(transcription_input).to_text()
+    elif isinstance(transcription_input, str):
+        # Already text from DOCX/PDF extraction
+        return transcription_input
+    raise ValueError("Unsupported transcription input format")
+
+def prepare_summary_input(transcription_input, compact=None, model=None):
     """
-    Generate a summary from transcription data using the specified model.
-    
-    Args:
-        transcription_input: The transcription data as JSON or plain text
-        model: The model to use for summarization (e.g., gpt-4.1, grok-3, gemini-2.5-pro)
-        custom_prompt: Optional custom system prompt for summarization
-        enable_reasoning: Whether to include step-by-step reasoning (for supported models)
-        
+    Input and text that a summary actually sends.
+
+    With compaction (default TRANSCRIPT_COMPACTION_ENABLED), filler turns are
+    dropped, same-speaker turns merged and the text rendered compactly.
+
     Returns:
-        Tuple of (summary text, reasoning text)
+        Tuple of (transcription input, text, compaction stats or None when compaction is off)
     """
-    config = MODEL_CONFIG[model]
-    full_prompt = custom_prompt if custom_prompt else GENERAL_SUMMARY_PROMPT
-    
-    # Add reasoning instruction for supported models
-    if enable_reasoning and model in ["grok-3-mini", "gemini-2.5-pro-exp-03-25", "o4-mini"]:
-        full_prompt += "\n\nProvide a step-by-step reasoning process before generating the final summary."
+    transcription_text = format_transcription_text(transcription_input)
+    if compact is None:
+        compact = TRANSCRIPT_COMPACTION_ENABLED
+    if not compact:
+        return transcription_input, transcription_text, None
+    return compact_transcript(transcription_input, transcription_text, model=model)
+
+def _approx_tokens(system_prompt, user_text):
+    """Cheap input size for latency tracking (uploaded files count as empty)."""
+    return (len(system_prompt) + (len(user_text) if isinstance(user_text, str) else 0)) // CHARS_PER_TOKEN
+
+def _hedge_fallback(model, user_text, hedge=None):
+    """Model to hedge a request to `model` with, or None when hedging is off or cannot apply.
+
+    Only text prompts are hedged (an uploaded Gemini file cannot be sent to
+    another provider), and only to a fallback whose context fits the input.
+    """
+    if hedge is None:
+        hedge = SUMMARY_HEDGING_ENABLED
+    fallback = SUMMARY_FALLBACK_MODEL
+    if not hedge or not isinstance(user_text, str) or fallback == model or fallback not in MODEL_CONFIG:
+        return None
+    if fallback in MODEL_CAPABILITIES and not fits_context(fallback, len(user_text) // CHARS_PER_TOKEN):
+        return None
+    return fallback
+
+def _generate_text(model, system_prompt, user_text, max_output_tokens=SUMMARY_MAX_OUTPUT_TOKENS, cached_context=None, hedge=None):
+    """Send one system + user prompt to `model`, retrying transient failures.
+
+    For Gemini, `cached_context` names a context cache that already holds
+    the user content; only the system prompt is sent alongside it. Each
+    attempt times out after SUMMARY_CALL_TIMEOUT_SECONDS. With `hedge`
+    (None uses SUMMARY_HEDGING_ENABLED), a request still unanswered at the
+    model's SUMMARY_HEDGE_PERCENTILE latency is also sent to
+    SUMMARY_FALLBACK_MODEL, and the first answer wins.
+
+    Returns:
+        Tuple of (response text, model that answered); callers must not cache
+        an answer from the fallback under `model`
+    """
+    input_tokens = _approx_tokens(system_prompt, user_text)
+    fallback_model = _hedge_fallback(model, user_text, hedge)
+    hedge_after = hedge_delay(model, input_tokens, SUMMARY_HEDGE_PERCENTILE) if fallback_model else None
+    if hedge_after is None:
+        fallback_model = None
 
-    # Handle different input types
-    if isinstance(transcription_input, list):
-        # JSON format from direct transcription
-        transcription_text = "\n".join(
-            f"[{entry['timestamp']}] {entry['speaker']}: {entry['text']}"
-            for entry in transcription_input
+    def request(attempt):
+        # Async clients are shared per provider/endpoint/key so connections are reused across calls
+        return generate_text(
+            MODEL_CONFIG, model, system_prompt, user_text, max_output_tokens, input_tokens,
+            cached_context=cached_context, fallback_model=fallback_model, hedge_after=hedge_after
         )
-    elif isinstance(transcription_input, str):
-        # Already text from DOCX/PDF extraction
-        transcription_text = transcription_input
-    else:
-        raise ValueError("Unsupported transcription input format")
 
-    try:
-        if config["client_type"] == "openai" and model == "o4-mini":
-            # Initialize OpenAI client
-            client = openai.OpenAI(
-                api_key=config["api_key"],
-                base_url=config["base_url"]
-            )
-            response = client.chat.completions.create(
-                model=model,
-                messages=[
-                    {"role": "system", "content": full_prompt},
-                    {"role": "user", "content": transcription_text}
-                ],
-                max_completion_tokens=20000
-                )
-            content = response.choices[0].message.content
-        elif config["client_type"] == "openai":
-            # Initialize OpenAI client for o4-mini
-            client = openai.OpenAI(
-                api_key=config["api_key"],
-                base_url=config["base_url"]
-            )
+    # Transient failures (rate limits, 5xx, network, timeouts) are retried with backoff
+    return call_with_retry(request, description=f"Summary with {model}")
+
+_STREAM_END = object()
+
+def _timed_pieces(pieces, description, idle_timeout, deadline_at, close=None):
+    """Yield from a blocking stream read in a worker thread, bounding the wait for each piece.
+
+    Raises TimeoutError when no piece arrives within `idle_timeout` seconds or
+    the stream runs past `deadline_at` (time.monotonic()); `close` is then
+    called to drop the connection.
+    """
+    buffer = queue.Queue()
+
+    def read():
+        try:
+            for piece in pieces:
+                buffer.put((piece, None))
+            buffer.put((_STREAM_END, None))
+        except Exception as e:
+            buffer.put((None, e))
+
+    threading.Thread(target=read, name="summary-stream", daemon=True).start()
+    while True:
+        wait = min(idle_timeout, deadline_at - time.monotonic())
+        try:
+            piece, error = buffer.get(timeout=max(0.0, wait))
+        except queue.Empty:
+            if close:
+                try:
+                    close()
+                except Exception:
+                    pass
+            raise TimeoutError(f"{description} stalled: no response text for {wait:.0f}s")
+        if error is not None:
+            raise error
+        if piece is _STREAM_END:
+            return
+        yield piece
+
+def _stream_text(model, system_prompt, user_text, max_output_tokens=SUMMARY_MAX_OUTPUT_TOKENS, cached_context=None):
+    """Like _generate_text, but yield the response text piece by piece as the model produces it.
+
+    Opening the stream (up to the first piece) is retried like _generate_text;
+    a failure after text has been yielded is raised as is. Each attempt is
+    bounded like _generate_text's: the stream is abandoned with TimeoutError
+    when it runs past SUMMARY_CALL_TIMEOUT_SECONDS or no text arrives for
+    SUMMARY_STREAM_IDLE_TIMEOUT_SECONDS. A rate-limit slot is held until the
+    stream ends.
+    """
+    config = MODEL_CONFIG[model]
+    input_tokens = _approx_tokens(system_prompt, user_text)
+    limiter = limiter_for(config["client_type"], config["api_key"], config.get("base_url"))
+
+    started_at = []
+
+    def open_stream(attempt):
+        client = get_client(config["client_type"], config["api_key"], config.get("base_url"))
+        limiter.acquire(input_tokens)
+        try:
+            started_at[:] = [time.monotonic()]
+            return start_stream(client)
+        except BaseException:
+            limiter.release()
+            raise
+
+    def start_stream(client):
+        if config["client_type"] == "openai":
+            token_limit = {"max_completion_tokens": max_output_tokens} if model == "o4-mini" else {"max_tokens": max_output_tokens}
             response = client.chat.completions.create(
                 model=model,
                 messages=[
-                    {"role": "system", "content": full_prompt},
-                    {"role": "user", "content": transcription_text}
+                    {"role": "system", "content": system_prompt},
+                    {"role": "user", "content": user_text}
                 ],
-                max_tokens=20000
+                stream=True,
+                timeout=SUMMARY_CALL_TIMEOUT_SECONDS,
+                **token_limit
             )
-            content = response.choices[0].message.content
-        else:  # Gemini
-            # Initialize Gemini client
-            client = genai.Client(api_key=config["api_key"])
-            response = client.models.generate_content(
+            pieces = (chunk.choices[0].delta.content for chunk in response if chunk.choices and chunk.choices[0].delta.content)
+        else:  # Gemini; with a context cache the transcript is already on the server
+            http_options = {"timeout": int(SUMMARY_CALL_TIMEOUT_SECONDS * 1000)}
+            response = client.models.generate_content_stream(
                 model=model,
-                contents=[full_prompt, transcription_text]
+                contents=[system_prompt] if cached_context else [system_prompt, user_text],
+                config={"cached_content": cached_context, "http_options": http_options} if cached_context else {"http_options": http_options}
             )
-            content = response.text
+            pieces = (chunk.text for chunk in response if chunk.text)
+        pieces = _timed_pieces(
+            pieces, f"Streaming summary with {model}", SUMMARY_STREAM_IDLE_TIMEOUT_SECONDS,
+            time.monotonic() + SUMMARY_CALL_TIMEOUT_SECONDS, close=getattr(response, "close", None)
+        )
+        # Pull the first piece here so rate-limit, server, network and timeout errors are retried
+        return next(pieces, ""), pieces
+
+    first_piece, pieces = call_with_retry(open_stream, description=f"Streaming summary with {model}")
+    try:
+        if first_piece:
+            yield first_piece
+        yield from pieces
+    finally:
+        limiter.release()
+    # Timed from the attempt that succeeded, so retry backoff is not counted as model latency
+    record_latency(model, input_tokens, time.monotonic() - started_at[0])
+
+def _split_reasoning(content, model, enable_reasoning):
+    """Split a response into (summary, reasoning) when reasoning was requested."""
+    reasoning = ""
+    if enable_reasoning and model in REASONING_MODELS:
+        # Assume reasoning is before a separator or the summary
+        parts = content.split("\n\n---\n\n", 1)  # Adjust based on API response format
+        reasoning = parts[0].strip() if len(parts) > 1 else ""
+        content = parts[-1].strip() if len(parts) > 1 else content
+    return content, reasoning
+
+def _final_prompt(custom_prompt, model, enable_reasoning):
+    full_prompt = custom_prompt if custom_prompt else GENERAL_SUMMARY_PROMPT
+    # Add reasoning instruction for supported models
+    if enable_reasoning and model in REASONING_MODELS:
+        full_prompt += "\n\nProvide a step-by-step reasoning process before generating the final summary."
+    return full_prompt
+
+class SummaryStream:
+    """Summary text pieces in arrival order, e.g. for st.write_stream.
+
+    Once iteration finishes, `result` holds the same (summary, reasoning)
+    tuple summarize_transcription returns without streaming.
+    """
+
+    def __init__(self, pieces, model, enable_reasoning, on_complete=None):
+        self._pieces = pieces
+        self._model = model
+        self._enable_reasoning = enable_reasoning
+        self._on_complete = on_complete
+        self.result = None
+
+    @classmethod
+    def from_result(cls, summary, reasoning, model, enable_reasoning):
+        """Replay a finished (e.g. cached) summary as a single piece."""
+        content = f"{reasoning}\n\n---\n\n{summary}" if reasoning else summary
+        return cls(iter([content]), model, enable_reasoning)
 
-        # Extract reasoning if enabled
-        reasoning = ""
-        if enable_reasoning and model in ["grok-3-mini", "gemini-2.5-pro-exp-03-25", "o4-mini"]:
-            # Assume reasoning is before a separator or the summary
-            parts = content.split("\n\n---\n\n", 1)  # Adjust based on API response format
-            reasoning = parts[0].strip() if len(parts) > 1 else ""
-            content = parts[-1].strip() if len(parts) > 1 else content
+    def __iter__(self):
+        parts = []
+        try:
+            for piece in self._pieces:
+                parts.append(piece)
+                yield piece
+        except Exception as e:
+            raise Exception(f"Error generating summary with {self._model}: {str(e)}")
+        self.result = _split_reasoning("".join(parts), self._model, self._enable_reasoning)
+        if self._on_complete:
+            self._on_complete(self.result)
 
-        return content, reasoning
+def _transcript_context(model, transcription_text, session_id, content=None, create=False):
+    """Gemini context-cache handle holding the transcript (or `content`, e.g. its uploaded file), or None to send it inline.
 
+    Only Gemini models with a session to own the handle use it, and only for
+    transcripts of at least GEMINI_CONTEXT_CACHE_MIN_TOKENS tokens. A new
+    handle is only created with `create`, when several calls will share it;
+    otherwise an existing one is reused.
+    """
+    if not session_id or MODEL_CONFIG[model]["client_type"] != "gemini":
+        return None
+    if count_text_tokens(transcription_text, model) < GEMINI_CONTEXT_CACHE_MIN_TOKENS:
+        return None
+    return get_context_cache(model, [content if content is not None else transcription_text], session_id, create=create)
+
+def summarize_transcription(transcription_input, model="gemini-2.0-flash", custom_prompt=None, enable_reasoning=False, map_reduce=None,
+                            bypass_cache=False, stream=False, session_id=None, compact=None, hedge=None):
+    """
+    Generate a summary from transcription data using the specified model.
+    
+    Args:
+        transcription_input: The transcription as a Transcript, JSON entries or plain text
+        model: The model to use for summarization (e.g., gpt-4.1, grok-3, gemini-2.5-pro)
+        custom_prompt: Optional custom system prompt for summarization
+        enable_reasoning: Whether to include step-by-step reasoning (for supported models)
+        map_reduce: True/False to force or disable map-reduce summarization; None
+            uses it when the transcript is over SUMMARY_MAP_REDUCE_THRESHOLD_TOKENS
+        bypass_cache: Skip the response cache lookup and always call the model
+        stream: Return a SummaryStream that yields the text as it is generated
+            (for map-reduce, the sections are summarized first and the final merge is streamed)
+        session_id: Session that owns a Gemini context cache of the transcript, so
+            regenerating (other template, reasoning on/off) reuses the cached input
+        compact: Compact the transcript first (see prepare_summary_input); None uses
+            TRANSCRIPT_COMPACTION_ENABLED
+        hedge: Also ask SUMMARY_FALLBACK_MODEL when the model is slow (see _generate_text);
+            None uses SUMMARY_HEDGING_ENABLED. A hedged stream arrives as one piece
+        
+    Returns:
+        Tuple of (summary text, reasoning text), or a SummaryStream if `stream` is set
+    """
+    transcription_input, transcription_text, _ = prepare_summary_input(transcription_input, compact, model)
+    if map_reduce is None:
+        map_reduce = count_text_tokens(transcription_text, model) > SUMMARY_MAP_REDUCE_THRESHOLD_TOKENS
+    full_prompt = _final_prompt(custom_prompt, model, enable_reasoning)
+    if stream:
+        return _summary_stream(transcription_input, transcription_text, model, custom_prompt, enable_reasoning, map_reduce, bypass_cache, session_id,
+                               hedge)
+
+    answered_by = []
+
+    def generate():
+        if map_reduce:
+            summary, reasoning, model_used = _map_reduce_summary(transcription_input, model, custom_prompt, enable_reasoning, hedge=hedge)
+            answered_by.append(model_used)
+            return summary, reasoning
+        try:
+            cached_context = _transcript_context(model, transcription_text, session_id)
+            content, model_used = _generate_text(model, full_prompt, transcription_text, cached_context=cached_context, hedge=hedge)
+            answered_by.append(model_used)
+            return _split_reasoning(content, model, enable_reasoning)
+        except Exception as e:
+            raise Exception(f"Error generating summary with {model}: {str(e)}")
+
+    # Identical transcript, prompt, model and settings reuse the stored summary; a hedge fallback's answer is not stored under `model`
+    summary, reasoning = cached_response(
+        "summary", model, full_prompt, transcription_text, generate, bypass_cache=bypass_cache,
+        store_if=lambda _: answered_by == [model], enable_reasoning=enable_reasoning, map_reduce=map_reduce
+    )
+    return summary, reasoning
+
+def _summary_stream(transcription_input, transcription_text, model, custom_prompt, enable_reasoning, map_reduce, bypass_cache, session_id,
+                    hedge=None):
+    """Streaming counterpart of summarize_transcription, sharing its response cache entries."""
+    full_prompt = _final_prompt(custom_prompt, model, enable_reasoning)
+    cache_key = make_response_key("summary", model, full_prompt, transcription_text, enable_reasoning=enable_reasoning, map_reduce=map_reduce)
+    cached = None if bypass_cache else get_cached_response(cache_key)
+    if cached is not None:
+        print(f"Response cache hit for summary with {model}")
+        return SummaryStream.from_result(cached[0], cached[1], model, enable_reasoning)
+
+    answered_by = {model}
+
+    def pieces():
+        final_notes, notes_model = _reduce_section_notes(transcription_input, model, custom_prompt, hedge=hedge) if map_reduce else (None, model)
+        answered_by.add(notes_model)
+        system_prompt, user_text = (full_prompt, transcription_text) if final_notes is None else (FINAL_MERGE_PREAMBLE + full_prompt, final_notes)
+        cached_context = _transcript_context(model, transcription_text, session_id) if final_notes is None else None
+        if _hedge_fallback(model, user_text, hedge):
+            # Racing two models needs complete responses, so a hedged summary is not streamed
+            content, model_used = _generate_text(model, system_prompt, user_text, cached_context=cached_context, hedge=hedge)
+            answered_by.add(model_used)
+            yield content
+        else:
+            yield from _stream_text(model, system_prompt, user_text, cached_context=cached_context)
+
+    def on_complete(result):
+        # A hedge fallback's answer is not stored under `model`
+        if answered_by == {model}:
+            store_response(cache_key, "summary", model, result)
+
+    return SummaryStream(pieces(), model, enable_reasoning, on_complete=on_complete)
+
+def _transcript_turns(transcription_input):
+    """Break a transcription into (speaker, start seconds or None, line) turns for sectioning.
+
+    Returns:
+        Tuple of (header line every section repeats, e.g. a compact transcript's speaker legend, or None; turns)
+    """
+    if isinstance(transcription_input, CompactTranscript):
+        # Keep the anchors and S1.. aliases the whole-transcript summary would see
+        legend, _, turns = transcription_input.compact_lines()
+        return legend, turns
+    if isinstance(transcription_input, (Transcript, list)):
+        transcript = Transcript.load(transcription_input)
+        return None, [
+            (transcript.speaker(idx), transcript.start(idx), f"[{transcript.timestamp(idx)}] {transcript.speaker(idx)}: {transcript.text(idx)}")
+            for idx in range(len(transcript))
+        ]
+    turns = []
+    for line in format_transcription_text(transcription_input).splitlines():
+        if not line.strip():
+            continue
+        # Exported transcripts use "[MM:SS - MM:SS] Speaker: text" lines
+        match = TRANSCRIPT_LINE_PATTERN.match(line)
+        if match:
+            turns.append((match.group("speaker"), parse_time_range(match.group("timestamp"))[0], line))
+        else:
+            turns.append((None, None, line))
+    return None, turns
+
+def split_transcript_sections(transcription_input, max_section_tokens=SUMMARY_SECTION_TOKENS, model=None):
+    """Split a transcription into sections of at most about `max_section_tokens` tokens.
+
+    Sections end on speaker-turn boundaries: once a section is three quarters
+    full it is closed at the next change of speaker, and it is only cut
+    mid-speaker when it would otherwise overflow. A compacted transcript's
+    speaker legend is repeated at the top of every section.
+
+    Returns:
+        List of dicts with text and time_range (e.g. "12:00 - 24:30", or "" if unknown)
+    """
+    header, turns = _transcript_turns(transcription_input)
+    header_tokens = count_text_tokens(header, model) if header else 0
+    sections = []
+    lines, tokens, speaker, start = [], header_tokens, None, None
+
+    def close_section(end):
+        if lines:
+            time_range = f"{format_time(start)} - {format_time(end)}" if start is not None and end is not None else ""
+            sections.append({"text": "\n".join(([header] if header else []) + lines), "time_range": time_range})
+
+    last_start = None
+    for turn_speaker, turn_start, line in turns:
+        line_tokens = count_text_tokens(line, model)
+        speaker_changed = turn_speaker != speaker
+        if lines and (tokens + line_tokens > max_section_tokens or (speaker_changed and tokens >= max_section_tokens * 3 // 4)):
+            close_section(turn_start if turn_start is not None else last_start)
+            lines, tokens, start = [], header_tokens, None
+        if start is None:
+            start = turn_start
+        lines.append(line)
+        tokens += line_tokens
+        speaker = turn_speaker
+        last_start = turn_start if turn_start is not None else last_start
+    close_section(last_start)
+    return sections
+
+def summarize_transcription_map_reduce(transcription_input, model="gemini-2.0-flash", custom_prompt=None, enable_reasoning=False,
+                                       max_section_tokens=SUMMARY_SECTION_TOKENS, fan_in=SUMMARY_MERGE_FAN_IN, max_workers=SUMMARY_MAP_CONCURRENCY,
+                                       hedge=None):
+    """
+    Summarize a long transcription hierarchically.
+
+    The transcript is split into sections on speaker-turn boundaries, each
+    section is summarized into notes in parallel (map), and the notes are
+    merged `fan_in` at a time, in parallel, until few enough remain for the
+    final summary (reduce). Wall time grows with the number of merge levels
+    (log of the section count), not with the transcript length.
+
+    Returns:
+        Tuple of (summary text, reasoning text)
+    """
+    summary, reasoning, _ = _map_reduce_summary(transcription_input, model, custom_prompt, enable_reasoning, max_section_tokens, fan_in,
+                                                max_workers, hedge)
+    return summary, reasoning
+
+def _map_reduce_summary(transcription_input, model, custom_prompt=None, enable_reasoning=False, max_section_tokens=SUMMARY_SECTION_TOKENS,
+                        fan_in=SUMMARY_MERGE_FAN_IN, max_workers=SUMMARY_MAP_CONCURRENCY, hedge=None):
+    """summarize_transcription_map_reduce, also returning the model that answered (the hedge fallback if it answered any call)."""
+    try:
+        final_notes, answered_by = _reduce_section_notes(transcription_input, model, custom_prompt, max_section_tokens, fan_in, max_workers, hedge)
+        if final_notes is None:
+            # A single section: summarize it directly
+            full_prompt, transcription_text = _final_prompt(custom_prompt, model, enable_reasoning), format_transcription_text(transcription_input)
+        else:
+            full_prompt, transcription_text = FINAL_MERGE_PREAMBLE + _final_prompt(custom_prompt, model, enable_reasoning), final_notes
+        content, model_used = _generate_text(model, full_prompt, transcription_text, hedge=hedge)
+        return (*_split_reasoning(content, model, enable_reasoning), answered_by if answered_by != model else model_used)
     except Exception as e:
-        raise Exception(f"Error generating summary with {model}: {str(e)}")
+        raise Exception(f"Error generating map-reduce summary with {model}: {str(e)}")
+
+def _reduce_section_notes(transcription_input, model, custom_prompt=None, max_section_tokens=SUMMARY_SECTION_TOKENS,
+                          fan_in=SUMMARY_MERGE_FAN_IN, max_workers=SUMMARY_MAP_CONCURRENCY, hedge=None):
+    """Run the map and intermediate merge levels of map-reduce summarization.
+
+    Returns:
+        Tuple of (note sets for the final merge as one text, or None when the
+        transcript fits in a single section; model that answered, which is the
+        hedge fallback if it answered any section or merge)
+    """
+    final_instructions = custom_prompt if custom_prompt else GENERAL_SUMMARY_PROMPT
+    sections = split_transcript_sections(transcription_input, max_section_tokens, model)
+    if len(sections) <= 1:
+        return None, model
+
+    with ThreadPoolExecutor(max_workers=max(1, max_workers)) as executor:
+        # Worker threads queue under the caller's session for the rate limiter
+        answers = list(executor.map(
+            bind_session(lambda numbered: _generate_text(
+                model,
+                SECTION_SUMMARY_PROMPT.format(
+                    section_number=numbered[0] + 1, section_count=len(sections),
+                    time_range=numbered[1]["time_range"] or "time range unknown",
+                    final_instructions=final_instructions
+                ),
+                numbered[1]["text"],
+                max_output_tokens=SECTION_NOTES_MAX_OUTPUT_TOKENS,
+                hedge=hedge
+            )),
+            enumerate(sections)
+        ))
+        notes = [note for note, _ in answers]
+        print(f"Summarized {len(sections)} transcript sections with {model}")
+
+        merge_prompt = MERGE_SECTION_NOTES_PROMPT.format(final_instructions=final_instructions)
+        merge_level = 0
+        while len(notes) > fan_in:
+            groups = [notes[idx:idx + fan_in] for idx in range(0, len(notes), fan_in)]
+            answers += list(executor.map(
+                bind_session(lambda group: _generate_text(model, merge_prompt, "\n\n".join(group), max_output_tokens=SECTION_NOTES_MAX_OUTPUT_TOKENS,
+                                                          hedge=hedge)),
+                groups
+            ))
+            notes = [note for note, _ in answers[-len(groups):]]
+            merge_level += 1
+            print(f"Merge level {merge_level}: {len(groups)} merged note sets")
+
+    answered_by = next((model_used for _, model_used in answers if model_used != model), model)
+    return "\n\n".join(f"--- Part {idx + 1} of {len(notes)} ---\n{note}" for idx, note in enumerate(notes)), answered_by
+
+def summarize_with_templates(transcription_input, templates, model="gemini-2.0-flash", enable_reasoning=False, map_reduce=None,
+                             session_id=None, bypass_cache=False, compact=None, hedge=None):
+    """
+    Summarize one transcription with several prompt templates concurrently.
+
+    Every template is requested at the same time, so the total wait is about
+    the slowest single summary. For single-pass Gemini summaries with a
+    `session_id`, the transcript is put in a context cache and each request
+    refers to it instead of re-sending the text; a transcript too short to
+    cache is sent inline. Results share the response cache with
+    summarize_transcription.
+
+    Args:
+        transcription_input: The transcription as a Transcript, JSON entries or plain text
+        templates: Dict of template name -> custom prompt
+        model, enable_reasoning, map_reduce, bypass_cache, compact, hedge: As for summarize_transcription
+        session_id: Session that owns the transcript's context cache (Gemini only)
+
+    Returns:
+        Dict of template name -> (summary text, reasoning text), in the order of `templates`
+    """
+    transcription_input, transcription_text, _ = prepare_summary_input(transcription_input, compact, model)
+    if map_reduce is None:
+        map_reduce = count_text_tokens(transcription_text, model) > SUMMARY_MAP_REDUCE_THRESHOLD_TOKENS
+
+    shared_context = None
+    if MODEL_CONFIG[model]["client_type"] == "gemini" and not map_reduce and session_id and len(templates) > 1:
+        # Too short to cache (or caching unavailable): each template sends the text inline.
+        # An uploaded file would not help, as its tokens are billed on every call too.
+        shared_context = _transcript_context(model, transcription_text, session_id, create=True)
+
+    def summarize(custom_prompt):
+        if shared_context is None:
+            return summarize_transcription(
+                transcription_input, model, custom_prompt, enable_reasoning, map_reduce=map_reduce, bypass_cache=bypass_cache,
+                session_id=session_id, compact=False, hedge=hedge
+            )
+        full_prompt = _final_prompt(custom_prompt, model, enable_reasoning)
+
+        answered_by = []
+
+        def generate():
+            try:
+                content, model_used = _generate_text(model, full_prompt, transcription_text, cached_context=shared_context, hedge=hedge)
+                answered_by.append(model_used)
+                return _split_reasoning(content, model, enable_reasoning)
+            except Exception as e:
+                raise Exception(f"Error generating summary with {model}: {str(e)}")
+
+        summary, reasoning = cached_response(
+            "summary", model, full_prompt, transcription_text, generate, bypass_cache=bypass_cache,
+            store_if=lambda _: answered_by == [model], enable_reasoning=enable_reasoning, map_reduce=map_reduce
+        )
+        return summary, reasoning
+
+    with ThreadPoolExecutor(max_workers=max(1, len(templates))) as executor:
+        futures = {name: executor.submit(bind_session(summarize, session_id), custom_prompt) for name, custom_prompt in templates.items()}
+        results = {name: future.result() for name, future in futures.items()}
+    print(f"Generated {len(results)} template summaries with {model}")
+    return results
+
+def combine_template_summaries(results):
+    """Join per-template (summary, reasoning) results into one summary and one reasoning document, a section per template."""
+    summary = "\n\n".join(f"## {name}\n\n{result[0]}" for name, result in results.items())
+    reasoning = "\n\n".join(f"## {name}\n\n{result[1]}" for name, result in results.items() if result[1])
+    return summary, reasoning
 
-def export_transcription_to_docx(transcription_json, output_folder="transcripts", file_name="transcript.docx"):
+def export_transcription_to_docx(transcript, output_folder="transcripts", file_name="transcript.docx"):
     if not os.path.exists(output_folder):
         os.makedirs(output_folder)
     output_path = os.path.join(output_folder, file_name)
@@ -143,8 +625,9 @@ def export_transcription_to_docx(transcription_json, output_folder="transcripts"
         output_path = os.path.join(output_folder, file_name)
     doc = Document()
     doc.add_heading("Meeting Transcription", level=1)
-    for entry in transcription_json:
-        doc.add_paragraph(f"[{entry['timestamp']}] {entry['speaker']}: {entry['text']}")
+    transcript = Transcript.load(transcript)
+    for idx in range(len(transcript)):
+        doc.add_paragraph(f"[{transcript.timestamp(idx)}] {transcript.speaker(idx)}: {transcript.text(idx)}")
     doc.save(output_path)
     return output_path
 
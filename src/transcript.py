@@ -0,0 +1,240 @@
+# src/transcript.py
+# Standard library imports
+import base64
+import re
+import sys
+from array import array
+from bisect import bisect_right
+
+# Bump when the to_dict() layout changes
+TRANSCRIPT_FORMAT_VERSION = 1
+
+# Exported transcripts use "[MM:SS - MM:SS] Speaker: text" lines
+TRANSCRIPT_LINE_PATTERN = re.compile(r"^\[(?P<timestamp>[\d:]+(?: - [\d:]+)?)\]\s*(?P<speaker>[^:]+):")
+
+
+def parse_timestamp_to_seconds(timestamp):
+    """Convert MM:SS or HH:MM:SS format to start seconds."""
+    try:
+        parts = timestamp.split(":")
+        if len(parts) == 3:
+            hours, minutes, seconds = map(int, parts)
+            return hours * 3600 + minutes * 60 + seconds
+        elif len(parts) == 2:
+            minutes, seconds = map(int, parts)
+            return minutes * 60 + seconds
+        else:
+            return 0
+    except:
+        return 0
+
+
+def parse_time_range(timestamp):
+    """Convert a "start - end" timestamp to (start, end) seconds; a bare time gives start == end."""
+    start, _, end = timestamp.partition(" - ")
+    start_sec = parse_timestamp_to_seconds(start.strip())
+    return start_sec, parse_timestamp_to_seconds(end.strip()) if end else start_sec
+
+
+def format_time(seconds):
+    """Convert seconds to MM:SS format, or HH:MM:SS from one hour on."""
+    seconds = int(seconds)
+    hours, remainder = divmod(seconds, 3600)
+    minutes, secs = divmod(remainder, 60)
+    if hours:
+        return f"{hours:02d}:{minutes:02d}:{secs:02d}"
+    return f"{minutes:02d}:{secs:02d}"
+
+
+def _encode_array(values):
+    return base64.b64encode(values.tobytes()).decode("ascii")
+
+
+def _decode_array(encoded, byteorder):
+    values = array("i")
+    values.frombytes(base64.b64decode(encoded))
+    if byteorder != sys.byteorder:
+        values.byteswap()
+    return values
+
+
+class Transcript:
+    """Compact store of transcript segments.
+
+    Start and end seconds live in integer arrays, speakers are interned to
+    small integer ids and texts are kept in a de-duplicated string pool, so a
+    transcript is parsed once and then looked up, sliced and serialized
+    without re-parsing timestamp strings. Iterating (or indexing) yields the
+    familiar {"timestamp", "speaker", "text"} dicts for display code.
+    """
+
+    __slots__ = ("_starts", "_ends", "_speaker_ids", "_text_ids", "_speakers", "_speaker_index", "_texts", "_text_index", "_sorted")
+
+    def __init__(self):
+        self._starts = array("i")
+        self._ends = array("i")
+        self._speaker_ids = array("i")
+        self._text_ids = array("i")
+        self._speakers = []
+        self._speaker_index = {}
+        self._texts = []
+        self._text_index = {}
+        self._sorted = True
+
+    @classmethod
+    def from_entries(cls, entries):
+        """Build a transcript from {"timestamp", "speaker", "text"} dicts, parsing each timestamp once."""
+        transcript = cls()
+        for entry in entries:
+            start, end = parse_time_range(entry.get("timestamp", ""))
+            transcript.append(start, end, entry.get("speaker", "Unknown Speaker"), entry.get("text", "[Transcription Missing]"))
+        return transcript
+
+    @classmethod
+    def from_text(cls, text):
+        """Parse exported "[MM:SS - MM:SS] Speaker: text" lines (e.g. text extracted from a transcript DOCX).
+
+        Lines before the first segment (headings) are skipped; other lines
+        that do not start a segment are continuations of the previous one.
+        """
+        entries = []
+        for line in text.splitlines():
+            line = line.strip()
+            if not line:
+                continue
+            match = TRANSCRIPT_LINE_PATTERN.match(line)
+            if match:
+                start, end = parse_time_range(match.group("timestamp"))
+                entries.append([start, end, match.group("speaker").strip(), line[match.end():].strip()])
+            elif entries:
+                entries[-1][3] = f"{entries[-1][3]} {line}".strip()
+        transcript = cls()
+        for start, end, speaker, segment_text in entries:
+            transcript.append(start, end, speaker, segment_text)
+        return transcript
+
+    @classmethod
+    def from_dict(cls, data):
+        """Inverse of to_dict()."""
+        transcript = cls()
+        byteorder = data.get("byteorder", sys.byteorder)
+        transcript._starts = _decode_array(data["starts"], byteorder)
+        transcript._ends = _decode_array(data["ends"], byteorder)
+        transcript._speaker_ids = _decode_array(data["speaker_ids"], byteorder)
+        transcript._text_ids = _decode_array(data["text_ids"], byteorder)
+        transcript._speakers = list(data["speakers"])
+        transcript._speaker_index = {speaker: idx for idx, speaker in enumerate(transcript._speakers)}
+        transcript._texts = list(data["texts"])
+        transcript._text_index = {text: idx for idx, text in enumerate(transcript._texts)}
+        transcript._sorted = all(a <= b for a, b in zip(transcript._starts, transcript._starts[1:]))
+        return transcript
+
+    @classmethod
+    def load(cls, data):
+        """Accept either a to_dict() payload or a legacy list of entry dicts."""
+        if isinstance(data, cls):
+            return data
+        if isinstance(data, dict):
+            return cls.from_dict(data)
+        return cls.from_entries(data)
+
+    def to_dict(self):
+        """JSON-serializable form: base64-encoded arrays plus the speaker and text pools."""
+        return {
+            "version": TRANSCRIPT_FORMAT_VERSION,
+            "byteorder": sys.byteorder,
+            "starts": _encode_array(self._starts),
+            "ends": _encode_array(self._ends),
+            "speaker_ids": _encode_array(self._speaker_ids),
+            "text_ids": _encode_array(self._text_ids),
+            "speakers": self._speakers,
+            "texts": self._texts
+        }
+
+    def to_entries(self):
+        """List of {"timestamp", "speaker", "text"} dicts."""
+        return list(self)
+
+    def append(self, start, end, speaker, text):
+        """Add a segment; start/end are whole seconds."""
+        if self._starts and start < self._starts[-1]:
+            self._sorted = False
+        speaker_id = self._speaker_index.get(speaker)
+        if speaker_id is None:
+            speaker_id = self._speaker_index[speaker] = len(self._speakers)
+            self._speakers.append(speaker)
+        text_id = self._text_index.get(text)
+        if text_id is None:
+            text_id = self._text_index[text] = len(self._texts)
+            self._texts.append(text)
+        self._starts.append(int(start))
+        self._ends.append(int(end))
+        self._speaker_ids.append(speaker_id)
+        self._text_ids.append(text_id)
+
+    def extend(self, other, indices=None):
+        """Append the segments of another transcript (only `indices` of it, if given)."""
+        for idx in range(len(other)) if indices is None else indices:
+            self.append(other._starts[idx], other._ends[idx], other.speaker(idx), other.text(idx))
+
+    def select(self, indices):
+        """New transcript holding only the segments at `indices`, in that order."""
+        selected = Transcript()
+        selected.extend(self, indices)
+        return selected
+
+    def __len__(self):
+        return len(self._starts)
+
+    def __bool__(self):
+        return len(self._starts) > 0
+
+    def __getitem__(self, idx):
+        if idx < 0:
+            idx += len(self)
+        if not 0 <= idx < len(self):
+            raise IndexError("transcript index out of range")
+        return {"timestamp": self.timestamp(idx), "speaker": self.speaker(idx), "text": self.text(idx)}
+
+    def __iter__(self):
+        for idx in range(len(self)):
+            yield self[idx]
+
+    def start(self, idx):
+        return self._starts[idx]
+
+    def end(self, idx):
+        return self._ends[idx]
+
+    def speaker(self, idx):
+        return self._speakers[self._speaker_ids[idx]]
+
+    def text(self, idx):
+        return self._texts[self._text_ids[idx]]
+
+    def timestamp(self, idx):
+        return f"{format_time(self._starts[idx])} - {format_time(self._ends[idx])}"
+
+    @property
+    def speakers(self):
+        """Distinct speakers in order of first appearance."""
+        return list(self._speakers)
+
+    def index_at(self, seconds):
+        """Index of the last segment starting at or before `seconds` (O(log n)), or -1 if none."""
+        if self._sorted:
+            return bisect_right(self._starts, seconds) - 1
+        best = -1
+        for idx, start in enumerate(self._starts):
+            if start <= seconds and (best == -1 or start >= self._starts[best]):
+                best = idx
+        return best
+
+    def segment_at(self, seconds):
+        """The segment being spoken at `seconds`, or None."""
+        idx = self.index_at(seconds)
+        return self[idx] if idx >= 0 else None
+
+    def to_text(self):
+        """Plain-text rendering, one "[timestamp] speaker: text" line per segment."""
+        return "\n".join(f"[{self.timestamp(idx)}] {self.speaker(idx)}: {self.text(idx)}" for idx in range(len(self)))
@@ -0,0 +1,173 @@
+# src/transcript_compaction.py
+# Standard library imports
+import re
+
+# Local imports
+from config import TRANSCRIPT_COMPACTION_ANCHOR_SECONDS
+from src.preflight import count_text_tokens
+from src.transcript import TRANSCRIPT_LINE_PATTERN, Transcript, format_time
+
+# Turns that carry no content for a summary (compared lower-cased, without punctuation)
+FILLER_TURNS = frozenset({
+    "ok", "okay", "yeah", "yep", "ya", "right", "sure", "alright", "all right", "mhm", "mm", "hmm",
+    "uh", "um", "uh huh", "ah", "oh", "i see", "thank you", "thanks", "ok ok", "okay okay", "betul", "ya ya", "okey",
+})
+MISSING_TEXT_MARKERS = ("[transcription missing", "[transcription truncated", "[silence]")
+
+# Speaker names longer than this get a short alias (S1, S2, ...) listed in a legend
+SPEAKER_ALIAS_MIN_LENGTH = 12
+
+# Extracted text with more than this much before its first "[time] Speaker:" line
+# is not treated as a transcript and is sent unchanged
+MAX_PREAMBLE_CHARS = 200
+
+
+def is_filler_turn(text):
+    """Whether a turn is empty, a transcription placeholder, or only a filler word."""
+    lowered = text.strip().lower()
+    if lowered.startswith(MISSING_TEXT_MARKERS):
+        return True
+    normalized = " ".join(re.sub(r"[^\w\s]", " ", lowered).split())
+    return not normalized or normalized in FILLER_TURNS
+
+
+def _as_transcript(transcription_input):
+    """Transcript for the input, or None for extracted text that does not look like an exported transcript."""
+    if not isinstance(transcription_input, str):
+        return Transcript.load(transcription_input)
+    preamble = []
+    for line in transcription_input.splitlines():
+        if TRANSCRIPT_LINE_PATTERN.match(line.strip()):
+            break
+        preamble.append(line.strip())
+    else:
+        return None
+    if len("".join(preamble)) > MAX_PREAMBLE_CHARS:
+        return None
+    return Transcript.from_text(transcription_input)
+
+
+class CompactTranscript(Transcript):
+    """Transcript left by compaction; it renders itself compactly, so every later rendering keeps the anchors and aliases."""
+
+    __slots__ = ("anchor_seconds",)
+
+    def __init__(self, anchor_seconds=TRANSCRIPT_COMPACTION_ANCHOR_SECONDS):
+        super().__init__()
+        self.anchor_seconds = anchor_seconds
+
+    def compact_lines(self):
+        """See compact_lines()."""
+        return compact_lines(self, self.anchor_seconds)
+
+    def to_text(self):
+        return render_compact(self, self.anchor_seconds)[0]
+
+
+def merge_turns(transcript, anchor_seconds=TRANSCRIPT_COMPACTION_ANCHOR_SECONDS):
+    """Drop filler turns and merge consecutive segments of the same speaker.
+
+    Returns:
+        Tuple of (compacted CompactTranscript, dropped turn count, merged turn count)
+    """
+    compacted = CompactTranscript(anchor_seconds)
+    dropped = merged = 0
+    pending = None
+    for idx in range(len(transcript)):
+        text = transcript.text(idx).strip()
+        if is_filler_turn(text):
+            dropped += 1
+            continue
+        speaker = transcript.speaker(idx)
+        if pending and pending[2] == speaker:
+            pending[1] = max(pending[1], transcript.end(idx))
+            pending[3] = f"{pending[3]} {text}"
+            merged += 1
+            continue
+        if pending:
+            compacted.append(*pending)
+        pending = [transcript.start(idx), transcript.end(idx), speaker, text]
+    if pending:
+        compacted.append(*pending)
+    return compacted, dropped, merged
+
+
+def compact_lines(transcript, anchor_seconds=TRANSCRIPT_COMPACTION_ANCHOR_SECONDS):
+    """Render each turn as a "Speaker: text" line with a "[MM:SS]" anchor only when a new `anchor_seconds` interval starts.
+
+    Long speaker names are replaced by S1, S2, ... and listed in a legend.
+
+    Returns:
+        Tuple of (legend line or None, alias -> speaker name dict, [(speaker, start seconds, line)] per turn)
+    """
+    aliases = {}
+    for speaker in transcript.speakers:
+        if len(speaker) > SPEAKER_ALIAS_MIN_LENGTH:
+            aliases[speaker] = f"S{len(aliases) + 1}"
+    legend = "Speakers: " + "; ".join(f"{alias} = {speaker}" for speaker, alias in aliases.items()) if aliases else None
+    lines = []
+    last_anchor = None
+    for idx in range(len(transcript)):
+        anchor = transcript.start(idx) // max(1, anchor_seconds) * max(1, anchor_seconds)
+        prefix = ""
+        if anchor != last_anchor:
+            prefix = f"[{format_time(anchor)}] "
+            last_anchor = anchor
+        speaker = transcript.speaker(idx)
+        lines.append((speaker, transcript.start(idx), f"{prefix}{aliases.get(speaker, speaker)}: {transcript.text(idx)}"))
+    return legend, {alias: speaker for speaker, alias in aliases.items()}, lines
+
+
+def render_compact(transcript, anchor_seconds=TRANSCRIPT_COMPACTION_ANCHOR_SECONDS):
+    """Compact text of a transcript (see compact_lines), with the speaker legend on the first line.
+
+    Returns:
+        Tuple of (text, alias -> speaker name dict)
+    """
+    legend, aliases, turns = compact_lines(transcript, anchor_seconds)
+    return "\n".join(([legend] if legend else []) + [line for _, _, line in turns]), aliases
+
+
+def compact_transcript(transcription_input, original_text, anchor_seconds=TRANSCRIPT_COMPACTION_ANCHOR_SECONDS, model=None):
+    """
+    Compact a transcription before summarization to cut input tokens.
+
+    Filler and empty turns are dropped, consecutive turns of the same speaker
+    are merged, timestamps are coarsened to `anchor_seconds` anchors and long
+    speaker names are aliased. Text that is not a recognizable transcript is
+    returned unchanged.
+
+    Args:
+        transcription_input: Transcript, JSON entries or extracted text
+        original_text: The uncompacted text (format_transcription_text of the input)
+        anchor_seconds: Interval between timestamp anchors
+        model: Model whose tokenizer is used for the reduction report
+
+    Returns:
+        Tuple of (compacted CompactTranscript, or the input if it was left unchanged;
+        text to send; stats dict with original_tokens, compacted_tokens,
+        reduction, dropped_turns, merged_turns and speaker_aliases)
+    """
+    original_tokens = count_text_tokens(original_text, model)
+    stats = {"original_tokens": original_tokens, "compacted_tokens": original_tokens, "reduction": 0.0,
+             "dropped_turns": 0, "merged_turns": 0, "speaker_aliases": {}}
+    transcript = _as_transcript(transcription_input)
+    if not transcript:
+        return transcription_input, original_text, stats
+
+    compacted, dropped, merged = merge_turns(transcript, anchor_seconds)
+    text, aliases = render_compact(compacted, anchor_seconds)
+    compacted_tokens = count_text_tokens(text, model)
+    if not compacted or compacted_tokens >= original_tokens:
+        return transcription_input, original_text, stats
+
+    stats.update({
+        "compacted_tokens": compacted_tokens,
+        "reduction": 1 - compacted_tokens / original_tokens if original_tokens else 0.0,
+        "dropped_turns": dropped,
+        "merged_turns": merged,
+        "speaker_aliases": aliases
+    })
+    print(f"Compacted transcript: {original_tokens:,} -> {compacted_tokens:,} tokens ({stats['reduction']:.0%} fewer; "
+          f"{dropped} filler turns dropped, {merged} turns merged)")
+    return compacted, text, stats
@@ -0,0 +1,91 @@
+# src/transcription_cache.py
+# Standard library imports
+import hashlib
+import json
+import os
+import threading
+import uuid
+
+# Local imports
+from config import TRANSCRIPTION_CACHE_DIR, TRANSCRIPTION_CACHE_MAX_BYTES
+
+# Bump when the cached entry format changes so old entries are never reused
+CACHE_VERSION = "1"
+
+_eviction_lock = threading.Lock()
+
+
+def make_cache_key(audio_file_path, model, prompt):
+    """Build a content-addressed key from the exact uploaded bytes, the model and the full prompt."""
+    digest = hashlib.sha256()
+    digest.update(f"v{CACHE_VERSION}\0{model}\0{prompt}\0".encode("utf-8"))
+    with open(audio_file_path, "rb") as f:
+        for block in iter(lambda: f.read(1024 * 1024), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def _cache_path(key):
+    return os.path.join(TRANSCRIPTION_CACHE_DIR, key[:2], f"{key}.json")
+
+
+def get_cached_transcription(key):
+    """Return the cached chunk-relative transcription for `key`, or None on a miss."""
+    path = _cache_path(key)
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            entries = json.load(f)
+    except (OSError, json.JSONDecodeError):
+        return None
+    # Touch the file so eviction treats it as recently used
+    try:
+        os.utime(path)
+    except OSError:
+        pass
+    return entries
+
+
+def store_transcription(key, entries):
+    """Store a chunk-relative transcription under `key` and evict old entries if over budget."""
+    path = _cache_path(key)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    # Write to a unique temp file first so concurrent readers never see a partial entry
+    temp_path = f"{path}.{uuid.uuid4().hex}.tmp"
+    with open(temp_path, "w", encoding="utf-8") as f:
+        json.dump(entries, f, ensure_ascii=False)
+    os.replace(temp_path, path)
+    evict_least_recently_used()
+
+
+def evict_least_recently_used(max_bytes=TRANSCRIPTION_CACHE_MAX_BYTES):
+    """Delete the least recently used cache files until the cache fits in `max_bytes`."""
+    with _eviction_lock:
+        files = []
+        total_bytes = 0
+        for root, _, names in os.walk(TRANSCRIPTION_CACHE_DIR):
+            for name in names:
+                if not name.endswith(".json"):
+                    continue
+                path = os.path.join(root, name)
+                try:
+                    stat = os.stat(path)
+                except OSError:
+                    continue
+                files.append((stat.st_mtime, stat.st_size, path))
+                total_bytes += stat.st_size
+
+        if total_bytes <= max_bytes:
+            return 0
+
+        removed = 0
+        for _, size, path in sorted(files):
+            try:
+                os.unlink(path)
+            except OSError:
+                continue
+            total_bytes -= size
+            removed += 1
+            if total_bytes <= max_bytes:
+                break
+        print(f"Evicted {removed} transcription cache entries")
+        return removed
@@ -1,15 +1,34 @@
 # src/utils.py
 import base64
+import hashlib
 import re
 import imghdr
 import streamlit as st
 from datetime import datetime, timedelta
+import secrets
 import sqlite3
+import threading
+import time
 import uuid
 
+from src.gemini_context_cache import delete_session_caches, purge_expired_caches
+from src.gemini_files import delete_session_files, purge_expired_files
+from src.job_queue import cancel_session_jobs
+from src.rate_limiter import set_current_session
+
 # SQLite database file (same as used in ragflow_utils.py)
 DB_FILE = "project_ragflow_config.db"
 
+# Query parameter holding the session's resume token. The token, not the
+# session ID, reattaches a reloaded page; only its hash is stored.
+RESUME_PARAM = "resume"
+
+# Abandoned sessions are swept by a background thread this often, so no page
+# load waits on the remote Gemini deletes
+SESSION_SWEEP_INTERVAL_SECONDS = 3600
+_sweeper_started = False
+_sweeper_lock = threading.Lock()
+
 def init_session_db():
     """Initialize the SQLite table for session data."""
     conn = sqlite3.connect(DB_FILE)
@@ -17,9 +36,14 @@ def init_session_db():
     cursor.execute("""
         CREATE TABLE IF NOT EXISTS sessions (
             session_id TEXT PRIMARY KEY,
-            last_activity TIMESTAMP NOT NULL
+            last_activity TIMESTAMP NOT NULL,
+            resume_token_hash TEXT
         )
     """)
+    # Add the resume token column to tables created before it existed
+    cursor.execute("PRAGMA table_info(sessions)")
+    if "resume_token_hash" not in {row[1] for row in cursor.fetchall()}:
+        cursor.execute("ALTER TABLE sessions ADD COLUMN resume_token_hash TEXT")
     conn.commit()
     conn.close()
 
@@ -47,20 +71,56 @@ def clean_non_csv_content(content):
             csv_lines.append(line.strip())
     return "\n".join(csv_lines)
 
+def _hash_resume_token(resume_token):
+    return hashlib.sha256(resume_token.encode("utf-8")).hexdigest()
+
+def _session_for_resume_token(resume_token):
+    conn = sqlite3.connect(DB_FILE)
+    cursor = conn.cursor()
+    cursor.execute("SELECT session_id FROM sessions WHERE resume_token_hash = ?", (_hash_resume_token(resume_token),))
+    result = cursor.fetchone()
+    conn.close()
+    return result[0] if result else None
+
 def initialize_session():
-    """Initialize session ID and timestamp if not already set."""
+    """Initialize session ID and timestamp if not already set.
+
+    An unguessable resume token is kept in the page URL, so a browser reload
+    reattaches to the same session (and its background jobs) instead of
+    starting over. Anyone with the URL can do the same, which the sidebar
+    tells the user.
+    """
     init_session_db()
     if 'session_id' not in st.session_state:
-        session_id = uuid.uuid4().hex
-        st.session_state.session_id = session_id
-        current_time = datetime.now()
-        st.session_state.last_activity = current_time
-        # Store in database
-        conn = sqlite3.connect(DB_FILE)
-        cursor = conn.cursor()
-        cursor.execute("INSERT INTO sessions (session_id, last_activity) VALUES (?, ?)", (session_id, current_time))
-        conn.commit()
-        conn.close()
+        resume_token = st.query_params.get(RESUME_PARAM)
+        resumed_session_id = _session_for_resume_token(resume_token) if resume_token else None
+        if resumed_session_id:
+            st.session_state.session_id = resumed_session_id
+            st.session_state.last_activity = datetime.now()
+        else:
+            session_id = uuid.uuid4().hex
+            resume_token = secrets.token_urlsafe(32)
+            st.session_state.session_id = session_id
+            current_time = datetime.now()
+            st.session_state.last_activity = current_time
+            # Store in database
+            conn = sqlite3.connect(DB_FILE)
+            cursor = conn.cursor()
+            cursor.execute(
+                "INSERT INTO sessions (session_id, last_activity, resume_token_hash) VALUES (?, ?, ?)",
+                (session_id, current_time, _hash_resume_token(resume_token))
+            )
+            conn.commit()
+            conn.close()
+            st.query_params[RESUME_PARAM] = resume_token
+    st.sidebar.caption(
+        "🔒 This page's address lets anyone who has it resume your session, including its jobs, uploads and "
+        "summaries. Do not share or post it."
+    )
+    # Sweep sessions that were abandoned without an explicit cleanup
+    start_session_sweeper()
+    # API calls in this script run wait in the session's rate-limit queue
+    set_current_session(st.session_state.session_id)
 
 def update_activity_timestamp():
     """Update the last activity timestamp for the current session."""
@@ -91,16 +151,65 @@ def check_session_expiry(max_inactivity_days=1):
                 return False
     return True
 
+def _session_sweep_loop():
+    while True:
+        try:
+            cleanup_expired_sessions()
+        except Exception as e:
+            print(f"Expired session cleanup failed: {e}")
+        time.sleep(SESSION_SWEEP_INTERVAL_SECONDS)
+
+def start_session_sweeper():
+    """Start the background thread running cleanup_expired_sessions (once per process)."""
+    global _sweeper_started
+    with _sweeper_lock:
+        if _sweeper_started:
+            return
+        threading.Thread(target=_session_sweep_loop, name="session-sweeper", daemon=True).start()
+        _sweeper_started = True
+
+def cleanup_expired_sessions(max_inactivity_days=1):
+    """Cancel jobs, delete remote Gemini files and context caches and drop session rows for every session past its inactivity limit."""
+    cutoff = datetime.now() - timedelta(days=max_inactivity_days)
+    conn = sqlite3.connect(DB_FILE)
+    cursor = conn.cursor()
+    cursor.execute("SELECT session_id FROM sessions WHERE last_activity < ?", (cutoff,))
+    expired_sessions = [row[0] for row in cursor.fetchall()]
+    conn.close()
+    for session_id in expired_sessions:
+        cancel_session_jobs(session_id)
+        try:
+            delete_session_files(session_id)
+            delete_session_caches(session_id)
+        except Exception as e:
+            print(f"Failed to delete Gemini files for expired session {session_id}: {e}")
+            continue
+        conn = sqlite3.connect(DB_FILE)
+        cursor = conn.cursor()
+        cursor.execute("DELETE FROM sessions WHERE session_id = ?", (session_id,))
+        conn.commit()
+        conn.close()
+    purge_expired_files()
+    purge_expired_caches()
+
 def clear_session():
-    """Clear the session ID and related data."""
+    """Clear the session ID and related data, including its uploaded Gemini files and context caches."""
     if 'session_id' in st.session_state:
         session_id = st.session_state.session_id
+        cancel_session_jobs(session_id)
+        try:
+            delete_session_files(session_id)
+            delete_session_caches(session_id)
+        except Exception as e:
+            print(f"Failed to delete Gemini files for session {session_id}: {e}")
         # Remove from database
         conn = sqlite3.connect(DB_FILE)
         cursor = conn.cursor()
         cursor.execute("DELETE FROM sessions WHERE session_id = ?", (session_id,))
         conn.commit()
         conn.close()
+    if RESUME_PARAM in st.query_params:
+        del st.query_params[RESUME_PARAM]
     # Clear from session state
     keys_to_clear = ['session_id', 'last_activity']
     for key in list(st.session_state.keys()):
@@ -0,0 +1,76 @@
+# tests/test_gemini_files.py
+# Standard library imports
+import os
+import tempfile
+import unittest
+from types import SimpleNamespace
+from unittest import mock
+
+# Local imports
+from src import gemini_files
+
+
+class _FakeFiles:
+    """Stands in for client.files, tracking which remote files exist."""
+
+    def __init__(self):
+        self.live = {}
+        self.uploads = 0
+
+    def upload(self, file):
+        self.uploads += 1
+        name = f"files/upload-{self.uploads}"
+        self.live[name] = SimpleNamespace(name=name, uri=f"https://example.invalid/{name}", mime_type="audio/mpeg")
+        return self.live[name]
+
+    def get(self, name):
+        return self.live[name]
+
+    def delete(self, name):
+        del self.live[name]
+
+
+class UploadDeleteRaceTest(unittest.TestCase):
+    def setUp(self):
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(self.temp_dir.cleanup)
+        self.audio_path = os.path.join(self.temp_dir.name, "chunk.mp3")
+        with open(self.audio_path, "wb") as f:
+            f.write(b"same bytes in both sessions")
+        self.files = _FakeFiles()
+        for patcher in (
+            mock.patch.object(gemini_files, "DB_FILE", os.path.join(self.temp_dir.name, "registry.db")),
+            mock.patch.object(gemini_files, "client", SimpleNamespace(files=self.files)),
+        ):
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+    def test_delete_between_lookup_and_link_does_not_hand_out_a_deleted_file(self):
+        first = gemini_files.upload_file(self.audio_path, "session-a")
+        link_session = gemini_files._link_session
+
+        def delete_then_link(*args):
+            # Session A ends after session B has looked up the shared upload, before B links to it
+            gemini_files.delete_session_files("session-a")
+            return link_session(*args)
+
+        with mock.patch.object(gemini_files, "_link_session", side_effect=delete_then_link):
+            second = gemini_files.upload_file(self.audio_path, "session-b")
+
+        self.assertNotIn(first.name, self.files.live)
+        self.assertIn(second.name, self.files.live)
+        self.assertNotEqual(first.name, second.name)
+
+    def test_delete_after_link_keeps_the_shared_file(self):
+        first = gemini_files.upload_file(self.audio_path, "session-a")
+        second = gemini_files.upload_file(self.audio_path, "session-b")
+        self.assertEqual(first.name, second.name)
+
+        self.assertEqual(gemini_files.delete_session_files("session-a"), 0)
+        self.assertIn(second.name, self.files.live)
+        self.assertEqual(gemini_files.delete_session_files("session-b"), 1)
+        self.assertEqual(self.files.live, {})
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,45 @@
+# tests/test_text_processor.py
+# Standard library imports
+import threading
+import time
+import unittest
+from types import SimpleNamespace
+from unittest import mock
+
+# Local imports
+from src import text_processor
+
+
+class _StalledStream:
+    """OpenAI-style stream that sends one chunk and then hangs until closed."""
+
+    def __init__(self):
+        self.closed = threading.Event()
+
+    def __iter__(self):
+        yield SimpleNamespace(choices=[SimpleNamespace(delta=SimpleNamespace(content="Partial summary"))])
+        self.closed.wait(30)
+
+    def close(self):
+        self.closed.set()
+
+
+class StreamTextTimeoutTest(unittest.TestCase):
+    def test_stalled_stream_raises_within_idle_timeout(self):
+        stream = _StalledStream()
+        client = SimpleNamespace(chat=SimpleNamespace(completions=SimpleNamespace(create=lambda **kwargs: stream)))
+        model_config = {"stalling-model": {"client_type": "openai", "base_url": "https://example.invalid/v1", "api_key": "test-key"}}
+        with mock.patch.dict(text_processor.MODEL_CONFIG, model_config), \
+                mock.patch.object(text_processor, "get_client", return_value=client), \
+                mock.patch.object(text_processor, "SUMMARY_STREAM_IDLE_TIMEOUT_SECONDS", 0.5):
+            pieces = text_processor._stream_text("stalling-model", "Summarize", "transcript")
+            self.assertEqual(next(pieces), "Partial summary")
+            started_at = time.monotonic()
+            with self.assertRaises(TimeoutError):
+                next(pieces)
+        self.assertLess(time.monotonic() - started_at, 5)
+        self.assertTrue(stream.closed.is_set())
+
+
+if __name__ == "__main__":
+    unittest.main()